@@ -1,4 +1,7 @@
 from easystore.database import EasyStore, SubStore
+from easystore.asyncstore import AsyncEasyStore, AsyncSubStore
 
 assert SubStore
 assert EasyStore
+assert AsyncSubStore
+assert AsyncEasyStore
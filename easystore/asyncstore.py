@@ -0,0 +1,192 @@
+import asyncio
+import functools
+import itertools
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Union
+
+from easystore.columns import SubStoreColumns
+from easystore.cursor import SubStoreCursor
+from easystore.database import EasyStore, SubStore
+from easystore.locking import LockStats
+from easystore.recordformat import StoreFormats
+from easystore.resultcache import freeze
+from easystore.utilis import Record
+
+
+class AsyncSubStoreCursor:
+    """Async iterator over SubStoreCursor, records are read by batches in the executor"""
+
+    BATCH_SIZE = 256
+
+    def __init__(self, open_cursor: Callable[[], SubStoreCursor], run: Callable[..., Any]):
+        self.__open_cursor = open_cursor
+        self.__run = run
+        self.__cursor: Optional[SubStoreCursor] = None
+        self.__batch: List[Record] = []
+        self.__batch_position = 0
+
+    def __aiter__(self) -> "AsyncSubStoreCursor":
+        return self
+
+    async def __anext__(self) -> Record:
+        if self.__batch_position == len(self.__batch):
+            if self.__cursor is None:
+                self.__cursor = await self.__run(self.__open_cursor)
+            self.__batch = await self.__run(lambda: list(itertools.islice(self.__cursor, self.BATCH_SIZE)))
+            self.__batch_position = 0
+            if not self.__batch:
+                await self.close()
+                raise StopAsyncIteration
+        record = self.__batch[self.__batch_position]
+        self.__batch_position += 1
+        return record
+
+    async def close(self):
+        if self.__cursor is not None:
+            self.__cursor.close()
+
+    async def __aenter__(self) -> "AsyncSubStoreCursor":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AsyncSubStore:
+    """
+    SubStore for asyncio code: every call runs in the executor, so the event loop is not blocked by file I/O.
+    Identical reads running at the same time share one call, writes of the sub store go one by one,
+    a read started after a write has finished never shares the call with a read started before it.
+    """
+
+    def __init__(self, sub_store: SubStore, executor: Executor):
+        self.__sub_store = sub_store
+        self.__executor = executor
+        self.__write_lock = asyncio.Lock()
+        self.__reads: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def spec(self) -> List[str]:
+        return self.__sub_store.spec
+
+    @property
+    def store_format(self) -> str:
+        return self.__sub_store.store_format
+
+    @property
+    def lock_stats(self) -> LockStats:
+        return self.__sub_store.lock_stats
+
+    async def insert_one(self, *args, **kwargs) -> int:
+        return await self.__write(self.__sub_store.insert_one, *args, **kwargs)
+
+    async def insert_many(self, records: Iterable[Union[dict, Record]]) -> int:
+        return await self.__write(self.__sub_store.insert_many, list(records))
+
+    async def update_one(self, conditions: dict, new_params: dict) -> int:
+        return await self.__write(self.__sub_store.update_one, conditions, new_params)
+
+    async def update_many(self, conditions: dict, new_params: dict) -> int:
+        return await self.__write(self.__sub_store.update_many, conditions, new_params)
+
+    async def delete_one(self, **conditions) -> int:
+        return await self.__write(self.__sub_store.delete_one, **conditions)
+
+    async def delete_many(self, **conditions) -> int:
+        return await self.__write(self.__sub_store.delete_many, **conditions)
+
+    async def compact(self) -> int:
+        return await self.__write(self.__sub_store.compact)
+
+    async def get_all(self) -> List[Record]:
+        return await self.get_many()
+
+    async def get_one(self, **conditions) -> Optional[Record]:
+        return await self.__read(self.__sub_store.get_one, **conditions)
+
+    async def get_many(self, *, limit: Optional[int] = None, offset: int = 0, fields: Optional[List[str]] = None,
+                       workers: Optional[int] = None, **conditions) -> List[Record]:
+        records = await self.__read(self.__sub_store.get_many, limit=limit, offset=offset, fields=fields,
+                                    workers=workers, **conditions)
+        return list(records)
+
+    async def to_columns(self, fields: Optional[List[str]] = None, **conditions) -> SubStoreColumns:
+        return await self.__read(self.__sub_store.to_columns, fields, **conditions)
+
+    def lazy_load(self, *, limit: Optional[int] = None, offset: int = 0, fields: Optional[List[str]] = None,
+                  **conditions) -> AsyncSubStoreCursor:
+        open_cursor = functools.partial(self.__sub_store.lazy_load, limit=limit, offset=offset, fields=fields,
+                                        **conditions)
+        return AsyncSubStoreCursor(open_cursor, self.__run)
+
+    async def __run(self, function: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(function, *args, **kwargs))
+
+    async def __write(self, function: Callable, *args, **kwargs) -> Any:
+        async with self.__write_lock:
+            self.__reads.clear()
+            try:
+                return await self.__run(function, *args, **kwargs)
+            finally:
+                self.__reads.clear()
+
+    async def __read(self, function: Callable, *args, **kwargs) -> Any:
+        try:
+            key = (function.__name__, freeze(args), freeze(kwargs))
+        except TypeError:
+            return await self.__run(function, *args, **kwargs)
+        future = self.__reads.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.__run(function, *args, **kwargs))
+            self.__reads[key] = future
+            future.add_done_callback(functools.partial(self.__forget_read, key))
+        return await asyncio.shield(future)
+
+    def __forget_read(self, key: Hashable, future: asyncio.Future):
+        if self.__reads.get(key) is future:
+            del self.__reads[key]
+
+
+class AsyncEasyStore:
+    """
+    EasyStore for asyncio code. Calls run in a bounded thread pool, by default its own one
+    which is shut down by close. Opening the store recovers sub stores, so it blocks like EasyStore does.
+    """
+
+    MAX_WORKERS = 4
+
+    def __init__(self, db_path, executor: Optional[Executor] = None, max_workers: int = MAX_WORKERS):
+        self.__easy_store = EasyStore(db_path)
+        self.__own_executor = executor is None
+        self.__executor = executor if executor is not None else ThreadPoolExecutor(max_workers=max_workers)
+        self.__sub_stores: Dict[str, AsyncSubStore] = {}
+
+    async def get_sub_store(self, sub_store_name: str) -> AsyncSubStore:
+        """Sub stores are cached, so writes of one sub store are serialized for all its users"""
+        sub_store = self.__sub_stores.get(sub_store_name)
+        if sub_store is None:
+            sync_sub_store = await self.__run(self.__easy_store.get_sub_store, sub_store_name)
+            sub_store = self.__sub_stores.setdefault(sub_store_name, AsyncSubStore(sync_sub_store, self.__executor))
+        return sub_store
+
+    async def get_sub_store_list(self) -> List[str]:
+        return await self.__run(self.__easy_store.get_sub_store_list)
+
+    async def create_sub_store(self, name: str, spec: List[str], store_format: str = StoreFormats.TEXT):
+        await self.__run(self.__easy_store.create_sub_store, name, spec, store_format)
+
+    def close(self):
+        if self.__own_executor:
+            self.__executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "AsyncEasyStore":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __run(self, function: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(function, *args))
@@ -22,20 +22,34 @@ class AutoFieldAdder(AbstractAutoFieldsAdder):
     def add_auto_fields(self, record: Record) -> Record:
         return self._add_auto_fields(record)
 
+    def add_auto_fields_to_many(self, records: List[Record]) -> List[Record]:
+        return self._add_auto_fields_to_many(records)
+
     def _add_auto_fields(self, record: Record) -> Record:
+        return self._add_auto_fields_to_many([record])[0]
+
+    def _add_auto_fields_to_many(self, records: List[Record]) -> List[Record]:
         meta_info = self.meta_handler.get_meta_data()
         params_with_auto_filling = self.__get_params_with_auto_filling(meta_info)
-        return self.__add_auto_fields(meta_info, params_with_auto_filling, record)
+        return self.__add_auto_fields(meta_info, params_with_auto_filling, records)
 
     @staticmethod
     def __add_auto_fields(meta_info: MetaInfo, params_with_auto_filling: List[str],
-                          record: Record) -> Record:
+                          records: List[Record]) -> List[Record]:
         for auto_param in params_with_auto_filling:
-            if not getattr(record, auto_param, None):
-                params_pk_set = meta_info.pk_sets.get(auto_param)
-                auto_param_value = max(params_pk_set) + 1 if params_pk_set else 1
-                setattr(record, auto_param, auto_param_value)
-        return record
+            given_values = [getattr(record, auto_param, None) for record in records]
+            if all(given_values):
+                continue
+            last_value = meta_info.sequences.get(auto_param)
+            if last_value is None:
+                pk_set = meta_info.pk_sets.get(auto_param)
+                last_value = pk_set.max() if pk_set is not None else 0
+            auto_param_value = max(last_value, *[value for value in given_values if value], 0) + 1
+            for record, value in zip(records, given_values):
+                if not value:
+                    setattr(record, auto_param, auto_param_value)
+                    auto_param_value += 1
+        return records
 
     def __get_params_with_auto_filling(self, meta_info: MetaInfo) -> List[str]:
         params_with_auto_adding = []
@@ -0,0 +1,167 @@
+import datetime
+import pathlib
+import threading
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from easystore.predicate import Operators, split_condition
+from easystore.utilis import AbstractRecord, FieldType, get_file_signature, get_record_class
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore
+
+
+def require_numpy():
+    if numpy is None:
+        raise ImportError("numpy is required for columnar reads, install EasyStore[columns]")
+
+
+def values2column(values: List[Any], field_type: Optional[FieldType] = None) -> "numpy.ndarray":
+    """
+    Column gets the narrowest of bool, int64, float64, datetime64 or str types which can keep all its values.
+    Values of typed fields are decoded already, text of str and untyped fields is kept as it is, not parsed.
+    """
+    if field_type is FieldType.str or field_type is None and any(isinstance(value, str) for value in values):
+        return numpy.array([str(value) for value in values], dtype=str)
+    if values and all(isinstance(value, bool) for value in values):
+        return numpy.array(values, dtype=numpy.bool_)
+    if values and all(isinstance(value, datetime.datetime) for value in values):
+        return numpy.array(values, dtype="datetime64[us]")
+    dtypes = (numpy.float64,) if any(isinstance(value, float) for value in values) else (numpy.int64, numpy.float64)
+    for dtype in dtypes:
+        try:
+            return numpy.array(values, dtype=dtype)
+        except (TypeError, ValueError, OverflowError):
+            continue
+    return numpy.array([str(value) for value in values], dtype=str)
+
+
+def equal_mask(column: "numpy.ndarray", value: Any) -> "numpy.ndarray":
+    """Values are equal when they are equal as str, like in SubStore.get_many"""
+    if column.dtype.kind == "M":
+        if not isinstance(value, datetime.datetime):
+            return numpy.zeros(len(column), dtype=numpy.bool_)
+        return column == numpy.datetime64(value, "us")
+    text = str(value)
+    try:
+        if column.dtype.kind == "b":
+            if text not in ("True", "False"):
+                raise ValueError(text)
+            return column == (text == "True")
+        if column.dtype.kind in "iu":
+            return column == int(text)
+        if column.dtype.kind == "f":
+            return column == float(text)
+    except ValueError:
+        return numpy.zeros(len(column), dtype=numpy.bool_)
+    return column == text
+
+
+def range_mask(column: "numpy.ndarray", operator: str, value: Any) -> "numpy.ndarray":
+    """Numeric and datetime columns are compared with converted value, the others as str"""
+    bound: Any
+    try:
+        if column.dtype.kind == "M":
+            bound = numpy.datetime64(value, "us")
+        elif column.dtype.kind in "iuf":
+            bound = float(value)
+        else:
+            column, bound = column.astype(str), str(value)
+    except (TypeError, ValueError):
+        return numpy.zeros(len(column), dtype=numpy.bool_)
+    if operator == Operators.GT:
+        return column > bound
+    if operator == Operators.GE:
+        return column >= bound
+    if operator == Operators.LT:
+        return column < bound
+    return column <= bound
+
+
+def condition_mask(column: "numpy.ndarray", operator: str, value: Any) -> "numpy.ndarray":
+    if operator == Operators.EQ:
+        return equal_mask(column, value)
+    if operator == Operators.IN:
+        mask = numpy.zeros(len(column), dtype=numpy.bool_)
+        for item in value:
+            mask |= equal_mask(column, item)
+        return mask
+    if operator == Operators.STARTSWITH:
+        return numpy.char.startswith(column.astype(str), str(value))
+    return range_mask(column, operator, value)
+
+
+class SubStoreColumns:
+    """Fields of sub store records as numpy arrays of the same length"""
+
+    def __init__(self, columns: Dict[str, "numpy.ndarray"]):
+        self.__columns = columns
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.__columns)
+
+    def __len__(self):
+        for column in self.__columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, field: str) -> "numpy.ndarray":
+        return self.__columns[field]
+
+    def mask(self, **conditions) -> "numpy.ndarray":
+        mask = numpy.ones(len(self), dtype=numpy.bool_)
+        for key, value in conditions.items():
+            field, operator = split_condition(key)
+            mask &= condition_mask(self.__columns[field], operator, value)
+        return mask
+
+    def where(self, mask: "numpy.ndarray") -> "SubStoreColumns":
+        return SubStoreColumns({field: column[mask] for field, column in self.__columns.items()})
+
+    def select(self, fields: List[str]) -> "SubStoreColumns":
+        return SubStoreColumns({field: self.__columns[field] for field in fields})
+
+    def records(self) -> Iterator[AbstractRecord]:
+        """Records are built one by one while iterating"""
+        record_class = get_record_class(self.fields)
+        for values in zip(*self.__columns.values()):
+            yield record_class(*[value.item() for value in values])
+
+
+class ColumnsCache:
+    """
+    Columns loaded from one sub store file. They are kept while inode, size and mtime of the file
+    are the same, so repeated columnar queries only filter arrays in memory.
+    """
+
+    def __init__(self, sub_store_path: pathlib.Path):
+        self.__sub_store_path = sub_store_path
+        self.__columns: Dict[str, "numpy.ndarray"] = {}
+        self.__signature: Optional[Tuple[int, int, int]] = None
+        self.__guard = threading.Lock()
+
+    def get_columns(self, spec: List[str], fields_types: Dict[str, FieldType], fields: List[str],
+                    read_values: Callable[[], Iterable[List[Any]]]) -> Dict[str, "numpy.ndarray"]:
+        with self.__guard:
+            signature = get_file_signature(self.__sub_store_path)
+            if signature != self.__signature:
+                self.__columns = {}
+                self.__signature = signature
+            missing_fields = [field for field in fields if field not in self.__columns]
+            if missing_fields:
+                self.__columns.update(self.__load_columns(spec, fields_types, missing_fields, read_values))
+            return {field: self.__columns[field] for field in fields}
+
+    @staticmethod
+    def __load_columns(spec: List[str], fields_types: Dict[str, FieldType], fields: List[str],
+                       read_values: Callable[[], Iterable[List[Any]]]) -> Dict[str, "numpy.ndarray"]:
+        positions = [spec.index(field) for field in fields]
+        columns_values: List[List[Any]] = [[] for _ in fields]
+        for values in read_values():
+            for column_values, position in zip(columns_values, positions):
+                column_values.append(values[position] if position < len(values) else None)
+        return {field: values2column(column_values, fields_types.get(field))
+                for field, column_values in zip(fields, columns_values)}
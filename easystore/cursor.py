@@ -0,0 +1,74 @@
+import os
+import pathlib
+
+from typing import Any, Callable, Iterator, List, Optional
+
+from easystore.recordformat import AbstractRecordFormat
+from easystore.utilis import AbstractRecord
+
+
+class SubStoreCursor(Iterator[AbstractRecord]):
+    """
+    Streams records made by select from values of a sub store rows, rows for which select returns None
+    are skipped, only values of positions are decoded. The file is read by chunks of chunk_size bytes,
+    so memory does not depend on the sub store size, and it is closed when the cursor is exhausted,
+    closed or used as a context manager.
+
+    Cursor reads rows which were in the file when it was opened:
+    rows appended later are not returned, rows deleted or updated in place are seen as they are
+    when their chunk is read, and a compaction does not touch the cursor, it keeps reading the replaced file.
+    """
+
+    def __init__(self, sub_store_path: pathlib.Path, record_format: AbstractRecordFormat,
+                 select: Callable[[List[Any]], Optional[AbstractRecord]], chunk_size: int,
+                 positions: Optional[List[int]] = None, limit: Optional[int] = None, skip: int = 0):
+        self.__file: Optional[Any] = sub_store_path.open(mode="rb", buffering=chunk_size)
+        self.__end = os.fstat(self.__file.fileno()).st_size
+        self.__rows = record_format.read_records(self.__file, positions)
+        self.__select = select
+        self.__left = limit
+        self.__skip = skip
+
+    @property
+    def closed(self) -> bool:
+        return self.__file is None
+
+    def __iter__(self) -> "SubStoreCursor":
+        return self
+
+    def __next__(self) -> AbstractRecord:
+        if self.__file is None:
+            raise StopIteration
+        if self.__left is not None and self.__left <= 0:
+            self.close()
+            raise StopIteration
+        for offset, values in self.__rows:
+            if offset >= self.__end:
+                break
+            record = self.__select(values)
+            if record is None:
+                continue
+            if self.__skip:
+                self.__skip -= 1
+                continue
+            if self.__left is not None:
+                self.__left -= 1
+            return record
+        self.close()
+        raise StopIteration
+
+    def close(self):
+        if self.__file is None:
+            return
+        self.__rows.close()
+        self.__file.close()
+        self.__file = None
+
+    def __enter__(self) -> "SubStoreCursor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
@@ -1,15 +1,30 @@
 import abc
+import contextlib
 import pathlib
 
-from typing import Optional, List, Generator
+from typing import Callable, Optional, List, Set, Tuple, Iterable, Union, Dict, ContextManager, Hashable, Sequence
 from dataclasses import dataclass
 
 from easystore.substorecreator import SubStoreCreator
-from easystore.utilis import go_to_store_point, read_data_until_point, FilePoints
+from easystore.errors import NotFoundField, UniqueKeyError
+from easystore.utilis import go_to_store_point, read_data_until_point, get_file_signature, FilePoints
 from easystore.fieldsvalidator import ParamForFieldValidator
 from easystore.autofields import AutoFieldAdder
+from easystore.columns import ColumnsCache, SubStoreColumns, require_numpy
+from easystore.cursor import SubStoreCursor
 from easystore.meta import MetaSubStoreHandler, MetaSubStoreUpdater
-from easystore.utilis import Record, AbstractRecord, temp_file2main, params2record
+from easystore.index import SubStoreIndex
+from easystore.journal import Journal, JournalTransaction
+from easystore.locking import LockStats, get_sub_store_lock
+from easystore.session import SubStoreSession
+from easystore.transaction import StoreTransaction
+from easystore.mapping import SubStoreMap
+from easystore.parallel import ScanTask, parallel_scan
+from easystore.predicate import Operators, get_predicate_plan, split_condition
+from easystore.recordformat import StoreFormats, detect_record_format
+from easystore.resultcache import ResultCache, ResultCacheStats, freeze
+from easystore.utilis import Record, AbstractRecord, Validator, params2record, sync_file, get_record_class
+from easystore.utilis import FieldType, MetaInfo, convert_field_value, get_values_decoder
 
 
 @dataclass(frozen=True)
@@ -17,6 +32,32 @@ class SubStorePoints:
     RECORDS_START = "#records"
 
 
+class _Selection:
+    """Compiled part of a query: positions of decoded fields and predicate plan bound to condition values"""
+
+    def __init__(self, fields: List[str], positions: Optional[List[int]], decode: Callable[[List], List],
+                 matches: Callable[[List], bool], result_fields: Optional[List[str]] = None):
+        self.fields = fields
+        self.positions = positions
+        self.decode = decode
+        self.matches = matches
+        self.result_size = len(result_fields) if result_fields is not None else len(fields)
+        self.__cut = result_fields is not None
+        self.__result_class = get_record_class(result_fields if result_fields is not None else fields)
+
+    def select(self, values: List) -> Optional[AbstractRecord]:
+        values = self.decode(values)
+        if not self.matches(values):
+            return None
+        if self.__cut:
+            values = values[:self.result_size]
+        return self.__result_class(*values)
+
+    def make_record(self, values: List) -> AbstractRecord:
+        """Makes record of decoded values which passed conditions and are cut to result fields"""
+        return self.__result_class(*values)
+
+
 class AbstractEasyStore(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
@@ -35,15 +76,15 @@ class AbstractEasyStore(metaclass=abc.ABCMeta):
 class AbstractSubStore(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
-    def get_all(self) -> List["Record"]:
+    def get_all(self) -> List["AbstractRecord"]:
         return self.get_many()
 
     @abc.abstractmethod
-    def get_many(self, **conditions) -> List["Record"]:
+    def get_many(self, **conditions) -> List["AbstractRecord"]:
         raise NotImplementedError()
 
     @abc.abstractmethod
-    def get_one(self, **conditions) -> Optional["Record"]:
+    def get_one(self, **conditions) -> Optional["AbstractRecord"]:
         raise NotImplementedError()
 
     @abc.abstractmethod
@@ -53,10 +94,16 @@ class AbstractSubStore(metaclass=abc.ABCMeta):
 
 class EasyStore(AbstractEasyStore):
 
-    def __init__(self, db_path):
+    def __init__(self, db_path, result_cache_entries: int = 0):
+        """Sub stores cache results of up to result_cache_entries queries each, see SubStore"""
         self.__path = pathlib.Path(db_path)
+        self.__result_cache_entries = result_cache_entries
         self.__init_store(self.__path)
         self.__sub_store_creator = SubStoreCreator(self.__path)
+        self.__journal = Journal(self.__path)
+        self.__catalog: Optional[Tuple[Tuple[int, int, int], List[str], Set[str]]] = None
+        self.__sub_stores: Dict[str, Tuple[int, "SubStore"]] = {}
+        self.__recover_sub_stores()
 
     def execute(self, query: Optional[str]):
         raise NotImplementedError()
@@ -67,31 +114,76 @@ class EasyStore(AbstractEasyStore):
     def get_sub_store_list(self) -> List[str]:
         return self._get_list_stores()
 
-    def create_sub_store(self, name: str, spec: List[str]):
-        self._create_sub_store(name, spec)
+    def create_sub_store(self, name: str, spec: List[str], store_format: str = StoreFormats.TEXT):
+        self._create_sub_store(name, spec, store_format)
+
+    def transaction(self, *sub_store_names: str) -> StoreTransaction:
+        """
+        Changes of sub stores got from the transaction are committed together on exit, see StoreTransaction.
+        Named sub stores are locked on enter, so they can be used in any order.
+        """
+        return StoreTransaction(self.__journal, self._get_sub_store, sub_store_names)
 
-    def _create_sub_store(self, name: str, spec: List[str]):
-        self.__sub_store_creator.create_sub_store(name, spec)
+    def _create_sub_store(self, name: str, spec: List[str], store_format: str = StoreFormats.TEXT):
+        self.__sub_store_creator.create_sub_store(name, spec, store_format)
         self._add_new_sub_store_to_info(name)
 
     def _get_sub_store(self, name: str) -> "SubStore":
-        sub_store_list = self._get_list_stores()
-        if name not in sub_store_list:
+        """
+        One SubStore is kept per name, so its meta, index and mapping survive between calls.
+        It is created again only if the file was migrated to another format by someone else.
+        """
+        _, _, sub_store_names = self.__get_catalog()
+        if name not in sub_store_names:
             raise FileNotFoundError()
-        sub_store_path = self.__path.parent / pathlib.Path(f"{name}.sbstore")
-        return SubStore(sub_store_path)
+        sub_store_path = self.__get_sub_store_path(name)
+        inode = sub_store_path.stat().st_ino
+        cached_inode, sub_store = self.__sub_stores.get(name, (None, None))
+        if sub_store is None or (cached_inode != inode and
+                                 sub_store.store_format != detect_record_format(sub_store_path).NAME):
+            sub_store = SubStore(sub_store_path, result_cache_entries=self.__result_cache_entries)
+        self.__sub_stores[name] = (inode, sub_store)
+        return sub_store
 
     def _add_new_sub_store_to_info(self, name: str):
         with self.__path.open(mode="a") as es:
             es.write(f"{name}\n")
+        self.__catalog = None
 
     def _get_list_stores(self) -> List[str]:
-        sub_stores: List[str] = []
-        with self.__path.open(mode="r") as es:
-            go_to_store_point(es, FilePoints.SUB_STORES_START)
-            for sub_store_name in read_data_until_point(es, FilePoints.END):
-                sub_stores.append(sub_store_name.replace("\n", ""))
-        return sub_stores
+        _, sub_stores, _ = self.__get_catalog()
+        return list(sub_stores)
+
+    def __get_catalog(self) -> Tuple[Tuple[int, int, int], List[str], Set[str]]:
+        """Names of sub stores are read again only when the store file was changed, by this process or another one"""
+        signature = get_file_signature(self.__path)
+        if self.__catalog is None or self.__catalog[0] != signature:
+            sub_stores: List[str] = []
+            with self.__path.open(mode="r") as es:
+                go_to_store_point(es, FilePoints.SUB_STORES_START)
+                for sub_store_name in read_data_until_point(es, FilePoints.END):
+                    sub_stores.append(sub_store_name.replace("\n", ""))
+            self.__catalog = (signature, sub_stores, set(sub_stores))
+        return self.__catalog
+
+    def __recover_sub_stores(self):
+        """
+        Journals of sub stores are checkpointed before a store transaction is committed and the store journal
+        right after it, so the store journal holds at most one transaction which goes before everything
+        in journals of its sub stores. Sub stores are locked in the order of store transactions,
+        so a transaction of another process is not replayed while it is committed.
+        Listed sub stores without files are skipped, getting them fails like before.
+        """
+        names = sorted(name for name in self._get_list_stores() if self.__get_sub_store_path(name).exists())
+        with contextlib.ExitStack() as locks:
+            for name in names:
+                locks.enter_context(self._get_sub_store(name)._lock_exclusive())
+            self.__journal.recover()
+            for name in names:
+                self._get_sub_store(name).recover()
+
+    def __get_sub_store_path(self, name: str) -> pathlib.Path:
+        return self.__path.parent / pathlib.Path(f"{name}.sbstore")
 
     @staticmethod
     def __init_store(path: pathlib.Path):
@@ -103,15 +195,44 @@ class EasyStore(AbstractEasyStore):
 
 class SubStore(AbstractSubStore):
 
-    def __init__(self, sub_store_path: pathlib.Path):
+    COMPACTION_THRESHOLD = 0.5
+    LAZY_LOAD_CHUNK_SIZE = 64 * 1024
+    PARALLEL_SCAN_MIN_RANGE_SIZE = 1024 * 1024
+    RESULT_CACHE_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, sub_store_path: pathlib.Path, compaction_threshold: float = COMPACTION_THRESHOLD,
+                 use_mmap: bool = True, result_cache_entries: int = 0, result_cache_size: int = RESULT_CACHE_SIZE):
         self.__sub_store_path = sub_store_path
+        self.__compaction_threshold = compaction_threshold
+        self.__store_map = SubStoreMap(sub_store_path) if use_mmap else None
         self.__meta_collector = MetaSubStoreHandler(sub_store_path)
         self.__sub_store_meta_updater = MetaSubStoreUpdater(sub_store_path)
+        self.__index = SubStoreIndex(sub_store_path, self.__meta_collector)
+        self.__journal = Journal(sub_store_path)
+        self.__record_format = detect_record_format(sub_store_path)
+        self.__columns_cache = ColumnsCache(sub_store_path)
+        self.__lock = get_sub_store_lock(sub_store_path)
+        self.__result_cache = ResultCache(result_cache_entries, result_cache_size)
+        self.__version = 0
 
     @property
     def spec(self) -> List[str]:
         return self.__meta_collector.get_meta_data().fields
 
+    @property
+    def lock_stats(self) -> LockStats:
+        """Lock counters of this sub store in this process, they show how long queries waited for other ones"""
+        return self.__lock.stats
+
+    @property
+    def store_format(self) -> str:
+        return self.__record_format.NAME
+
+    @property
+    def result_cache_stats(self) -> ResultCacheStats:
+        """Hits and misses of get_one and get_many results, the cache is off unless result_cache_entries is set"""
+        return self.__result_cache.stats
+
     def __check_fields(self, inserting=False, **conditions):
         sub_store_validator = ParamForFieldValidator(self.__meta_collector.get_meta_data())
 
@@ -120,154 +241,605 @@ class SubStore(AbstractSubStore):
     def insert_one(self, *args, **kwargs) -> int:
         return self._insert_one(*args, **kwargs)
 
+    def insert_many(self, records: Iterable[Union[dict, Record]]) -> int:
+        return self._insert_many(records)
+
     def update_one(self, conditions: dict, new_params: dict) -> int:
         return self._update_one(conditions, new_params)
 
+    def update_many(self, conditions: dict, new_params: dict) -> int:
+        return self._update_many(conditions, new_params)
+
     def delete_one(self, **conditions) -> int:
         return self._delete_one(**conditions)
 
-    def get_all(self) -> List[Record]:
+    def delete_many(self, **conditions) -> int:
+        return self._delete_many(**conditions)
+
+    def compact(self) -> int:
+        with self.__lock.exclusive():
+            return self.__compact()
+
+    def recover(self) -> int:
+        with self.__lock.exclusive():
+            self.__version += 1
+            return self.__journal.recover()
+
+    def group_commit(self) -> ContextManager[Journal]:
+        return self.__journal.group_commit()
+
+    def session(self) -> SubStoreSession:
+        """Inserts of the session are buffered and written at once, see SubStoreSession"""
+        return SubStoreSession(self, self.__lock.exclusive(), self.__insert_records,
+                               self.__meta_collector.get_meta_data)
+
+    def reserve_ids(self, count: int, field: Optional[str] = None) -> range:
+        """
+        Reserves count ids of auto pk field, field may be omitted if the sub store has one pk.
+        Records with reserved ids can be inserted later by any process, auto ids never take them.
+        """
+        return self._reserve_ids(count, field)
+
+    def get_all(self) -> List[AbstractRecord]:
         return self.get_many()
 
-    def get_one(self, **conditions) -> Optional[Record]:
+    def get_one(self, **conditions) -> Optional[AbstractRecord]:
         return self._get_one(**conditions)
 
-    def get_many(self, **conditions) -> List[Record]:
-        return self._get_many(**conditions)
+    def get_many(self, *, limit: Optional[int] = None, offset: int = 0, fields: Optional[List[str]] = None,
+                 workers: Optional[int] = None, **conditions) -> List[AbstractRecord]:
+        return self._get_many(limit=limit, offset=offset, fields=fields, workers=workers, **conditions)
+
+    def lazy_load(self, *, limit: Optional[int] = None, offset: int = 0, fields: Optional[List[str]] = None,
+                  **conditions) -> SubStoreCursor:
+        return self._lazy_load(limit=limit, offset=offset, fields=fields, **conditions)
 
-    def lazy_load(self, **conditions) -> Generator[Record, None, None]:
-        return self._lazy_load(**conditions)
+    def to_columns(self, fields: Optional[List[str]] = None, **conditions) -> SubStoreColumns:
+        return self._to_columns(fields, **conditions)
 
     def _insert_one(self, *args, **kwargs) -> int:
-        self.__check_fields(inserting=True, **kwargs)
-        return self.__insert_one(self.spec, *args, **kwargs)
+        with self.__lock.exclusive():
+            self.__check_fields(inserting=True, **kwargs)
+            return self.__insert_one(self.spec, *args, **kwargs)
+
+    def _insert_many(self, records: Iterable[Union[dict, Record]]) -> int:
+        with self.__lock.exclusive():
+            meta_info = self.__meta_collector.get_meta_data()
+            inserting_records = [Record(meta_info.fields, **dict(record)) for record in records]
+            sub_store_validator = ParamForFieldValidator(meta_info)
+            sub_store_validator.check_many_fields([dict(record) for record in inserting_records], inserting=True)
+            return self.__insert_records(inserting_records)
 
     def _update_one(self, conditions: dict, new_values: dict) -> int:
-        self.__check_fields(inserting=False, **conditions)
-        self.__check_fields(inserting=True, **new_values)
-        return self.__update_one(conditions, new_values)
-
-    def _delete_one(self, **conditions) -> int:
-        self.__check_fields(**conditions)
-        return self.__delete_one(**conditions)
+        with self.__lock.exclusive():
+            self.__check_conditions(**conditions)
+            self.__check_fields(inserting=True, **new_values)
+            return self.__update_one(conditions, new_values)
 
-    def _get_one(self, **conditions) -> Optional[Record]:
-        self.__check_fields(**conditions)
-        return self.__get_one(**conditions)
+    def _update_many(self, conditions: dict, new_values: dict) -> int:
+        with self.__lock.exclusive():
+            self.__check_conditions(**conditions)
+            self.__check_fields(inserting=True, **new_values)
+            return self.__update_many(conditions, new_values)
 
-    def _get_many(self, **conditions) -> List[Record]:
-        self.__check_fields(**conditions)
-        return self.__get_many(**conditions)
-
-    def _lazy_load(self, **conditions):
-        self.__check_fields(**conditions)
-        return self.__lazy_load(**conditions)
+    def _delete_one(self, **conditions) -> int:
+        with self.__lock.exclusive():
+            self.__check_conditions(**conditions)
+            return self.__delete_one(**conditions)
+
+    def _delete_many(self, **conditions) -> int:
+        with self.__lock.exclusive():
+            self.__check_conditions(**conditions)
+            return self.__delete_many(**conditions)
+
+    def _get_one(self, **conditions) -> Optional[AbstractRecord]:
+        with self.__lock.shared():
+            self.__check_conditions(**conditions)
+            found = self.__get_cached(("one", freeze(conditions)),
+                                      lambda: [record for record in [self.__get_one(**conditions)] if record])
+            return found[0] if found else None
+
+    def _get_many(self, limit: Optional[int] = None, offset: int = 0, fields: Optional[List[str]] = None,
+                  workers: Optional[int] = None, **conditions) -> List[AbstractRecord]:
+        with self.__lock.shared():
+            self.__check_conditions(**conditions)
+            self.__check_field_names(fields)
+            key = ("many", limit, offset, freeze(fields), freeze(conditions))
+            return list(self.__get_cached(key, lambda: self.__get_many(limit, offset, fields, workers,
+                                                                       **conditions)))
+
+    def _lazy_load(self, limit: Optional[int] = None, offset: int = 0, fields: Optional[List[str]] = None,
+                   **conditions) -> SubStoreCursor:
+        """Lock is held only while cursor opens the file, then it reads the file it has opened"""
+        with self.__lock.shared():
+            self.__check_conditions(**conditions)
+            self.__check_field_names(fields)
+            return self.__lazy_load(limit, offset, fields, **conditions)
+
+    def _to_columns(self, fields: Optional[List[str]] = None, **conditions) -> SubStoreColumns:
+        require_numpy()
+        with self.__lock.shared():
+            self.__check_conditions(**conditions)
+            self.__check_field_names(fields)
+            return self.__to_columns(fields, **conditions)
+
+    def _reserve_ids(self, count: int, field: Optional[str] = None) -> range:
+        if count < 1:
+            raise ValueError("Count of reserved ids must be positive")
+        with self.__lock.exclusive():
+            pk_fields = self.__get_pk_fields()
+            if field is None and len(pk_fields) == 1:
+                field = pk_fields[0]
+            if field not in pk_fields:
+                raise NotFoundField()
+            return self.__reserve_ids(count, field)
+
+    def _lock_exclusive(self) -> ContextManager:
+        return self.__lock.exclusive()
+
+    def _checkpoint_journal(self):
+        """Caller must hold the exclusive lock, then no transaction of the journal can be replayed later"""
+        self.__journal.checkpoint()
+
+    def _get_meta_data(self) -> MetaInfo:
+        return self.__meta_collector.get_meta_data()
+
+    def _find(self, limit: Optional[int] = None, **conditions) -> List[Tuple[int, AbstractRecord]]:
+        """Returns (record offset, record) of found records, caller must hold the lock"""
+        self.__check_conditions(**conditions)
+        return self.__find(limit, **conditions)
+
+    def _stage_changes(self, transaction: JournalTransaction, deleted: Sequence[Tuple[int, AbstractRecord]],
+                       updated: Sequence[Tuple[int, AbstractRecord, AbstractRecord]],
+                       inserted: Sequence[AbstractRecord]) -> Callable[[], None]:
+        """
+        Adds data and meta entries of changes to transaction which is committed by a caller, returns function
+        to call after commit. Updated rows which do not fit into their places are moved to the end of the file.
+        Caller must hold the lock from staging till the end of the returned function.
+        """
+        spec = self.spec
+        record_class = get_record_class(spec)
+        decode = get_values_decoder(self.__get_fields_types(spec))
+        record_format = self.__record_format
+        self.__index.actualize()
+        killed = list(deleted)
+        rewritten: List[Tuple[int, AbstractRecord]] = []
+        appended: List[AbstractRecord] = list(inserted)
+        with self.__sub_store_path.open(mode="rb") as st:
+            for offset, _ in deleted:
+                transaction.write(self.__sub_store_path, offset, record_format.encode_tombstone(st, offset))
+            for offset, old_record, new_record in updated:
+                row = record_format.encode_in_place(st, offset, [new_record[field] for field in spec])
+                if row is None:
+                    transaction.write(self.__sub_store_path, offset, record_format.encode_tombstone(st, offset))
+                    killed.append((offset, old_record))
+                    appended.append(new_record)
+                else:
+                    transaction.write(self.__sub_store_path, offset, row)
+                    rewritten.append((offset, new_record))
+            offset = start_offset = st.seek(0, 2)
+        queries = []
+        added: List[Tuple[int, AbstractRecord]] = []
+        for record in appended:
+            values = decode([record[field] for field in spec])
+            query = record_format.encode_row(values)
+            added.append((offset + record_format.ROW_PREFIX_SIZE, record_class(*values)))
+            queries.append(query)
+            offset += len(query)
+        if queries:
+            transaction.write(self.__sub_store_path, start_offset, b"".join(queries))
+        transaction.update_meta(self.__sub_store_path, self.__sub_store_meta_updater.get_meta_changes(
+            deleted_records=[record for _, record in deleted] + [old_record for _, old_record, _ in updated],
+            inserted_records=[record for _, record in added[:len(inserted)]] + [new for _, _, new in updated],
+            dead_rows_count=len(killed)))
+
+        def after_commit():
+            self.__version += 1
+            self.__index.remove_records(killed + [(offset, old_record) for offset, old_record, _ in updated])
+            self.__index.add_records(rewritten + added)
+            if killed:
+                self.__compact_if_needed()
+
+        return after_commit
+
+    def __commit(self, transaction: JournalTransaction):
+        """Every write of this process goes through here, so its version invalidates cached results"""
+        self.__version += 1
+        self.__journal.commit(transaction)
+
+    def __get_cached(self, key: Hashable, load: Callable[[], List[AbstractRecord]]) -> List[AbstractRecord]:
+        """Results are valid while neither this process nor another one has written the file, caller holds lock"""
+        cache = self.__result_cache
+        if not cache.max_entries:
+            return load()
+        state = self.__version, get_file_signature(self.__sub_store_path)
+        return cache.get_or_load(key, state, load)
+
+    def __check_conditions(self, **conditions):
+        """Equality conditions are validated like params, operator conditions are checked when plan is bound"""
+        equal_conditions = {}
+        for key, value in conditions.items():
+            field, operator = split_condition(key)
+            if operator == Operators.EQ:
+                equal_conditions[key] = value
+            elif field not in self.spec:
+                raise NotFoundField()
+        self.__check_fields(**equal_conditions)
+
+    def __check_field_names(self, fields: Optional[List[str]]):
+        spec = self.spec
+        for field in fields or []:
+            if field not in spec:
+                raise NotFoundField()
 
     @params2record
     def __insert_one(self, record: Record) -> int:
+        return self.__insert_records([record])
+
+    def __insert_records(self, records: List[Record]) -> int:
+        if not records:
+            return 0
+        spec = self.spec
+        record_class = get_record_class(spec)
+        decode = get_values_decoder(self.__get_fields_types(spec))
+        record_format = self.__record_format
         auto_filler = AutoFieldAdder(self.__meta_collector)
-        record = auto_filler.add_auto_fields(record)
-        inserted_rows = 0
-        params = {}
-        for field in self.spec:
-            params[field] = record[field]
-
-        query = " ".join([str(value) for value in params.values()])
-
-        with self.__sub_store_path.open(encoding='utf-8', mode='a') as st:
-            st.write("\n{}".format(query))
-            inserted_rows += 1
-        inserted_record = Record(self.spec, **params)
-        self.__sub_store_meta_updater.update_meta_pk_hashes(inserted_records=[inserted_record])
-        return inserted_rows
-
-    def __update_one(self, conditions: dict, new_params: dict):
-        record = self.get_one(**conditions)  # TODO: repair this hardcore code D:
-        for name, value in new_params.items():
-            setattr(record, name, value)
-        self.delete_one(**conditions)
-        new = vars(record)
-        for name, value in new.items():
-            try:
-                new[name] = int(value)
-            except ValueError:
-                pass
-
-        res = self.insert_one(**new)
-        return res
+        records = auto_filler.add_auto_fields_to_many(records)
+        inserted_records: List[Tuple[int, AbstractRecord]] = []
+        queries = []
+
+        self.__index.actualize()
+        offset = start_offset = self.__sub_store_path.stat().st_size
+        for record in records:
+            values = decode([record[field] for field in spec])
+            query = record_format.encode_row(values)
+            inserted_records.append((offset + record_format.ROW_PREFIX_SIZE, record_class(*values)))
+            queries.append(query)
+            offset += len(query)
+        transaction = JournalTransaction()
+        transaction.write(self.__sub_store_path, start_offset, b"".join(queries))
+        transaction.update_meta(self.__sub_store_path, self.__sub_store_meta_updater.get_meta_changes(
+            inserted_records=[record for _, record in inserted_records]))
+        self.__commit(transaction)
+        self.__index.add_records(inserted_records)
+        return len(inserted_records)
+
+    def __update_one(self, conditions: dict, new_params: dict) -> int:
+        found = self.__find(1, **conditions)
+        if not found:
+            return 0
+        self.__update_records(found, new_params)
+        return len(found)
+
+    def __update_many(self, conditions: dict, new_params: dict) -> int:
+        found = self.__find(**conditions)
+        if not found:
+            return 0
+        for field in self.__get_pk_fields():
+            if field in new_params and len(found) > 1:
+                raise UniqueKeyError("Key {} can not be set to {} rows".format(new_params[field], len(found)))
+        self.__update_records(found, new_params)
+        return len(found)
+
+    def __update_records(self, found: List[Tuple[int, AbstractRecord]], new_params: dict):
+        """
+        Rows are rewritten on their places: in place if every new row fits into the old one,
+        otherwise with one streaming pass over the sub store.
+        """
+        spec = self.spec
+        record_class = get_record_class(spec)
+        updated: List[Tuple[int, AbstractRecord]] = []
+        new_rows: Dict[int, List] = {}
+        for offset, record in found:
+            params = {field: record[field] for field in spec}
+            params.update(self.__convert_params(new_params))
+            updated.append((offset, record_class(**params)))
+            new_rows[offset] = list(params.values())
+
+        self.__index.actualize()
+        with self.__sub_store_path.open(mode="rb") as st:
+            in_place_rows = {offset: self.__record_format.encode_in_place(st, offset, values)
+                             for offset, values in new_rows.items()}
+        fitted_rows = {offset: row for offset, row in in_place_rows.items() if row is not None}
+        fits = len(fitted_rows) == len(in_place_rows)
+        transaction = JournalTransaction()
+        kept_records: List[Tuple[int, AbstractRecord]] = []
+        if fits:
+            for offset, row in fitted_rows.items():
+                transaction.write(self.__sub_store_path, offset, row)
+        else:
+            temp_file, kept_records = self.__rewrite_rows(new_rows)
+            transaction.replace(temp_file, self.__sub_store_path)
+            self.__close_store_map()
+
+        changed_pk_fields = [field for field in self.__get_pk_fields() if field in new_params]
+        if changed_pk_fields:
+            transaction.update_meta(self.__sub_store_path, self.__sub_store_meta_updater.get_meta_changes(
+                deleted_records=[Record(changed_pk_fields, *[record[field] for field in changed_pk_fields])
+                                 for _, record in found],
+                inserted_records=[Record(changed_pk_fields, *[record[field] for field in changed_pk_fields])
+                                  for _, record in updated]))
+        self.__commit(transaction)
+        if fits:
+            self.__index.remove_records(found)
+            self.__index.add_records(updated)
+        else:
+            self.__index.rebuild_from(kept_records)
+
+    def __rewrite_rows(self, new_rows: Dict[int, List]) -> Tuple[pathlib.Path, List[Tuple[int, AbstractRecord]]]:
+        """Copies sub store with replaced rows to temp file, returns it and new offsets of all alive rows"""
+        record_class = get_record_class(self.spec)
+        decode = get_values_decoder(self.__get_fields_types(self.spec))
+        record_format = self.__record_format
+        kept_records: List[Tuple[int, AbstractRecord]] = []
+        temp_file = self.__sub_store_path.parent / pathlib.Path(f"{self.__sub_store_path.name}.temp")
+        with self.__sub_store_path.open(mode="rb") as st:
+            with temp_file.open(mode="wb") as temp_st:
+                position = temp_st.write(record_format.HEADER)
+                for offset, alive, row in record_format.read_rows(st):
+                    if offset in new_rows:
+                        row = record_format.encode_row(new_rows[offset])
+                    if alive:
+                        values = decode(record_format.decode_row(row))
+                        kept_records.append((position + record_format.ROW_PREFIX_SIZE, record_class(*values)))
+                    position += temp_st.write(row)
+                sync_file(temp_st)
+
+        return temp_file, kept_records
+
+    def __reserve_ids(self, count: int, field: str) -> range:
+        first_id = self.__meta_collector.get_meta_data().sequences.get(field, 0) + 1
+        transaction = JournalTransaction()
+        transaction.update_meta(self.__sub_store_path,
+                                self.__sub_store_meta_updater.get_sequences_changes({field: first_id + count - 1}))
+        self.__commit(transaction)
+        return range(first_id, first_id + count)
+
+    def __get_pk_fields(self) -> List[str]:
+        meta_info = self.__meta_collector.get_meta_data()
+        return [field for field in meta_info.fields if Validator.pk in meta_info.fields_config.get(field, [])]
 
     def __delete_one(self, **conditions) -> int:
-        result = 0
-        deleted_records: List[Record] = []
+        found = self.__find(1, **conditions)
+        if not found:
+            return 0
+        self.__kill_records(found)
+        return len(found)
+
+    def __delete_many(self, **conditions) -> int:
+        found = self.__find(**conditions)
+        if not found:
+            return 0
+        self.__kill_records(found)
+        return len(found)
+
+    def __kill_records(self, records: List[Tuple[int, AbstractRecord]]):
+        """Deleted rows are overwritten with spaces in place, so offsets of other rows stay the same"""
+        self.__index.actualize()
+        transaction = JournalTransaction()
+        with self.__sub_store_path.open(mode="rb") as st:
+            for offset, _ in records:
+                transaction.write(self.__sub_store_path, offset, self.__record_format.encode_tombstone(st, offset))
+        transaction.update_meta(self.__sub_store_path, self.__sub_store_meta_updater.get_meta_changes(
+            deleted_records=[record for _, record in records], dead_rows_count=len(records)))
+        self.__commit(transaction)
+        self.__index.remove_records(records)
+        self.__compact_if_needed()
+
+    def __compact_if_needed(self):
+        meta_info = self.__meta_collector.get_meta_data()
+        rows_count = meta_info.rows_count
+        if rows_count is None:
+            rows_count = len(self.__get_by_scan(self.__select()))
+            transaction = JournalTransaction()
+            transaction.update_meta(self.__sub_store_path, self.__sub_store_meta_updater.get_stats_changes(
+                rows_count, meta_info.dead_rows_count))
+            self.__commit(transaction)
+        all_rows_count = rows_count + meta_info.dead_rows_count
+        if all_rows_count and meta_info.dead_rows_count / all_rows_count > self.__compaction_threshold:
+            self.compact()
+
+    def __compact(self) -> int:
+        record_class = get_record_class(self.spec)
+        decode = get_values_decoder(self.__get_fields_types(self.spec))
+        record_format = self.__record_format
+        kept_records: List[Tuple[int, AbstractRecord]] = []
         temp_file = self.__sub_store_path.parent / pathlib.Path(f"{self.__sub_store_path.name}.temp")
-        with self.__sub_store_path.open(mode="r") as st:
-            with temp_file.open(mode="w") as temp_st:
-                for line in read_data_until_point(st, FilePoints.RECORDS_START):
-                    temp_st.write(line)
-                temp_st.write(f"{FilePoints.RECORDS_START}\n")
-                for string_data in read_data_until_point(st, FilePoints.RECORDS_END):
-                    data_list = [field for field in string_data.split() if field]
-                    record = Record(self.spec, *data_list)
-                    if not self.__check_record_to_condition(record, **conditions) or result == 1:
-                        temp_st.write(f"{string_data}")
-                    else:
-                        deleted_records.append(record)
-                        result += 1
-
-        self.__sub_store_path = temp_file2main(self.__sub_store_path, temp_file)
-        self.__sub_store_meta_updater.update_meta_pk_hashes(deleted_records=deleted_records)
-        return result
-
-    def __get_one(self, **conditions) -> Optional[Record]:
-        result = None
-        with self.__sub_store_path.open(encoding='utf-8') as st:
-
-            go_to_store_point(st, FilePoints.RECORDS_START)
-            string_data = st.readline()
-            while string_data and result is None:
-                data_list = [field for field in string_data.split() if field]
-                data_record = Record(self.spec, *data_list)
-                if self.__check_record_to_condition(data_record, **conditions):
-                    result = data_record
-                string_data = st.readline()
-        return result
-
-    def __get_many(self, **conditions) -> List[Record]:
-        result = []
-        with self.__sub_store_path.open(encoding='utf-8') as st:
-            go_to_store_point(st, FilePoints.RECORDS_START)
-            string_data = st.readline()
-            while string_data:
-                data_list = [field for field in string_data.split() if field]
-                data_record = Record(self.spec, *data_list)
-                if self.__check_record_to_condition(data_record, **conditions):
-                    result.append(data_record)
-                string_data = st.readline()
-        return result
-
-    def __lazy_load(self, **conditions):
-        record_gen = self.__generator_records_from_store()
-        record = next(record_gen)
-        while record:
-            if self.__check_record_to_condition(record, **conditions):
-                yield record
-        return
-
-    def __generator_records_from_store(self):
-        with self.__sub_store_path.open(encoding='utf-8', mode='r') as st:
-            go_to_store_point(st, FilePoints.RECORDS_START)
-            string_data = st.readline()
-            while string_data:
-                data_list = [field for field in string_data.split() if field]
-                data_record = Record(self.spec, *data_list)
-                yield data_record
-
-        return
+        with self.__sub_store_path.open(mode="rb") as st:
+            with temp_file.open(mode="wb") as temp_st:
+                position = temp_st.write(record_format.HEADER)
+                for _, values in record_format.read_records(st):
+                    kept_records.append((position + record_format.ROW_PREFIX_SIZE, record_class(*decode(values))))
+                    position += temp_st.write(record_format.encode_row(values))
+                sync_file(temp_st)
+
+        transaction = JournalTransaction()
+        transaction.replace(temp_file, self.__sub_store_path)
+        transaction.update_meta(self.__sub_store_path,
+                                self.__sub_store_meta_updater.get_stats_changes(len(kept_records), 0))
+        self.__close_store_map()
+        self.__commit(transaction)
+        self.__index.rebuild_from(kept_records)
+        return len(kept_records)
+
+    def __close_store_map(self):
+        """Mapped file can not be replaced on some platforms"""
+        if self.__store_map is not None:
+            self.__store_map.close()
+
+    def __get_one(self, **conditions) -> Optional[AbstractRecord]:
+        found = self.__find(1, **conditions)
+        return found[0][1] if found else None
+
+    def __get_many(self, limit: Optional[int] = None, skip: int = 0, fields: Optional[List[str]] = None,
+                   workers: Optional[int] = None, **conditions) -> List[AbstractRecord]:
+        return [record for _, record in self.__find(limit, skip, fields, workers, **conditions)]
+
+    def __find(self, limit: Optional[int] = None, skip: int = 0, fields: Optional[List[str]] = None,
+               workers: Optional[int] = None, **conditions) -> List[Tuple[int, AbstractRecord]]:
+        if limit == 0:
+            return []
+        conditions = self.__convert_params(conditions)
+        selection = self.__select(fields, **conditions)
+        indexed_field = self.__get_indexed_field(**conditions)
+        found = self.__get_by_index(selection, indexed_field, limit, skip, **conditions) if indexed_field else None
+        if found is None and workers is not None and workers > 1:
+            found = self.__get_by_parallel_scan(selection, workers, limit, skip, **conditions)
+        if found is None:
+            return self.__get_by_scan(selection, limit, skip, **conditions)
+        return found
+
+    def __select(self, fields: Optional[List[str]] = None, **conditions) -> _Selection:
+        """Only fields and condition fields are decoded, records passed conditions are cut to fields"""
+        spec = self.spec
+        if fields is None:
+            loading_fields, positions = spec, None
+        else:
+            loading_fields = list(fields)
+            for key in conditions:
+                field, _ = split_condition(key)
+                if field not in loading_fields:
+                    loading_fields.append(field)
+            positions = [spec.index(field) for field in loading_fields]
+        matches = self.__get_matcher(loading_fields, conditions)
+        result_fields = list(fields) if fields is not None and len(fields) < len(loading_fields) else None
+        return _Selection(loading_fields, positions, get_values_decoder(self.__get_fields_types(loading_fields)),
+                          matches, result_fields)
+
+    def __get_matcher(self, fields: List[str], conditions: dict) -> Callable[[List], bool]:
+        fields_types = self.__meta_collector.get_meta_data().fields_types
+        return get_predicate_plan(fields, fields_types, list(conditions)).bind(conditions)
+
+    def __get_fields_types(self, fields: List[str]) -> List[Optional[FieldType]]:
+        fields_types = self.__meta_collector.get_meta_data().fields_types
+        return [fields_types.get(field) for field in fields]
+
+    def __convert_params(self, params: dict) -> dict:
+        fields_types = self.__meta_collector.get_meta_data().fields_types
+        return {field: convert_field_value(fields_types.get(field), value) for field, value in params.items()}
+
+    def __get_indexed_field(self, **conditions) -> Optional[str]:
+        for field in self.__index.indexed_fields():
+            if field in conditions:
+                return field
+        return None
+
+    def __get_by_index(self, selection: _Selection, field: str, limit: Optional[int] = None, skip: int = 0,
+                       **conditions) -> Optional[List[Tuple[int, AbstractRecord]]]:
+        """Returns None if index can not be trusted and sub store must be scanned"""
+        offsets = self.__index.get_offsets(field, conditions[field])
+        if not offsets:
+            return []
+        with self.__sub_store_path.open(mode="rb") as st:
+            rows = [(offset, self.__record_format.read_values_at(st, offset, selection.positions))
+                    for offset in offsets]
+        matches = self.__get_matcher(selection.fields, {field: conditions[field]})
+        for _, values in rows:
+            if not matches(selection.decode(values)):
+                self.__index.drop()
+                return None
+        return self.__filter_records(rows, selection, limit, skip)
+
+    def __get_by_scan(self, selection: "_Selection", limit: Optional[int] = None, skip: int = 0,
+                      **conditions) -> List[Tuple[int, AbstractRecord]]:
+        record_format = self.__record_format
+        if self.__store_map is None:
+            with self.__sub_store_path.open(mode="rb") as st:
+                return self.__filter_records(record_format.read_records(st, selection.positions),
+                                             selection, limit, skip)
+        needles = self.__condition_needles(**conditions)
+        if not all(needles):
+            return []
+        rows = record_format.read_mapped_records(self.__store_map.get(), needles, selection.positions)
+        return self.__filter_records(rows, selection, limit, skip)
+
+    def __get_by_parallel_scan(self, selection: _Selection, workers: int, limit: Optional[int] = None, skip: int = 0,
+                               **conditions) -> Optional[List[Tuple[int, AbstractRecord]]]:
+        """
+        Scans row aligned byte ranges of the file in worker processes. Returns None if the file is too small
+        to be split or it was replaced while scanning, then it is scanned in this process.
+        """
+        store_map = self.__store_map if self.__store_map is not None else SubStoreMap(self.__sub_store_path)
+        try:
+            buffer = store_map.get()
+            ranges = self.__record_format.split_ranges(buffer, workers, self.PARALLEL_SCAN_MIN_RANGE_SIZE)
+        finally:
+            if store_map is not self.__store_map:
+                store_map.close()
+        if len(ranges) < 2:
+            return None
+        needles = self.__condition_needles(**conditions)
+        if not all(needles):
+            return []
+        inode = self.__sub_store_path.stat().st_ino
+        fields_types = self.__meta_collector.get_meta_data().fields_types
+        tasks = [ScanTask(self.__sub_store_path, inode, self.store_format, bounds, needles, selection.fields,
+                          selection.positions, fields_types, conditions, selection.result_size)
+                 for bounds in ranges]
+        found = parallel_scan(tasks, workers)
+        if found is None:
+            return None
+        end = skip + limit if limit is not None else None
+        return [(offset, selection.make_record(values)) for offset, values in found[skip:end]]
+
+    def __condition_needles(self, **conditions) -> List[List[bytes]]:
+        """Rows are prefiltered only by equality and in conditions, other operators can not be seen in raw bytes"""
+        record_format = self.__record_format
+        fields_types = self.__meta_collector.get_meta_data().fields_types
+        needles = []
+        for key, value in conditions.items():
+            field, operator = split_condition(key)
+            if operator == Operators.EQ:
+                needles.append(record_format.condition_needles(convert_field_value(fields_types.get(field), value)))
+            elif operator == Operators.IN:
+                needles.append([needle for item in value for needle in
+                                record_format.condition_needles(convert_field_value(fields_types.get(field), item))])
+        return needles
 
     @staticmethod
-    def __check_record_to_condition(record: Record, **conditions):
-        result = True
-        for cond_name, cond_value in conditions.items():
-            if record[cond_name] != str(cond_value):
-                result = False
+    def __filter_records(rows: Iterable[Tuple[int, List]], selection: "_Selection", limit: Optional[int] = None,
+                         skip: int = 0) -> List[Tuple[int, AbstractRecord]]:
+        result: List[Tuple[int, AbstractRecord]] = []
+        for offset, values in rows:
+            data_record = selection.select(values)
+            if data_record is None:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            result.append((offset, data_record))
+            if limit is not None and len(result) == limit:
+                break
         return result
+
+    def __to_columns(self, fields: Optional[List[str]] = None, **conditions) -> SubStoreColumns:
+        spec = self.spec
+        conditions = self.__convert_params(conditions)
+        fields = list(fields) if fields is not None else spec
+        loading_fields = list(fields)
+        for key in conditions:
+            field, _ = split_condition(key)
+            if field not in loading_fields:
+                loading_fields.append(field)
+        fields_types = self.__meta_collector.get_meta_data().fields_types
+        columns = SubStoreColumns(self.__columns_cache.get_columns(spec, fields_types, loading_fields,
+                                                                   self.__read_values))
+        if conditions:
+            columns = columns.where(columns.mask(**conditions))
+        return columns.select(fields)
+
+    def __read_values(self) -> Iterable[List]:
+        decode = get_values_decoder(self.__get_fields_types(self.spec))
+        if self.__store_map is None:
+            with self.__sub_store_path.open(mode="rb") as st:
+                for _, values in self.__record_format.read_records(st):
+                    yield decode(values)
+            return
+        for _, values in self.__record_format.read_mapped_records(self.__store_map.get()):
+            yield decode(values)
+
+    def __lazy_load(self, limit: Optional[int] = None, skip: int = 0, fields: Optional[List[str]] = None,
+                    **conditions) -> SubStoreCursor:
+        selection = self.__select(fields, **self.__convert_params(conditions))
+        return SubStoreCursor(self.__sub_store_path, self.__record_format, selection.select,
+                              self.LAZY_LOAD_CHUNK_SIZE, selection.positions, limit, skip)
@@ -8,3 +8,15 @@ class UniqueKeyError(Exception):
 
 class NegativePrimaryKeyError(Exception):
     pass
+
+
+class UnsupportedFormatError(Exception):
+    pass
+
+
+class LockOrderError(Exception):
+    pass
+
+
+class UnsupportedValueError(Exception):
+    pass
@@ -1,9 +1,10 @@
 import abc
 import enum
 
-from typing import List, Callable, Dict
+from typing import List, Callable, Dict, Set
 
-from easystore.utilis import MetaInfo, Validator
+from easystore.pkset import PkSet
+from easystore.utilis import MetaInfo, Validator, FieldType, convert_field_value
 from easystore import errors
 
 FIELDS_CONFIGS = {"pk": {"unique": True, "type": [int, str]}}
@@ -24,11 +25,14 @@ class ParamForFieldValidator(AbstractForFieldValidator):
         self.__fields = meta_data_from_sub_store.fields
         self.__fields_configs = meta_data_from_sub_store.fields_config
         self.__pk_sets = meta_data_from_sub_store.pk_sets
+        self.__fields_types = meta_data_from_sub_store.fields_types
         self.__sub_store_name = "test"
 
     def validate(self, param_name, value, inserting=True):
         configs = self.__fields_configs.get(param_name, [])
         param_validators = self.__get_right_validators(configs)
+        if param_name in self.__fields_types:
+            param_validators.append(self.__get_type_validator(self.__fields_types[param_name]))
         self._validate(param_name, value, param_validators, inserting)
         return True
 
@@ -36,12 +40,32 @@ class ParamForFieldValidator(AbstractForFieldValidator):
         self._check_fields(inserting=inserting, **conditions)
         return True
 
+    def check_many_fields(self, params_list: List[Dict], inserting=False):
+        self._check_many_fields(params_list, inserting=inserting)
+        return True
+
     def _check_fields(self, inserting=False, **conditions):
         for name, value in conditions.items():
             if name not in self.__fields:
                 raise errors.NotFoundField()
             self.validate(name, value, inserting=inserting)
 
+    def _check_many_fields(self, params_list: List[Dict], inserting=False):
+        batch_pk_sets: Dict[str, Set[int]] = {}
+        for params in params_list:
+            self._check_fields(inserting=inserting, **params)
+            if inserting:
+                self.__check_batch_pk_values(batch_pk_sets, params)
+
+    def __check_batch_pk_values(self, batch_pk_sets: Dict[str, Set[int]], params: Dict):
+        for name, value in params.items():
+            if Validator.pk not in self.__fields_configs.get(name, []):
+                continue
+            batch_pk_set = batch_pk_sets.setdefault(name, set())
+            if value in batch_pk_set:
+                raise errors.UniqueKeyError("Key {} repeats in inserting records".format(value))
+            batch_pk_set.add(value)
+
     @staticmethod
     def _validate(param_name, value, param_validators: List[Callable], inserting=True):
         for validator in param_validators:
@@ -59,7 +83,17 @@ class ParamForFieldValidator(AbstractForFieldValidator):
 
         if config == Validator.pk:
             return self._pk_validator
-        return lambda n, v: 1
+        return lambda n, v, inserting=True: 1
+
+    @staticmethod
+    def __get_type_validator(field_type: FieldType) -> Callable:
+        def type_validator(param_name: str, value, inserting=True):
+            try:
+                convert_field_value(field_type, value)
+            except (TypeError, ValueError):
+                raise TypeError("{} is {} field, {} can not be converted".format(param_name, field_type.value, value))
+
+        return type_validator
 
     def _pk_validator(self, param_name: str, value: int, inserting=True):
         if not isinstance(value, int):
@@ -71,7 +105,7 @@ class ParamForFieldValidator(AbstractForFieldValidator):
             self.__pk_validator(param_name, value)
 
     def __pk_validator(self, param_name: str, value: int):
-        hash_set_of_exists_keys = self.__pk_sets.get(param_name, set())
+        hash_set_of_exists_keys = self.__pk_sets.get(param_name, PkSet())
         if value in hash_set_of_exists_keys:
             raise errors.UniqueKeyError("Key {} exists in SubStore {}".format(value, self.__sub_store_name))
         return
@@ -0,0 +1,243 @@
+import abc
+import json
+import os
+import pathlib
+import tempfile
+import threading
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from easystore.meta import AbstractMetaSubStoreHandler
+from easystore.recordformat import detect_record_format
+from easystore.utilis import (AbstractRecord, Validator, get_record_class, get_values_decoder,
+                              get_file_signature, temp_file2main)
+
+
+@dataclass(frozen=True)
+class IndexPoints:
+    INDEX_START = "#index"
+    VALUES_FORMAT = "json"
+    REMOVED = "-"
+
+
+class AbstractSubStoreIndex(metaclass=abc.ABCMeta):
+    INDEXED_FIELDS_CONFIGS = {Validator.pk, Validator.index}
+
+    @abc.abstractmethod
+    def get_offsets(self, field: str, value) -> List[int]:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def add_records(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def remove_records(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def rebuild_from(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        raise NotImplementedError()
+
+
+class SubStoreIndex(AbstractSubStoreIndex):
+    """
+    Hash index over pk and index fields: maps every field value to byte offsets of its rows in the sub store.
+    Index file header keeps size and mtime of the sub store file it was built for,
+    so an index left behind by somebody who did not update it is rebuilt, not trusted.
+    Readers rebuild it under the shared lock, so the whole file is written to a temp file and replaces the old one,
+    readers of other processes see either of them. Appends are made under the exclusive sub store lock.
+    Offsets of a value are kept in a set, removed ones are appended to the file as "-" lines,
+    and the file is written again from memory when those lines and lines they cancel are more than live ones.
+    Values are written as JSON strings, so values with line breaks keep one line. Malformed file is rebuilt.
+    """
+
+    def __init__(self, sub_store_path: pathlib.Path, meta_handler: AbstractMetaSubStoreHandler):
+        self.__sub_store_path = sub_store_path
+        self.index_file_path = sub_store_path.parent / pathlib.Path(f"{sub_store_path.name}.index")
+        self.__meta_handler = meta_handler
+        self.__offsets: Dict[str, Dict[str, Set[int]]] = {}
+        self.__signature: Optional[Tuple[int, int]] = None
+        self.__lines_count = 0
+        self.__removed_count = 0
+        self.__guard = threading.RLock()
+
+    def indexed_fields(self) -> List[str]:
+        meta_info = self.__meta_handler.get_meta_data()
+        indexed_fields = []
+        for field in meta_info.fields:
+            if self.INDEXED_FIELDS_CONFIGS.intersection(meta_info.fields_config.get(field, [])):
+                indexed_fields.append(field)
+        return indexed_fields
+
+    def get_offsets(self, field: str, value) -> List[int]:
+        self.actualize()
+        return sorted(self.__offsets.get(field, {}).get(str(value), ()))
+
+    def get_offset(self, field: str, value) -> Optional[int]:
+        offsets = self.get_offsets(field, value)
+        return offsets[0] if offsets else None
+
+    def actualize(self):
+        if not self.indexed_fields():
+            return
+        with self.__guard:
+            signature = self.__get_sub_store_signature()
+            if signature == self.__signature:
+                return
+            if not self.__load(signature):
+                self.rebuild()
+
+    def add_records(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        self._add_records(records)
+
+    def remove_records(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        self._remove_records(records)
+
+    def rebuild(self):
+        with self.__sub_store_path.open(mode="rb") as st:
+            self.rebuild_from(self.__records_from_store(st))
+
+    def rebuild_from(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        self._rebuild_from(records)
+
+    def drop(self):
+        self.__offsets = {}
+        self.__signature = None
+        self.__lines_count = self.__removed_count = 0
+        if self.index_file_path.exists():
+            self.index_file_path.unlink()
+
+    def _add_records(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        fields = self.indexed_fields()
+        if not fields:
+            return
+        lines = []
+        for offset, record in records:
+            for field in fields:
+                value = str(record[field])
+                self.__offsets.setdefault(field, {}).setdefault(value, set()).add(offset)
+                lines.append(self.__line(field, offset, value))
+        with self.index_file_path.open(mode="a", encoding="utf-8") as si:
+            si.writelines(lines)
+        self.__lines_count += len(lines)
+        self.__write_signature()
+
+    def _remove_records(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        fields = self.indexed_fields()
+        if not fields:
+            return
+        lines = []
+        for offset, record in records:
+            for field in fields:
+                value = str(record[field])
+                offsets = self.__offsets.get(field, {}).get(value)
+                if offsets is None or offset not in offsets:
+                    continue
+                offsets.discard(offset)
+                if not offsets:
+                    del self.__offsets[field][value]
+                lines.append(self.__line(f"{IndexPoints.REMOVED}{field}", offset, value))
+        self.__lines_count += len(lines)
+        self.__removed_count += len(lines)
+        if self.__removed_count * 4 > self.__lines_count:
+            self.__rewrite()
+            return
+        with self.index_file_path.open(mode="a", encoding="utf-8") as si:
+            si.writelines(lines)
+        self.__write_signature()
+
+    def _rebuild_from(self, records: Iterable[Tuple[int, AbstractRecord]]):
+        fields = self.indexed_fields()
+        self.__offsets = {field: {} for field in fields}
+        for offset, record in records:
+            for field in fields:
+                self.__offsets[field].setdefault(str(record[field]), set()).add(offset)
+        self.__rewrite()
+
+    def __rewrite(self):
+        """Writes offsets kept in memory to the index file, so it has no removed lines"""
+        lines = [self.__line(field, offset, value)
+                 for field, values in self.__offsets.items()
+                 for value, offsets in values.items()
+                 for offset in sorted(offsets)]
+        signature = self.__get_sub_store_signature()
+        descriptor, temp_path = tempfile.mkstemp(prefix=f"{self.index_file_path.name}.", suffix=".temp",
+                                                 dir=self.index_file_path.parent)
+        try:
+            with open(descriptor, mode="w", encoding="utf-8") as si:
+                si.write(self.__header(signature))
+                si.writelines(lines)
+            temp_file2main(self.index_file_path, pathlib.Path(temp_path))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.__lines_count = len(lines)
+        self.__removed_count = 0
+        self.__signature = signature
+
+    def __load(self, signature: Tuple[int, int]) -> bool:
+        if not self.index_file_path.exists():
+            return False
+        offsets: Dict[str, Dict[str, Set[int]]] = {field: {} for field in self.indexed_fields()}
+        lines_count = removed_count = 0
+        with self.index_file_path.open(encoding="utf-8") as si:
+            if si.readline() != self.__header(signature):
+                return False
+            for line in si:
+                parsed = self.__parse_line(line)
+                if parsed is None:
+                    return False
+                field, offset, value = parsed
+                lines_count += 1
+                if field.startswith(IndexPoints.REMOVED):
+                    removed_from = offsets.get(field[1:], {}).get(value, set())
+                    if offset not in removed_from:
+                        return False
+                    removed_from.remove(offset)
+                    removed_count += 1
+                else:
+                    offsets.setdefault(field, {}).setdefault(value, set()).add(offset)
+        self.__offsets = offsets
+        self.__signature = signature
+        self.__lines_count, self.__removed_count = lines_count, removed_count
+        return True
+
+    def __write_signature(self):
+        signature = self.__get_sub_store_signature()
+        with self.index_file_path.open(mode="r+b") as si:
+            si.write(self.__header(signature).encode("utf-8"))
+        self.__signature = signature
+
+    def __records_from_store(self, st) -> Iterable[Tuple[int, AbstractRecord]]:
+        meta_info = self.__meta_handler.get_meta_data()
+        record_class = get_record_class(meta_info.fields)
+        decode = get_values_decoder([meta_info.fields_types.get(field) for field in meta_info.fields])
+        for offset, values in detect_record_format(self.__sub_store_path).read_records(st):
+            yield offset, record_class(*decode(values))
+
+    def __get_sub_store_signature(self) -> Tuple[int, int]:
+        _, size, mtime = get_file_signature(self.__sub_store_path)
+        return size, mtime
+
+    @staticmethod
+    def __line(field: str, offset: int, value: str) -> str:
+        return f"{field} {offset} {json.dumps(value)}\n"
+
+    @staticmethod
+    def __parse_line(line: str) -> Optional[Tuple[str, int, str]]:
+        """Returns None for a line which is cut off or is not written by this version"""
+        try:
+            field, offset, value = line.rstrip("\n").split(" ", 2)
+            parsed_value = json.loads(value)
+            if not line.endswith("\n") or not isinstance(parsed_value, str):
+                return None
+            return field, int(offset), parsed_value
+        except ValueError:
+            return None
+
+    @staticmethod
+    def __header(signature: Tuple[int, int]) -> str:
+        size, mtime = signature
+        return f"{IndexPoints.INDEX_START} {IndexPoints.VALUES_FORMAT} {size:020d} {mtime:020d}\n"
@@ -0,0 +1,206 @@
+import abc
+import base64
+import contextlib
+import json
+import os
+import pathlib
+
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Set, Iterator, Optional
+
+from easystore.meta import MetaChanges, MetaSubStoreUpdater
+
+
+@dataclass(frozen=True)
+class JournalOperations:
+    BEGIN = "begin"
+    WRITE = "write"
+    REPLACE = "replace"
+    META = "meta"
+    COMMIT = "commit"
+
+
+class JournalTransaction:
+    """Ordered list of mutations that are applied all together or not applied at all"""
+
+    def __init__(self):
+        self.entries: List[Dict] = []
+
+    def write(self, path: pathlib.Path, offset: int, data: bytes):
+        self.entries.append({"op": JournalOperations.WRITE, "file": path.name, "offset": offset,
+                             "data": base64.b64encode(data).decode("ascii")})
+
+    def replace(self, temp_path: pathlib.Path, path: pathlib.Path):
+        """Temp file must be completely written and synced before commit"""
+        self.entries.append({"op": JournalOperations.REPLACE, "file": path.name, "temp": temp_path.name})
+
+    def update_meta(self, sub_store_path: pathlib.Path, changes: MetaChanges):
+        self.entries.append({"op": JournalOperations.META, "file": sub_store_path.name, "changes": asdict(changes)})
+
+    def has_replace(self) -> bool:
+        return any(entry["op"] == JournalOperations.REPLACE for entry in self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+
+class AbstractJournal(metaclass=abc.ABCMeta):
+
+    @abc.abstractmethod
+    def commit(self, transaction: JournalTransaction):
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def recover(self) -> int:
+        raise NotImplementedError()
+
+
+class Journal(AbstractJournal):
+    """
+    Write-ahead journal of a sub store. Transaction is written to the journal and synced
+    before its changes touch the sub store and meta files, so after a crash committed
+    transactions are replayed and not committed ones are thrown away.
+    Every write is idempotent, meta changes keep absolute values, so a replay over already applied
+    changes gives the same files. Journal is truncated on checkpoint, after sub store files are synced.
+    """
+    CHECKPOINT_SIZE = 1024 * 1024
+
+    def __init__(self, sub_store_path: pathlib.Path):
+        self.__sub_store_path = sub_store_path
+        self.journal_path = sub_store_path.parent / pathlib.Path(f"{sub_store_path.name}.journal")
+        self.__group_depth = 0
+        self.__not_synced = False
+        self.__touched_files: Set[str] = set()
+
+    def commit(self, transaction: JournalTransaction):
+        self._commit(transaction)
+
+    def recover(self) -> int:
+        return self._recover()
+
+    def checkpoint(self):
+        """Nothing is done for an empty journal, otherwise files of its sub store are synced and it is truncated"""
+        if self.journal_path.exists() and self.journal_path.stat().st_size:
+            self._checkpoint()
+
+    @contextlib.contextmanager
+    def group_commit(self) -> Iterator["Journal"]:
+        """
+        Transactions committed inside share one journal fsync at the end of the group.
+        A crash of the process loses nothing, a crash of the system can lose the not synced group.
+        """
+        self.__group_depth += 1
+        try:
+            yield self
+        finally:
+            self.__group_depth -= 1
+            if not self.__group_depth and self.__not_synced:
+                self.__sync_journal()
+
+    def _commit(self, transaction: JournalTransaction):
+        if not transaction:
+            return
+        if transaction.has_replace():
+            self._checkpoint()
+        self.__write_transaction(transaction)
+        self.__apply(transaction.entries)
+        if self.journal_path.stat().st_size > self.CHECKPOINT_SIZE and not self.__group_depth:
+            self._checkpoint()
+
+    def _recover(self) -> int:
+        if not self.journal_path.exists() or not self.journal_path.stat().st_size:
+            return 0
+        replayed = 0
+        for entries, committed in self.__read_transactions():
+            if committed:
+                self.__apply(entries)
+                replayed += 1
+            else:
+                self.__roll_back(entries)
+        self._checkpoint()
+        return replayed
+
+    def _checkpoint(self):
+        """Files may be written by journals of other objects or processes, so own files are synced always"""
+        own_files = {self.__sub_store_path.name, f"{self.__sub_store_path.name}.meta"}
+        for file_name in self.__touched_files | own_files:
+            self.__sync_file(self.__sub_store_path.parent / pathlib.Path(file_name))
+        self.__sync_directory()
+        with self.journal_path.open(mode="wb") as sj:
+            os.fsync(sj.fileno())
+        self.__touched_files.clear()
+        self.__not_synced = False
+
+    def __write_transaction(self, transaction: JournalTransaction):
+        lines = [json.dumps({"op": JournalOperations.BEGIN})]
+        lines.extend(json.dumps(entry) for entry in transaction.entries)
+        lines.append(json.dumps({"op": JournalOperations.COMMIT}))
+        with self.journal_path.open(mode="a", encoding="utf-8") as sj:
+            sj.write("\n".join(lines) + "\n")
+            sj.flush()
+            if self.__group_depth:
+                self.__not_synced = True
+            else:
+                os.fsync(sj.fileno())
+
+    def __sync_journal(self):
+        with self.journal_path.open(mode="a") as sj:
+            os.fsync(sj.fileno())
+        self.__not_synced = False
+
+    def __read_transactions(self) -> Iterator[tuple]:
+        entries: Optional[List[Dict]] = None
+        with self.journal_path.open(encoding="utf-8") as sj:
+            for line in sj:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry["op"] == JournalOperations.BEGIN:
+                    if entries is not None:
+                        yield entries, False
+                    entries = []
+                elif entry["op"] == JournalOperations.COMMIT and entries is not None:
+                    yield entries, True
+                    entries = None
+                elif entries is not None:
+                    entries.append(entry)
+        if entries is not None:
+            yield entries, False
+
+    def __apply(self, entries: List[Dict]):
+        directory = self.__sub_store_path.parent
+        for entry in entries:
+            path = directory / pathlib.Path(entry["file"])
+            if entry["op"] == JournalOperations.WRITE:
+                with path.open(mode="r+b") as st:
+                    st.seek(entry["offset"])
+                    st.write(base64.b64decode(entry["data"]))
+            elif entry["op"] == JournalOperations.REPLACE:
+                temp_path = directory / pathlib.Path(entry["temp"])
+                if temp_path.exists():
+                    os.replace(temp_path, path)
+            elif entry["op"] == JournalOperations.META:
+                MetaSubStoreUpdater(path).apply_meta_changes(MetaChanges(**entry["changes"]))
+                path = path.parent / pathlib.Path(f"{path.name}.meta")
+            self.__touched_files.add(path.name)
+
+    def __roll_back(self, entries: List[Dict]):
+        for entry in entries:
+            if entry["op"] == JournalOperations.REPLACE:
+                temp_path = self.__sub_store_path.parent / pathlib.Path(entry["temp"])
+                temp_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def __sync_file(path: pathlib.Path):
+        if not path.exists():
+            return
+        with path.open(mode="rb") as file:
+            os.fsync(file.fileno())
+
+    def __sync_directory(self):
+        directory_fd = os.open(self.__sub_store_path.parent, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
@@ -0,0 +1,182 @@
+import contextlib
+import importlib
+import pathlib
+import threading
+import time
+
+from dataclasses import dataclass, replace
+from types import ModuleType
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+try:
+    fcntl: Optional[ModuleType] = importlib.import_module("fcntl")
+except ImportError:
+    fcntl = None
+
+
+@dataclass
+class LockStats:
+    """Counters of one lock in this process, wait times are in seconds"""
+    shared_acquired: int = 0
+    exclusive_acquired: int = 0
+    contended: int = 0
+    wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+
+class SubStoreLock:
+    """
+    Readers/writer lock of a sub store shared by threads and processes: readers go in parallel,
+    writers go one by one. In this process readers count and the writer are kept under a condition,
+    waiting writers go before new readers. The process takes flock lock of the lock file, shared while
+    it has readers and exclusive while it has a writer, so processes are coordinated the same way.
+    A thread can take the lock again while holding it: nested shared lock inside exclusive one does nothing
+    and nested exclusive lock upgrades shared one. Upgrade lets the shared lock go before it waits, like flock does.
+    Without fcntl (Windows) only threads of one process are coordinated.
+    """
+
+    def __init__(self, lock_path: pathlib.Path):
+        self.lock_path = lock_path
+        self.__condition = threading.Condition()
+        self.__readers = 0
+        self.__writer: Optional[int] = None
+        self.__waiting_writers = 0
+        self.__held = threading.local()
+        self.__file: Optional[BinaryIO] = None
+        self.__stats = LockStats()
+
+    @property
+    def stats(self) -> LockStats:
+        with self.__condition:
+            return replace(self.__stats)
+
+    @contextlib.contextmanager
+    def shared(self) -> Iterator["SubStoreLock"]:
+        with self.__hold(exclusive=False):
+            yield self
+
+    @contextlib.contextmanager
+    def exclusive(self) -> Iterator["SubStoreLock"]:
+        with self.__hold(exclusive=True):
+            yield self
+
+    @contextlib.contextmanager
+    def __hold(self, exclusive: bool) -> Iterator[None]:
+        modes = self.__get_thread_modes()
+        held_exclusive = any(modes)
+        started = time.perf_counter()
+        upgrading = exclusive and not held_exclusive and bool(modes)
+        if not modes or upgrading:
+            self.__acquire(exclusive, upgrading, started)
+        else:
+            self.__acquire_nested(exclusive)
+        modes.append(exclusive)
+        try:
+            yield
+        finally:
+            modes.pop()
+            if not modes:
+                self.__release(exclusive)
+            elif upgrading:
+                self.__downgrade()
+
+    def __get_thread_modes(self) -> List[bool]:
+        modes = getattr(self.__held, "modes", None)
+        if modes is None:
+            modes = self.__held.modes = []
+        return modes
+
+    def __acquire(self, exclusive: bool, upgrading: bool, started: float):
+        with self.__condition:
+            if upgrading:
+                self.__readers -= 1
+            contended = False
+            if exclusive:
+                self.__waiting_writers += 1
+                while self.__writer is not None or self.__readers:
+                    contended = True
+                    self.__condition.wait()
+                self.__waiting_writers -= 1
+                self.__writer = threading.get_ident()
+                contended = self.__flock(exclusive=True) or contended
+            else:
+                while self.__writer is not None or self.__waiting_writers:
+                    contended = True
+                    self.__condition.wait()
+                if not self.__readers:
+                    contended = self.__flock(exclusive=False) or contended
+                self.__readers += 1
+            self.__count(exclusive, contended, time.perf_counter() - started)
+
+    def __acquire_nested(self, exclusive: bool):
+        with self.__condition:
+            self.__count(exclusive, False, 0.0)
+
+    def __release(self, exclusive: bool):
+        with self.__condition:
+            if exclusive:
+                self.__writer = None
+            else:
+                self.__readers -= 1
+            if self.__writer is None and not self.__readers:
+                self.__unlock()
+            self.__condition.notify_all()
+
+    def __downgrade(self):
+        with self.__condition:
+            self.__writer = None
+            self.__readers += 1
+            self.__flock(exclusive=False)
+            self.__condition.notify_all()
+
+    def __flock(self, exclusive: bool) -> bool:
+        """Returns True if the lock was taken by another process and it had to wait"""
+        if fcntl is None:
+            return False
+        if self.__file is None:
+            self.__file = self.lock_path.open(mode="a+b")
+        operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(self.__file.fileno(), operation | fcntl.LOCK_NB)
+            return False
+        except BlockingIOError:
+            fcntl.flock(self.__file.fileno(), operation)
+            return True
+
+    def __unlock(self):
+        lock_file = self.__file
+        if lock_file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        lock_file.close()
+        self.__file = None
+
+    def __count(self, exclusive: bool, contended: bool, wait_time: float):
+        stats = self.__stats
+        if exclusive:
+            stats.exclusive_acquired += 1
+        else:
+            stats.shared_acquired += 1
+        if contended:
+            stats.contended += 1
+            stats.wait_time += wait_time
+            stats.max_wait_time = max(stats.max_wait_time, wait_time)
+
+
+LOCKS: Dict[pathlib.Path, SubStoreLock] = {}
+LOCKS_GUARD = threading.Lock()
+
+
+def get_sub_store_lock(sub_store_path: pathlib.Path) -> SubStoreLock:
+    """
+    Returns lock of sub store shared by all its SubStore objects of this process,
+    flock locks of two open files of one process would block each other
+    """
+    lock_path = pathlib.Path(f"{sub_store_path}.lock").absolute()
+    with LOCKS_GUARD:
+        lock = LOCKS.get(lock_path)
+        if lock is None:
+            lock = SubStoreLock(lock_path)
+            LOCKS[lock_path] = lock
+        return lock
@@ -0,0 +1,44 @@
+import mmap
+import pathlib
+import threading
+
+from typing import Optional, Tuple, Union
+
+from easystore.utilis import get_file_signature
+
+
+class SubStoreMap:
+    """
+    Read only memory map of a sub store file. The file is mapped once and mapped again
+    only after its inode, size or mtime changed, so queries of one SubStore share the mapping
+    and readers of different processes share the page cache. Parallel readers map the file once.
+    """
+
+    def __init__(self, sub_store_path: pathlib.Path):
+        self.__sub_store_path = sub_store_path
+        self.__map: Optional[mmap.mmap] = None
+        self.__signature: Optional[Tuple[int, int, int]] = None
+        self.__guard = threading.RLock()
+
+    def get(self) -> Union[mmap.mmap, bytes]:
+        with self.__guard:
+            signature = get_file_signature(self.__sub_store_path)
+            if signature != self.__signature:
+                self.close()
+                self.__map = self.__map_file(signature)
+                self.__signature = signature
+            return self.__map if self.__map is not None else b""
+
+    def close(self):
+        with self.__guard:
+            if self.__map is not None:
+                self.__map.close()
+            self.__map = None
+            self.__signature = None
+
+    def __map_file(self, signature: Tuple[int, int, int]) -> Optional[mmap.mmap]:
+        _, size, _ = signature
+        if not size:
+            return None
+        with self.__sub_store_path.open(mode="rb") as st:
+            return mmap.mmap(st.fileno(), 0, access=mmap.ACCESS_READ)
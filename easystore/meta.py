@@ -1,15 +1,19 @@
 import abc
+import os
 import pathlib
 
-from dataclasses import dataclass
-from typing import List, Dict, Set, Optional, Iterable
+from dataclasses import dataclass, field
+from typing import List, Dict, Set, Optional, Iterable, Sequence, Tuple
 
+from easystore.pkset import PkSet
 from easystore.utilis import (config2validator_type,
+                              is_field_type_config,
+                              FieldType,
                               MetaInfo,
                               go_to_store_point,
                               read_data_until_point,
                               FilePoints,
-                              Record, temp_file2main)
+                              AbstractRecord, get_file_signature, temp_file2main)
 
 
 @dataclass(frozen=True)
@@ -18,6 +22,14 @@ class MetaTypes:
     END_START_HASHES = "#endhashes"
 
 
+@dataclass
+class MetaChanges:
+    deleted_keys: Dict[str, List[str]]
+    inserted_keys: Dict[str, List[str]]
+    stats: Dict[str, int]
+    sequences: Dict[str, int] = field(default_factory=dict)
+
+
 class AbstractMetaSubStoreHandler(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
@@ -29,46 +41,113 @@ class AbstractMetaSubStoreUpdater(metaclass=abc.ABCMeta):
     pass
 
 
+class MetaCache:
+    """
+    Process wide cache of parsed meta files, shared by all handlers of the same path.
+    Entry is valid while inode, size and mtime of the meta file stay the same.
+    """
+
+    def __init__(self):
+        self.__entries: Dict[str, Tuple[Tuple[int, int, int], MetaInfo]] = {}
+
+    def get(self, key: str, signature: Tuple[int, int, int]) -> Optional[MetaInfo]:
+        entry = self.__entries.get(key)
+        if entry is None or entry[0] != signature:
+            return None
+        return entry[1]
+
+    def put(self, key: str, signature: Tuple[int, int, int], meta_info: MetaInfo):
+        self.__entries[key] = (signature, meta_info)
+
+    def invalidate(self, key: str):
+        self.__entries.pop(key, None)
+
+    def clear(self):
+        self.__entries.clear()
+
+
+META_CACHE = MetaCache()
+
+
 class MetaSubStoreHandler(AbstractMetaSubStoreHandler):
+    """Returned MetaInfo is shared through META_CACHE, so it must not be changed by callers"""
 
     def __init__(self, main_sub_store_path: pathlib.Path):
         self.meta_file_path = main_sub_store_path.parent / pathlib.Path(f"{main_sub_store_path.name}.meta")
+        self.cache_key = os.path.abspath(self.meta_file_path)
 
     def get_meta_data(self) -> MetaInfo:
         return self._get_meta_data()
 
+    def invalidate(self):
+        META_CACHE.invalidate(self.cache_key)
+
     def _get_meta_data(self):
-        spec, spec_config, keys_hashes = self.__get_meta_data()
-        return MetaInfo(fields=spec, fields_config=spec_config, pk_sets=keys_hashes)
+        signature = get_file_signature(self.meta_file_path)
+        meta_info = META_CACHE.get(self.cache_key, signature)
+        if meta_info is None:
+            spec, spec_config, spec_types, keys_hashes, stats, sequences = self.__get_meta_data()
+            meta_info = MetaInfo(fields=spec, fields_config=spec_config, pk_sets=keys_hashes,
+                                 rows_count=stats.get("rows"), dead_rows_count=stats.get("dead", 0),
+                                 fields_types=spec_types, sequences=sequences)
+            META_CACHE.put(self.cache_key, signature, meta_info)
+        return meta_info
 
     def __get_meta_data(self):
-        spec, spec_configs = self.__get_spec_data()
-        keys_hashes = self.__get_hashes_for_keys()
-        return spec, spec_configs, keys_hashes
-
-    def __get_spec_data(self):
         with self.meta_file_path.open() as stm:
-            spec_line = stm.readline()
-            spec_configs = {}
-            spec = []
-            for field in spec_line.split():
-                field_name, *field_configs = field.replace(']', '').replace('[', ' ').split(' ')
-                spec.append(field_name)
-                spec_configs[field_name] = [config2validator_type(config) for config in field_configs]
+            spec, spec_configs, spec_types = self.__get_spec_data(stm)
+            keys_hashes = self.__get_hashes_for_keys(stm)
+            sections = self.__get_number_sections(stm)
+        stats = sections.get(FilePoints.STATS_START, {})
+        sequences = sections.get(FilePoints.SEQUENCES_START, {})
+        for key, hash_keys in keys_hashes.items():
+            if key not in sequences:
+                sequences[key] = hash_keys.max()
+        return spec, spec_configs, spec_types, keys_hashes, stats, sequences
+
+    @staticmethod
+    def __get_spec_data(stm):
+        spec_line = stm.readline()
+        spec_configs = {}
+        spec_types = {}
+        spec = []
+        for field in spec_line.split():
+            field_name, *field_configs = field.replace(']', '').replace('[', ' ').split(' ')
+            spec.append(field_name)
+            spec_configs[field_name] = [config2validator_type(config) for config in field_configs
+                                        if not is_field_type_config(config)]
+            for config in field_configs:
+                if is_field_type_config(config):
+                    spec_types[field_name] = FieldType[config]
 
-        return spec, spec_configs
+        return spec, spec_configs, spec_types
 
-    def __get_hashes_for_keys(self):
+    @staticmethod
+    def __get_hashes_for_keys(stm):
         keys_hashes = {}
-        with self.meta_file_path.open() as stm:
-            go_to_store_point(stm, FilePoints.PK_SETS_START)
+        go_to_store_point(stm, FilePoints.PK_SETS_START)
 
-            for line in read_data_until_point(stm, FilePoints.PK_SETS_END):
-                key, *hash_keys = line.split()
-                keys_hashes[key] = {int(key) for key in hash_keys}
+        for line in read_data_until_point(stm, FilePoints.PK_SETS_END):
+            key, *hash_keys = line.split()
+            keys_hashes[key] = PkSet.decode(hash_keys)
 
         return keys_hashes
 
+    @staticmethod
+    def __get_number_sections(stm) -> Dict[str, Dict[str, int]]:
+        """Stats and sequences sections go after pk sets, meta files of old versions have not them"""
+        sections_ends = {FilePoints.STATS_START: FilePoints.STATS_END,
+                         FilePoints.SEQUENCES_START: FilePoints.SEQUENCES_END}
+        sections: Dict[str, Dict[str, int]] = {}
+        for line in stm:
+            section_start = line.rstrip("\n")
+            if section_start in sections_ends:
+                section = sections.setdefault(section_start, {})
+                for section_line in read_data_until_point(stm, sections_ends[section_start]):
+                    name, value = section_line.split()
+                    section[name] = int(value)
+        return sections
+
 
 class MetaSubStoreUpdater(AbstractMetaSubStoreUpdater):
 
@@ -77,33 +156,79 @@ class MetaSubStoreUpdater(AbstractMetaSubStoreUpdater):
         self.__meta_handler = MetaSubStoreHandler(sub_store_path)
 
     def update_meta_pk_hashes(self,
-                              deleted_records: List[Record] = None,
-                              inserted_records: List[Record] = None):
+                              deleted_records: Optional[Sequence[AbstractRecord]] = None,
+                              inserted_records: Optional[Sequence[AbstractRecord]] = None,
+                              dead_rows_count: int = 0):
+        self.apply_meta_changes(self.get_meta_changes(deleted_records, inserted_records, dead_rows_count))
+
+    def update_meta_stats(self, rows_count: Optional[int], dead_rows_count: int):
+        self.apply_meta_changes(self.get_stats_changes(rows_count, dead_rows_count))
+
+    def get_meta_changes(self,
+                         deleted_records: Optional[Sequence[AbstractRecord]] = None,
+                         inserted_records: Optional[Sequence[AbstractRecord]] = None,
+                         dead_rows_count: int = 0) -> MetaChanges:
         deleted_records = deleted_records if deleted_records else []
         inserted_records = inserted_records if inserted_records else []
 
-        self._update_meta_pk_hashes(deleted_records, inserted_records)
+        return self._get_meta_changes(deleted_records, inserted_records, dead_rows_count)
 
-    def _update_meta_pk_hashes(self, deleted_records: List[Record],
-                               inserted_records: List[Record]):
+    def get_stats_changes(self, rows_count: Optional[int], dead_rows_count: int) -> MetaChanges:
+        return MetaChanges(deleted_keys={}, inserted_keys={}, stats=self.__stats(rows_count, dead_rows_count))
+
+    def get_sequences_changes(self, sequences: Dict[str, int]) -> MetaChanges:
+        """Moves sequences of auto pk fields forward, values up to the new ones are never given again"""
         meta_info = self.__meta_handler.get_meta_data()
+        return MetaChanges(deleted_keys={}, inserted_keys={},
+                           stats=self.__stats(meta_info.rows_count, meta_info.dead_rows_count), sequences=sequences)
+
+    def apply_meta_changes(self, changes: MetaChanges):
+        """
+        Applying the same changes twice gives the same meta, journal replays them after a crash.
+        Sequences only grow, so ids of deleted records are not given again.
+        """
+        sequences = dict(self.__meta_handler.get_meta_data().sequences)
+        for key_name, value in changes.sequences.items():
+            sequences[key_name] = max(sequences.get(key_name, 0), value)
+        self.__update_meta_pk_hashes(changes.deleted_keys, changes.inserted_keys, changes.stats, sequences)
+
+    def _get_meta_changes(self, deleted_records: Sequence[AbstractRecord],
+                          inserted_records: Sequence[AbstractRecord], dead_rows_count: int) -> MetaChanges:
+        meta_info = self.__meta_handler.get_meta_data()
+        rows_count = meta_info.rows_count
+        if rows_count is not None:
+            rows_count += len(inserted_records) - len(deleted_records)
+        dead_rows_count += meta_info.dead_rows_count
         primary_keys = meta_info.pk_sets.keys()
-        key_values_for_deleting: Dict[str, Set] = {key: set() for key in primary_keys}
-        key_values_for_inserting: Dict[str, List] = {key: [] for key in primary_keys}
+        key_values_for_deleting: Dict[str, List[str]] = {key: [] for key in primary_keys}
+        key_values_for_inserting: Dict[str, List[str]] = {key: [] for key in primary_keys}
+        sequences: Dict[str, int] = {}
         for record in deleted_records:
             for key_name in primary_keys:
-                key_value = getattr(record, key_name)
+                key_value = record[key_name]
                 if key_value:
-                    key_values_for_deleting[key_name].add(key_value)
+                    key_values_for_deleting[key_name].append(str(key_value))
         for record in inserted_records:
             for key_name in primary_keys:
-                key_value = getattr(record, key_name)
+                key_value = record[key_name]
                 if key_value:
-                    key_values_for_inserting[key_name].append(key_value)
-        self.__update_meta_pk_hashes(key_values_for_deleting, key_values_for_inserting)
+                    key_values_for_inserting[key_name].append(str(key_value))
+                    sequences[key_name] = max(sequences.get(key_name, 0), int(key_value))
+        return MetaChanges(deleted_keys=key_values_for_deleting,
+                           inserted_keys=key_values_for_inserting,
+                           stats=self.__stats(rows_count, dead_rows_count),
+                           sequences=sequences)
+
+    @staticmethod
+    def __stats(rows_count: Optional[int], dead_rows_count: int) -> Dict[str, int]:
+        stats = {"dead": dead_rows_count}
+        if rows_count is not None:
+            stats["rows"] = rows_count
+        return stats
 
-    def __update_meta_pk_hashes(self, key_values_for_deleting: Dict[str, Set[str]],
-                                key_values_for_inserting: Dict[str, List[str]]):
+    def __update_meta_pk_hashes(self, key_values_for_deleting: Dict[str, List[str]],
+                                key_values_for_inserting: Dict[str, List[str]],
+                                stats: Dict[str, int], sequences: Dict[str, int]):
         temp_meta = pathlib.Path(f"{self.__meta_sub_store_path.parent}/"
                                  f"{self.__meta_sub_store_path.name}.temp")
         with self.__meta_sub_store_path.open(mode="r") as stm:
@@ -113,15 +238,22 @@ class MetaSubStoreUpdater(AbstractMetaSubStoreUpdater):
                 stm_temp.write(f"{FilePoints.PK_SETS_START}\n")
                 for line in read_data_until_point(stm, FilePoints.PK_SETS_END):
                     pk_name, *pk_list = line.split()
-                    pk_set = set(pk_list)
-                    for pk_for_delete in key_values_for_deleting.get(pk_name, []):
-                        pk_set.remove(str(pk_for_delete))
-                    for pk_for_adding in key_values_for_inserting.get(pk_name, []):
-                        pk_set.add(pk_for_adding)
-                    query = f"{pk_name} {' '.join([str(pk) for pk in pk_set])}\n"
+                    pk_set = PkSet.decode(pk_list)
+                    pk_set.difference_update(int(value) for value in key_values_for_deleting.get(pk_name, []))
+                    pk_set.update(int(value) for value in key_values_for_inserting.get(pk_name, []))
+                    query = f"{pk_name} {pk_set.encode()}\n"
                     stm_temp.write(query)
                 stm_temp.write(f"{FilePoints.PK_SETS_END}\n")
+                stm_temp.write(f"{FilePoints.STATS_START}\n")
+                for name, value in stats.items():
+                    stm_temp.write(f"{name} {value}\n")
+                stm_temp.write(f"{FilePoints.STATS_END}\n")
+                stm_temp.write(f"{FilePoints.SEQUENCES_START}\n")
+                for name, value in sequences.items():
+                    stm_temp.write(f"{name} {value}\n")
+                stm_temp.write(f"{FilePoints.SEQUENCES_END}\n")
         self.__meta_sub_store_path = temp_file2main(self.__meta_sub_store_path, temp_meta)
+        self.__meta_handler.invalidate()
 
     def _add_new_pk_key(self, pk_name: str, pk_key: int):
         pass
@@ -0,0 +1,85 @@
+import argparse
+import pathlib
+
+from typing import List, Optional
+
+from easystore.errors import UnsupportedValueError
+from easystore.index import SubStoreIndex
+from easystore.journal import Journal, JournalTransaction
+from easystore.locking import get_sub_store_lock
+from easystore.meta import MetaSubStoreHandler, MetaSubStoreUpdater
+from easystore.recordformat import StoreFormats, detect_record_format, get_record_format
+from easystore.utilis import Validator, get_values_decoder, sync_file
+
+
+def migrate_sub_store(sub_store_path: pathlib.Path, store_format: str) -> int:
+    """
+    Rewrites sub store rows into store_format, returns count of moved records.
+    Text stores keep every value as str, so typed values are decoded and pk values are turned back into int
+    on the way to binary format. Values are checked before anything is written: migration to text format
+    is refused with UnsupportedValueError if a value is empty or has whitespace.
+    SubStore objects opened before migration must be recreated.
+    """
+    sub_store_path = pathlib.Path(sub_store_path)
+    with get_sub_store_lock(sub_store_path).exclusive():
+        return _migrate_sub_store(sub_store_path, store_format)
+
+
+def _migrate_sub_store(sub_store_path: pathlib.Path, store_format: str) -> int:
+    journal = Journal(sub_store_path)
+    journal.recover()
+    source_format = detect_record_format(sub_store_path)
+    target_format = get_record_format(store_format)
+    if source_format is target_format:
+        return 0
+
+    meta_handler = MetaSubStoreHandler(sub_store_path)
+    meta_info = meta_handler.get_meta_data()
+    pk_positions = [position for position, field in enumerate(meta_info.fields)
+                    if Validator.pk in meta_info.fields_config.get(field, [])]
+    decode = get_values_decoder([meta_info.fields_types.get(field) for field in meta_info.fields])
+    with sub_store_path.open(mode="rb") as st:
+        for offset, values in source_format.read_records(st):
+            try:
+                target_format.check_values(decode(values))
+            except UnsupportedValueError as error:
+                raise UnsupportedValueError("Record at {} can not be moved to {} format: {}"
+                                            .format(offset, target_format.NAME, error)) from error
+    moved = 0
+    temp_file = sub_store_path.parent / pathlib.Path(f"{sub_store_path.name}.temp")
+    with sub_store_path.open(mode="rb") as st:
+        with temp_file.open(mode="wb") as temp_st:
+            temp_st.write(target_format.HEADER)
+            for _, values in source_format.read_records(st):
+                temp_st.write(target_format.encode_row(_restore_pk_values(decode(values), pk_positions)))
+                moved += 1
+            sync_file(temp_st)
+
+    transaction = JournalTransaction()
+    transaction.replace(temp_file, sub_store_path)
+    transaction.update_meta(sub_store_path, MetaSubStoreUpdater(sub_store_path).get_stats_changes(moved, 0))
+    journal.commit(transaction)
+    SubStoreIndex(sub_store_path, meta_handler).drop()
+    return moved
+
+
+def _restore_pk_values(values: List, pk_positions: List[int]) -> List:
+    values = list(values)
+    for position in pk_positions:
+        if isinstance(values[position], str) and values[position].isdigit():
+            values[position] = int(values[position])
+    return values
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Converts sub store file to another format")
+    parser.add_argument("sub_store_path", type=pathlib.Path)
+    parser.add_argument("--format", dest="store_format", default=StoreFormats.BINARY,
+                        choices=[StoreFormats.TEXT, StoreFormats.BINARY])
+    parsed_args = parser.parse_args(args)
+    moved = migrate_sub_store(parsed_args.sub_store_path, parsed_args.store_format)
+    print(f"{moved} records moved to {parsed_args.store_format} format")
+
+
+if __name__ == "__main__":
+    main()
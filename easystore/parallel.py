@@ -0,0 +1,72 @@
+import mmap
+import os
+import pathlib
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from easystore.predicate import get_predicate_plan
+from easystore.recordformat import get_record_format
+from easystore.utilis import FieldType, get_values_decoder
+
+
+@dataclass(frozen=True)
+class ScanTask:
+    """Everything a worker process needs to scan one byte range of a sub store, it is sent pickled"""
+    sub_store_path: pathlib.Path
+    inode: int
+    store_format: str
+    bounds: Tuple[int, int]
+    needles: Sequence[List[bytes]]
+    fields: List[str]
+    positions: Optional[List[int]]
+    fields_types: Dict[str, FieldType]
+    conditions: Dict[str, Any]
+    result_size: int
+
+
+def scan_range(task: ScanTask) -> Optional[List[Tuple[int, List[Any]]]]:
+    """
+    Returns (record offset, values) of rows of task range which passed conditions, values are cut to
+    result_size. The worker maps the file itself and compiles conditions with its own plans cache.
+    Returns None if the file was replaced after it was split, then the range does not match its rows.
+    """
+    record_format = get_record_format(task.store_format)
+    decode = get_values_decoder([task.fields_types.get(field) for field in task.fields])
+    matches = get_predicate_plan(task.fields, task.fields_types, list(task.conditions)).bind(task.conditions)
+    found = []
+    with task.sub_store_path.open(mode="rb") as st:
+        if os.fstat(st.fileno()).st_ino != task.inode:
+            return None
+        with mmap.mmap(st.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for offset, values in record_format.read_mapped_records(buffer, task.needles, task.positions,
+                                                                    task.bounds):
+                values = decode(values)
+                if matches(values):
+                    found.append((offset, values[:task.result_size]))
+    return found
+
+
+EXECUTORS: Dict[int, ProcessPoolExecutor] = {}
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """Pools are shared by all sub stores and kept alive, so processes are started once per workers count"""
+    executor = EXECUTORS.get(workers)
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        EXECUTORS[workers] = executor
+    return executor
+
+
+def parallel_scan(tasks: List[ScanTask], workers: int) -> Optional[List[Tuple[int, List[Any]]]]:
+    """Ranges are scanned at the same time, results are merged in file order. None means the file was replaced"""
+    if len(tasks) == 1:
+        return scan_range(tasks[0])
+    found = []
+    for range_found in get_executor(workers).map(scan_range, tasks):
+        if range_found is None:
+            return None
+        found.extend(range_found)
+    return found
@@ -0,0 +1,118 @@
+import bisect
+
+from array import array
+from collections.abc import MutableSet
+from typing import Iterable, Iterator, List, Tuple
+
+
+class PkSet(MutableSet):
+    """
+    Set of pk values kept as sorted runs of consecutive values: first and last values of runs are
+    in two arrays. Sequential ids take one run whatever their count and membership is a binary search.
+    In meta the set is written as runs too, "1-1000 1005", plain values of old meta files are runs of one value.
+    """
+
+    __slots__ = ("__starts", "__ends", "__size")
+
+    def __init__(self, values: Iterable[int] = ()):
+        self.__starts = array("q")
+        self.__ends = array("q")
+        self.__size = 0
+        self.update(values)
+
+    @classmethod
+    def decode(cls, tokens: Iterable[str]) -> "PkSet":
+        runs: List[Tuple[int, int]] = []
+        for token in tokens:
+            first, _, last = token.partition("-")
+            runs.append((int(first), int(last or first)))
+        pk_set = cls()
+        for start, end in sorted(runs):
+            pk_set.__add_run(start, end)
+        return pk_set
+
+    def encode(self) -> str:
+        return " ".join(str(start) if start == end else f"{start}-{end}"
+                        for start, end in zip(self.__starts, self.__ends))
+
+    def __contains__(self, value) -> bool:
+        if not isinstance(value, int):
+            return False
+        position = bisect.bisect_right(self.__starts, value) - 1
+        return position >= 0 and value <= self.__ends[position]
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in zip(self.__starts, self.__ends):
+            yield from range(start, end + 1)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __repr__(self):
+        return "PkSet<{}>".format(self.encode())
+
+    @property
+    def runs_count(self) -> int:
+        return len(self.__starts)
+
+    def max(self, default: int = 0) -> int:
+        return self.__ends[-1] if self.__ends else default
+
+    def copy(self) -> "PkSet":
+        pk_set = PkSet()
+        pk_set.__starts = array("q", self.__starts)
+        pk_set.__ends = array("q", self.__ends)
+        pk_set.__size = self.__size
+        return pk_set
+
+    def add(self, value: int):
+        if value not in self:
+            self.__add_run(value, value)
+
+    def discard(self, value: int):
+        if value not in self:
+            return
+        starts, ends = self.__starts, self.__ends
+        position = bisect.bisect_right(starts, value) - 1
+        start, end = starts[position], ends[position]
+        if start == end:
+            del starts[position]
+            del ends[position]
+        elif value == start:
+            starts[position] = start + 1
+        elif value == end:
+            ends[position] = end - 1
+        else:
+            ends[position] = value - 1
+            starts.insert(position + 1, value + 1)
+            ends.insert(position + 1, end)
+        self.__size -= 1
+
+    def update(self, values: Iterable[int]):
+        for value in values:
+            self.add(value)
+
+    def difference_update(self, values: Iterable[int]):
+        for value in values:
+            self.discard(value)
+
+    def __add_run(self, start: int, end: int):
+        """Run is merged with runs which it overlaps or touches, appending to the last run is the fast path"""
+        starts, ends = self.__starts, self.__ends
+        if not ends or start > ends[-1] + 1:
+            starts.append(start)
+            ends.append(end)
+            self.__size += end - start + 1
+            return
+        first = bisect.bisect_left(ends, start - 1)
+        last = bisect.bisect_right(starts, end + 1)
+        if first == last:
+            starts.insert(first, start)
+            ends.insert(first, end)
+            self.__size += end - start + 1
+            return
+        covered = sum(ends[position] - starts[position] + 1 for position in range(first, last))
+        start, end = min(start, starts[first]), max(end, ends[last - 1])
+        starts[first:last] = array("q", [start])
+        ends[first:last] = array("q", [end])
+        self.__size += end - start + 1 - covered
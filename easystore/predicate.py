@@ -0,0 +1,142 @@
+import math
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from easystore.utilis import FieldType, convert_field_value
+
+
+@dataclass(frozen=True)
+class Operators:
+    EQ = "eq"
+    IN = "in"
+    STARTSWITH = "startswith"
+    GT = "gt"
+    GE = "ge"
+    LT = "lt"
+    LE = "le"
+
+
+OPERATOR_SEPARATOR = "__"
+
+# Cheaper and more selective checks go first, so most rows are rejected by the first one
+OPERATORS_COSTS = {
+    Operators.EQ: 0,
+    Operators.IN: 1,
+    Operators.STARTSWITH: 2,
+    Operators.GT: 3,
+    Operators.GE: 3,
+    Operators.LT: 3,
+    Operators.LE: 3,
+}
+
+RANGE_OPERATORS = {Operators.GT: ">", Operators.GE: ">=", Operators.LT: "<", Operators.LE: "<="}
+
+
+def split_condition(key: str) -> Tuple[str, str]:
+    """age__gt is (age, gt), keys without known operator suffix are equality conditions"""
+    field, separator, operator = key.rpartition(OPERATOR_SEPARATOR)
+    if separator and field and operator in OPERATORS_COSTS:
+        return field, operator
+    return key, Operators.EQ
+
+
+def to_number(value: Any) -> float:
+    """Untyped values are compared with numbers as floats, values which are not numbers never match"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+@dataclass(frozen=True)
+class _Check:
+    key: str
+    position: int
+    operator: str
+    field_type: Optional[FieldType]
+
+
+class PredicatePlan:
+    """
+    Conditions of one shape compiled into a function over decoded row values: condition keys are resolved
+    to positions once and checks are ordered by their costs. The plan does not keep condition values,
+    bind makes a matcher for values of one query.
+    Typed fields are compared as native values, untyped ones as str, or as numbers with number bounds.
+    """
+
+    def __init__(self, fields: Sequence[str], fields_types: Dict[str, FieldType], keys: Sequence[str]):
+        checks = []
+        for key in keys:
+            field, operator = split_condition(key)
+            checks.append(_Check(key, list(fields).index(field), operator, fields_types.get(field)))
+        self.__checks = sorted(checks, key=lambda check: OPERATORS_COSTS[check.operator])
+        self.__compiled_matcher: Optional[Callable[..., Callable[[List[Any]], bool]]] = None
+
+    def bind(self, conditions: Dict[str, Any]) -> Callable[[List[Any]], bool]:
+        if self.__compiled_matcher is None:
+            self.__compiled_matcher = self.__compile()
+        return self.__compiled_matcher(*[self.__constant(check, conditions[check.key]) for check in self.__checks])
+
+    def __compile(self) -> Callable[..., Callable[[List[Any]], bool]]:
+        """Generated matcher is one boolean expression, it stops on the first failed check"""
+        expressions = [self.__expression(check, f"c{number}") for number, check in enumerate(self.__checks)]
+        arguments = ", ".join(f"c{number}" for number in range(len(self.__checks)))
+        body = " and ".join(expressions) or "True"
+        namespace: Dict[str, Any] = {"to_number": to_number}
+        exec(f"def make_matcher({arguments}):\n"
+             f"    def matches(values):\n"
+             f"        return {body}\n"
+             f"    return matches\n", namespace)
+        return namespace["make_matcher"]
+
+    @staticmethod
+    def __expression(check: _Check, constant: str) -> str:
+        value = f"values[{check.position}]"
+        typed = check.field_type is not None
+        if check.operator == Operators.EQ:
+            return f"{value} == {constant}" if typed else f"str({value}) == {constant}"
+        if check.operator == Operators.IN:
+            return f"{value} in {constant}" if typed else f"str({value}) in {constant}"
+        if check.operator == Operators.STARTSWITH:
+            return f"str({value}).startswith({constant})"
+        sign = RANGE_OPERATORS[check.operator]
+        if typed:
+            return f"({value} is not None and {value} {sign} {constant})"
+        return f"({constant}.__class__ is str and str({value}) {sign} {constant}" \
+               f" or {constant}.__class__ is not str and to_number({value}) {sign} {constant})"
+
+    @staticmethod
+    def __constant(check: _Check, value: Any) -> Any:
+        try:
+            if check.operator == Operators.IN:
+                return frozenset(PredicatePlan.__convert(check, item) for item in value)
+            if check.operator == Operators.STARTSWITH:
+                return str(value)
+            if check.operator in RANGE_OPERATORS and check.field_type is None and not isinstance(value, str):
+                return to_number(value)
+            return PredicatePlan.__convert(check, value)
+        except (TypeError, ValueError):
+            raise TypeError("{} can not be compared with {}".format(check.key, value))
+
+    @staticmethod
+    def __convert(check: _Check, value: Any) -> Any:
+        if check.field_type is None:
+            return str(value)
+        return convert_field_value(check.field_type, value)
+
+
+PREDICATE_PLANS: Dict[Tuple[Tuple[str, ...], Tuple[Optional[FieldType], ...], Tuple[str, ...]], PredicatePlan] = {}
+
+
+def get_predicate_plan(fields: Sequence[str], fields_types: Dict[str, FieldType],
+                       keys: Sequence[str]) -> PredicatePlan:
+    """Plans are cached by fields and their types, that is the spec version, and by condition keys"""
+    fields = tuple(fields)
+    keys = tuple(keys)
+    plan_key = (fields, tuple(fields_types.get(field) for field in fields), keys)
+    plan = PREDICATE_PLANS.get(plan_key)
+    if plan is None:
+        plan = PredicatePlan(fields, fields_types, keys)
+        PREDICATE_PLANS[plan_key] = plan
+    return plan
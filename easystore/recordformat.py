@@ -0,0 +1,427 @@
+import abc
+import datetime
+import pathlib
+import struct
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from easystore.errors import UnsupportedFormatError, UnsupportedValueError
+from easystore.utilis import FilePoints, read_record_at
+
+
+@dataclass(frozen=True)
+class StoreFormats:
+    TEXT = "text"
+    BINARY = "binary"
+
+
+@dataclass(frozen=True)
+class BinaryFieldTypes:
+    NONE = b"n"
+    STR = b"s"
+    INT = b"i"
+    FLOAT = b"f"
+    BOOL = b"b"
+    DATETIME = b"d"
+
+
+class AbstractRecordFormat(metaclass=abc.ABCMeta):
+    """
+    Layout of rows in a sub store file. Sub store file is a header and a sequence of rows,
+    a record offset is the offset of its row plus ROW_PREFIX_SIZE.
+    """
+    NAME: str
+    HEADER: bytes
+    ROW_PREFIX_SIZE: int
+
+    @abc.abstractmethod
+    def encode_row(self, values: List[Any]) -> bytes:
+        raise NotImplementedError()
+
+    def check_values(self, values: List[Any]):
+        """Raises UnsupportedValueError if values can not be kept in rows of the format"""
+        return
+
+    @abc.abstractmethod
+    def read_rows(self, file) -> Iterable[Tuple[int, bool, bytes]]:
+        """Yields (record offset, is row alive, raw row) for every row"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def decode_row(self, row: bytes, positions: Optional[List[int]] = None) -> List[Any]:
+        """Decodes values of raw row, only values of spec positions if they are given"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def read_values_at(self, file, offset: int, positions: Optional[List[int]] = None) -> List[Any]:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def encode_in_place(self, file, offset: int, values: List[Any]) -> Optional[bytes]:
+        """Returns bytes which replace record at offset or None if new values do not fit into it"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def encode_tombstone(self, file, offset: int) -> bytes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def read_mapped_records(self, buffer, needles: Sequence[List[bytes]] = (), positions: Optional[List[int]] = None,
+                            bounds: Optional[Tuple[int, int]] = None) -> Iterable[Tuple[int, List[Any]]]:
+        """
+        Yields (record offset, values) of alive rows from mapped sub store. Only rows which contain
+        at least one needle of every needles list are decoded, the others are skipped as raw bytes.
+        Bounds are a byte range returned by split_ranges, only rows starting in it are read.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def split_ranges(self, buffer, parts: int, min_size: int = 0) -> List[Tuple[int, int]]:
+        """
+        Splits rows of mapped sub store into at most parts byte ranges of about the same size,
+        every range starts and ends on a row boundary and is not shorter than min_size
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def condition_needles(self, value: Any) -> List[bytes]:
+        """Returns raw bytes, one of which is in every row where a field is equal to value"""
+        raise NotImplementedError()
+
+    def read_records(self, file, positions: Optional[List[int]] = None) -> Iterable[Tuple[int, List[Any]]]:
+        for offset, alive, row in self.read_rows(file):
+            if alive:
+                yield offset, self.decode_row(row, positions)
+
+    @staticmethod
+    def _project(values: List[Any], positions: Optional[List[int]]) -> List[Any]:
+        if positions is None:
+            return values
+        return [values[position] if position < len(values) else None for position in positions]
+
+
+class TextRecordFormat(AbstractRecordFormat):
+    """
+    Rows are space joined str values, every row starts with a new line.
+    Values are split by whitespace on reading, so empty values and values with whitespace can not be stored.
+    """
+    NAME = StoreFormats.TEXT
+    HEADER = FilePoints.RECORDS_START.encode("utf-8")
+    ROW_PREFIX_SIZE = 1
+
+    def encode_row(self, values: List[Any]) -> bytes:
+        return b"\n" + self.__encode_values(values)
+
+    def read_rows(self, file) -> Iterable[Tuple[int, bool, bytes]]:
+        file.seek(0)
+        line = file.readline()
+        while line and line.rstrip(b"\r\n") != self.HEADER:
+            line = file.readline()
+        if not line.endswith(b"\n"):
+            return
+
+        offset = file.tell()
+        ends_with_new_line = True
+        line = file.readline()
+        while line:
+            row = line.rstrip(b"\r\n")
+            yield offset, bool(row.strip()), b"\n" + row
+            offset += len(line)
+            ends_with_new_line = line.endswith(b"\n")
+            line = file.readline()
+        if ends_with_new_line:
+            yield offset, False, b"\n"
+
+        return
+
+    def decode_row(self, row: bytes, positions: Optional[List[int]] = None) -> List[Any]:
+        if positions is None:
+            return row.decode("utf-8").split()
+        max_split = max(positions, default=-1) + 1
+        return self._project(row.decode("utf-8").split(None, max_split), positions)
+
+    def read_values_at(self, file, offset: int, positions: Optional[List[int]] = None) -> List[Any]:
+        file.seek(offset)
+        return self.decode_row(file.readline(), positions)
+
+    def encode_in_place(self, file, offset: int, values: List[Any]) -> Optional[bytes]:
+        row_length = self.__row_length_at(file, offset)
+        row = self.__encode_values(values)
+        if len(row) > row_length:
+            return None
+        return row.ljust(row_length)
+
+    def encode_tombstone(self, file, offset: int) -> bytes:
+        return b" " * self.__row_length_at(file, offset)
+
+    def read_mapped_records(self, buffer, needles: Sequence[List[bytes]] = (), positions: Optional[List[int]] = None,
+                            bounds: Optional[Tuple[int, int]] = None) -> Iterable[Tuple[int, List[Any]]]:
+        if bounds is None:
+            records_start = self.__find_records_start(buffer)
+            if records_start == -1:
+                return
+            size = len(buffer)
+        else:
+            start, size = bounds
+            records_start = start - 1
+        if any(len(needle_list) == 1 for needle_list in needles):
+            yield from self.__read_mapped_records_by_needles(buffer, records_start, size, needles, positions)
+            return
+
+        position = records_start + 1
+        while position <= size:
+            row_end = buffer.find(b"\n", position, size)
+            if row_end == -1:
+                row_end = size
+            row = buffer[position:row_end]
+            if row.strip() and all(any(needle in row for needle in needle_list) for needle_list in needles):
+                yield position, self.decode_row(row, positions)
+            position = row_end + 1
+
+        return
+
+    def split_ranges(self, buffer, parts: int, min_size: int = 0) -> List[Tuple[int, int]]:
+        records_start = self.__find_records_start(buffer)
+        if records_start == -1:
+            return []
+        size = len(buffer)
+        start = records_start + 1
+        part_size = max((size - start) // max(parts, 1), min_size, 1)
+        ranges = []
+        while start < size:
+            cut = buffer.find(b"\n", start + part_size)
+            end = cut + 1 if cut != -1 else size
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def condition_needles(self, value: Any) -> List[bytes]:
+        return [self.__value2text(value).encode("utf-8")]
+
+    def __find_records_start(self, buffer) -> int:
+        """Returns offset of the new line after header or -1"""
+        header_start = buffer.find(self.HEADER)
+        return buffer.find(b"\n", header_start) if header_start != -1 else -1
+
+    def __read_mapped_records_by_needles(self, buffer, records_start: int, size: int, needles: Sequence[List[bytes]],
+                                         positions: Optional[List[int]]) -> Iterable[Tuple[int, List[Any]]]:
+        """
+        Jumps from one occurrence of the longest needle to the next one, rows between them are not touched.
+        Lead needle is taken only from lists with one needle, every matching row must contain it.
+        """
+        lead_needle = max((needle_list[0] for needle_list in needles if len(needle_list) == 1), key=len)
+        position = records_start + 1
+        while position <= size:
+            hit = buffer.find(lead_needle, position, size)
+            if hit == -1:
+                break
+            row_start = buffer.rfind(b"\n", records_start, hit) + 1
+            row_end = buffer.find(b"\n", hit, size)
+            if row_end == -1:
+                row_end = size
+            row = buffer[row_start:row_end]
+            if row.strip() and all(any(needle in row for needle in needle_list) for needle_list in needles):
+                yield row_start, self.decode_row(row, positions)
+            position = row_end + 1
+
+        return
+
+    def check_values(self, values: List[Any]):
+        for value in values:
+            self.__value2text(value)
+
+    def __encode_values(self, values: List[Any]) -> bytes:
+        return " ".join([self.__value2text(value) for value in values]).encode("utf-8")
+
+    @staticmethod
+    def __value2text(value: Any) -> str:
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        text = str(value)
+        if text.split() != [text]:
+            raise UnsupportedValueError("Value {!r} is empty or has whitespace, text sub store can not keep it"
+                                        .format(text))
+        return text
+
+    @staticmethod
+    def __row_length_at(file, offset: int) -> int:
+        return len(read_record_at(file, offset).rstrip("\r\n").encode("utf-8"))
+
+
+class BinaryRecordFormat(AbstractRecordFormat):
+    """
+    Row is a state byte, payload capacity and payload: typed length-prefixed fields padded with zero bytes.
+    Deleting a row flips its state byte, a new value can take the row while it fits into the capacity.
+    """
+    NAME = StoreFormats.BINARY
+    VERSION = 1
+    MAGIC = b"#sbstore binary"
+    HEADER = MAGIC + b" " + str(VERSION).encode("ascii") + b"\n"
+    ROW_PREFIX_SIZE = 0
+    ALIVE = b"\x01"
+    DEAD = b"\x00"
+    ROW_HEAD = struct.Struct("<cI")
+    FIELD_HEAD = struct.Struct("<cI")
+    FLOAT = struct.Struct("<d")
+
+    def encode_row(self, values: List[Any]) -> bytes:
+        payload = self.__encode_values(values)
+        return self.ROW_HEAD.pack(self.ALIVE, len(payload)) + payload
+
+    def read_rows(self, file) -> Iterable[Tuple[int, bool, bytes]]:
+        file.seek(len(self.HEADER))
+        offset = file.tell()
+        head = file.read(self.ROW_HEAD.size)
+        while len(head) == self.ROW_HEAD.size:
+            state, capacity = self.ROW_HEAD.unpack(head)
+            payload = file.read(capacity)
+            if len(payload) < capacity:
+                break
+            yield offset, state == self.ALIVE, head + payload
+            offset += len(head) + capacity
+            head = file.read(self.ROW_HEAD.size)
+
+        return
+
+    def decode_row(self, row: bytes, positions: Optional[List[int]] = None) -> List[Any]:
+        return self.__decode_values(row, self.ROW_HEAD.size, len(row), positions)
+
+    def read_values_at(self, file, offset: int, positions: Optional[List[int]] = None) -> List[Any]:
+        file.seek(offset)
+        _, capacity = self.ROW_HEAD.unpack(file.read(self.ROW_HEAD.size))
+        return self.__decode_values(file.read(capacity), 0, capacity, positions)
+
+    def encode_in_place(self, file, offset: int, values: List[Any]) -> Optional[bytes]:
+        file.seek(offset)
+        _, capacity = self.ROW_HEAD.unpack(file.read(self.ROW_HEAD.size))
+        payload = self.__encode_values(values)
+        if len(payload) > capacity:
+            return None
+        return self.ROW_HEAD.pack(self.ALIVE, capacity) + payload.ljust(capacity, b"\x00")
+
+    def encode_tombstone(self, file, offset: int) -> bytes:
+        return self.DEAD
+
+    def read_mapped_records(self, buffer, needles: Sequence[List[bytes]] = (), positions: Optional[List[int]] = None,
+                            bounds: Optional[Tuple[int, int]] = None) -> Iterable[Tuple[int, List[Any]]]:
+        position, size = bounds if bounds is not None else (len(self.HEADER), len(buffer))
+        while position + self.ROW_HEAD.size <= size:
+            state, capacity = self.ROW_HEAD.unpack_from(buffer, position)
+            payload_start = position + self.ROW_HEAD.size
+            payload_end = payload_start + capacity
+            if payload_end > size:
+                break
+            if state == self.ALIVE and all(any(buffer.find(needle, payload_start, payload_end) != -1
+                                                for needle in needle_list) for needle_list in needles):
+                yield position, self.__decode_values(buffer, payload_start, payload_end, positions)
+            position = payload_end
+
+        return
+
+    def split_ranges(self, buffer, parts: int, min_size: int = 0) -> List[Tuple[int, int]]:
+        """Rows have no markers to find their starts, so row heads are walked from the header"""
+        size = len(buffer)
+        start = position = len(self.HEADER)
+        part_size = max((size - start) // max(parts, 1), min_size, 1)
+        ranges = []
+        while position + self.ROW_HEAD.size <= size:
+            _, capacity = self.ROW_HEAD.unpack_from(buffer, position)
+            if position + self.ROW_HEAD.size + capacity > size:
+                break
+            position += self.ROW_HEAD.size + capacity
+            if position - start >= part_size:
+                ranges.append((start, position))
+                start = position
+        if position > start:
+            ranges.append((start, position))
+        return ranges
+
+    def condition_needles(self, value: Any) -> List[bytes]:
+        """Conditions are compared as str, so floats and bools can match by their binary data"""
+        if isinstance(value, datetime.datetime):
+            return [value.isoformat().encode("utf-8")]
+        text = str(value)
+        needles = [text.encode("utf-8")]
+        if text in ("True", "False", "None"):
+            needles.append(b"")
+        try:
+            number = float(text)
+        except ValueError:
+            return needles
+        if str(number) == text:
+            needles.append(self.FLOAT.pack(number))
+        return needles
+
+    def __encode_values(self, values: List[Any]) -> bytes:
+        return b"".join([self.__encode_value(value) for value in values])
+
+    def __encode_value(self, value: Any) -> bytes:
+        if value is None:
+            field_type, data = BinaryFieldTypes.NONE, b""
+        elif isinstance(value, bool):
+            field_type, data = BinaryFieldTypes.BOOL, b"\x01" if value else b"\x00"
+        elif isinstance(value, int):
+            field_type, data = BinaryFieldTypes.INT, str(value).encode("ascii")
+        elif isinstance(value, float):
+            field_type, data = BinaryFieldTypes.FLOAT, self.FLOAT.pack(value)
+        elif isinstance(value, datetime.datetime):
+            field_type, data = BinaryFieldTypes.DATETIME, value.isoformat().encode("ascii")
+        else:
+            field_type, data = BinaryFieldTypes.STR, str(value).encode("utf-8")
+        return self.FIELD_HEAD.pack(field_type, len(data)) + data
+
+    def __decode_values(self, data, start: int, end: int, positions: Optional[List[int]] = None) -> List[Any]:
+        """Decodes fields of data[start:end], fields out of positions are skipped by their length prefix"""
+        wanted = None if positions is None else set(positions)
+        last_position = max(positions, default=-1) if positions is not None else None
+        values: Dict[int, Any] = {}
+        index = 0
+        position = start
+        while position + self.FIELD_HEAD.size <= end and data[position] != 0:
+            if last_position is not None and index > last_position:
+                break
+            field_type, length = self.FIELD_HEAD.unpack_from(data, position)
+            position += self.FIELD_HEAD.size
+            if wanted is None or index in wanted:
+                values[index] = self.__decode_value(field_type, data[position:position + length])
+            position += length
+            index += 1
+        if positions is None:
+            return list(values.values())
+        return [values.get(position) for position in positions]
+
+    def __decode_value(self, field_type: bytes, data: bytes) -> Any:
+        if field_type == BinaryFieldTypes.STR:
+            return data.decode("utf-8")
+        if field_type == BinaryFieldTypes.INT:
+            return int(data)
+        if field_type == BinaryFieldTypes.FLOAT:
+            return self.FLOAT.unpack(data)[0]
+        if field_type == BinaryFieldTypes.BOOL:
+            return data == b"\x01"
+        if field_type == BinaryFieldTypes.DATETIME:
+            return datetime.datetime.fromisoformat(data.decode("ascii"))
+        return None
+
+
+RECORD_FORMATS: Dict[str, AbstractRecordFormat] = {
+    StoreFormats.TEXT: TextRecordFormat(),
+    StoreFormats.BINARY: BinaryRecordFormat(),
+}
+
+
+def get_record_format(store_format: str) -> AbstractRecordFormat:
+    if store_format not in RECORD_FORMATS:
+        raise UnsupportedFormatError("Unknown sub store format {}".format(store_format))
+    return RECORD_FORMATS[store_format]
+
+
+def detect_record_format(sub_store_path: pathlib.Path) -> AbstractRecordFormat:
+    with sub_store_path.open(mode="rb") as st:
+        header = st.readline()
+    if not header.startswith(BinaryRecordFormat.MAGIC):
+        return RECORD_FORMATS[StoreFormats.TEXT]
+    if header != BinaryRecordFormat.HEADER:
+        raise UnsupportedFormatError("Unsupported sub store format version {}".format(header.decode("utf-8").strip()))
+    return RECORD_FORMATS[StoreFormats.BINARY]
@@ -0,0 +1,98 @@
+import collections
+import sys
+import threading
+
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+from easystore.utilis import AbstractRecord
+
+
+def freeze(value: Any) -> Hashable:
+    """Makes hashable key of query arguments, lists of __in conditions become tuples"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return type(value).__name__, tuple(freeze(item) for item in value)
+    hash(value)
+    return value
+
+
+def estimate_size(records: List[AbstractRecord]) -> int:
+    """Rough size of records in bytes: objects of records and of their values"""
+    size = sys.getsizeof(records)
+    for record in records:
+        size += sys.getsizeof(record) + sum(sys.getsizeof(value) for _, value in record)
+    return size
+
+
+@dataclass
+class ResultCacheStats:
+    """Counters of one result cache, size is the estimated size of cached records in bytes"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+class ResultCache:
+    """
+    LRU cache of query results of one sub store bounded by count of entries and their size in bytes.
+    Entries are valid while the state of the sub store stays the same: its write version, bumped by writes
+    of this process, and the signature of its file, changed by writes of other processes.
+    Cached records are shared by callers, so they must not be changed. It is used under the sub store lock,
+    parallel readers change entries one by one but load their results at the same time.
+    Zero max_entries turns the cache off, then callers do not use it at all.
+    """
+
+    def __init__(self, max_entries: int, max_size: int):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.__entries: "collections.OrderedDict[Hashable, Tuple[int, List[AbstractRecord]]]" = \
+            collections.OrderedDict()
+        self.__state: Optional[Hashable] = None
+        self.__stats = ResultCacheStats()
+        self.__guard = threading.RLock()
+
+    @property
+    def stats(self) -> ResultCacheStats:
+        with self.__guard:
+            return replace(self.__stats, entries=len(self.__entries))
+
+    def get_or_load(self, key: Hashable, state: Hashable,
+                    load: Callable[[], List[AbstractRecord]]) -> List[AbstractRecord]:
+        with self.__guard:
+            if state != self.__state:
+                self.clear()
+                self.__state = state
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.__stats.hits += 1
+                return entry[1]
+            self.__stats.misses += 1
+        records = load()
+        with self.__guard:
+            if state == self.__state:
+                self.__put(key, records)
+        return records
+
+    def clear(self):
+        with self.__guard:
+            if self.__entries:
+                self.__stats.invalidations += 1
+            self.__entries.clear()
+            self.__stats.size = 0
+
+    def __put(self, key: Hashable, records: List[AbstractRecord]):
+        size = estimate_size(records)
+        if size > self.max_size:
+            return
+        self.__entries[key] = (size, records)
+        self.__stats.size += size
+        while len(self.__entries) > self.max_entries or self.__stats.size > self.max_size:
+            _, (evicted_size, _) = self.__entries.popitem(last=False)
+            self.__stats.size -= evicted_size
+            self.__stats.evictions += 1
@@ -0,0 +1,123 @@
+from dataclasses import replace
+from typing import TYPE_CHECKING, Callable, ContextManager, Iterable, List, Optional, Sequence, Union
+
+from easystore.autofields import AutoFieldAdder
+from easystore.fieldsvalidator import ParamForFieldValidator
+from easystore.meta import AbstractMetaSubStoreHandler
+from easystore.utilis import AbstractRecord, MetaInfo, Record
+
+if TYPE_CHECKING:
+    from easystore.database import SubStore
+
+
+class SessionMetaHandler(AbstractMetaSubStoreHandler):
+    """Meta of a session kept in memory, pk values of buffered records are added to its pk sets and sequences"""
+
+    def __init__(self, meta_info: MetaInfo):
+        self.__meta_info = replace(meta_info, pk_sets={name: keys.copy() for name, keys in meta_info.pk_sets.items()},
+                                   sequences=dict(meta_info.sequences))
+
+    def get_meta_data(self) -> MetaInfo:
+        return self.__meta_info
+
+    def add_records(self, records: Sequence[AbstractRecord]):
+        sequences = self.__meta_info.sequences
+        for name, keys in self.__meta_info.pk_sets.items():
+            values = [int(value) for value in (record[name] for record in records) if value]
+            keys.update(values)
+            sequences[name] = max([sequences.get(name, 0), *values])
+
+    def remove_records(self, records: Sequence[AbstractRecord]):
+        for name, keys in self.__meta_info.pk_sets.items():
+            keys.difference_update(int(value) for value in (record[name] for record in records) if value)
+
+
+class SubStoreSession:
+    """
+    Batch of sub store operations under one exclusive lock. Inserted records are validated against meta
+    kept in memory and buffered, then written by one journal transaction with one meta update on flush
+    or on exit. Reads, updates and deletes flush the buffer first, so they see every inserted record.
+    Buffered records are dropped if the session exits with an exception.
+    """
+
+    def __init__(self, sub_store: "SubStore", lock: ContextManager, insert_records: Callable[[List[Record]], int],
+                 get_meta_info: Callable[[], MetaInfo]):
+        self.__sub_store = sub_store
+        self.__lock = lock
+        self.__insert_records = insert_records
+        self.__get_meta_info = get_meta_info
+        self.__meta_handler: Optional[SessionMetaHandler] = None
+        self.__pending: List[Record] = []
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    def __enter__(self) -> "SubStoreSession":
+        self.__lock.__enter__()
+        self.__meta_handler = SessionMetaHandler(self.__get_meta_info())
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self.flush()
+            else:
+                self.__pending = []
+        finally:
+            self.__meta_handler = None
+            self.__lock.__exit__(exc_type, exc_val, exc_tb)
+
+    def flush(self) -> int:
+        records, self.__pending = self.__pending, []
+        return self.__insert_records(records)
+
+    def insert_one(self, *args, **kwargs) -> int:
+        return self.__add_records([Record(self.__sub_store.spec, *args, **kwargs)])
+
+    def insert_many(self, records: Iterable[Union[dict, Record]]) -> int:
+        fields = self.__sub_store.spec
+        return self.__add_records([Record(fields, **dict(record)) for record in records])
+
+    def get_one(self, **conditions) -> Optional[AbstractRecord]:
+        self.flush()
+        return self.__sub_store.get_one(**conditions)
+
+    def get_many(self, **kwargs) -> List[AbstractRecord]:
+        self.flush()
+        return self.__sub_store.get_many(**kwargs)
+
+    def update_one(self, conditions: dict, new_params: dict) -> int:
+        self.flush()
+        changed = self.__sub_store.update_one(conditions, new_params)
+        self.__meta_handler = SessionMetaHandler(self.__get_meta_info())
+        return changed
+
+    def update_many(self, conditions: dict, new_params: dict) -> int:
+        self.flush()
+        changed = self.__sub_store.update_many(conditions, new_params)
+        self.__meta_handler = SessionMetaHandler(self.__get_meta_info())
+        return changed
+
+    def delete_one(self, **conditions) -> int:
+        self.flush()
+        changed = self.__sub_store.delete_one(**conditions)
+        self.__meta_handler = SessionMetaHandler(self.__get_meta_info())
+        return changed
+
+    def delete_many(self, **conditions) -> int:
+        self.flush()
+        changed = self.__sub_store.delete_many(**conditions)
+        self.__meta_handler = SessionMetaHandler(self.__get_meta_info())
+        return changed
+
+    def __add_records(self, records: List[Record]) -> int:
+        meta_handler = self.__meta_handler
+        if meta_handler is None:
+            raise RuntimeError("Session is used outside of with block")
+        validator = ParamForFieldValidator(meta_handler.get_meta_data())
+        validator.check_many_fields([dict(record) for record in records], inserting=True)
+        records = AutoFieldAdder(meta_handler).add_auto_fields_to_many(records)
+        meta_handler.add_records(records)
+        self.__pending.extend(records)
+        return len(records)
@@ -2,7 +2,7 @@ import abc
 
 from typing import List, Dict
 
-from easystore.utilis import SpecInfo
+from easystore.utilis import SpecInfo, is_field_type_config
 
 
 class AbstractSpecParser(metaclass=abc.ABCMeta):
@@ -26,13 +26,17 @@ class SpecParser(AbstractSpecParser):
     def _parse_spec_list(spec: List[str]) -> SpecInfo:
         fields_names = []
         fields_configs: Dict[str, List[str]] = {}
+        fields_types: Dict[str, str] = {}
 
         for field in spec:
             field_name, *field_params = field.replace("[", " ").replace("]", "").split(" ")
             fields_names.append(field_name)
-            fields_configs[field_name] = field_params
+            fields_configs[field_name] = [param for param in field_params if not is_field_type_config(param)]
+            for param in field_params:
+                if is_field_type_config(param):
+                    fields_types[field_name] = param
 
-        return SpecInfo(fields=fields_names, fields_configs=fields_configs)
+        return SpecInfo(fields=fields_names, fields_configs=fields_configs, fields_types=fields_types)
 
     def _parse_spec_string(self, spec: str) -> SpecInfo:
 
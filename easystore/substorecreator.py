@@ -3,13 +3,14 @@ import pathlib
 
 from typing import List
 
+from easystore.recordformat import StoreFormats, get_record_format
 from easystore.specparser import SpecParser
 from easystore.utilis import SpecInfo
 
 
 class AbstractSubStoreCreator(metaclass=abc.ABCMeta):
 
-    def create_sub_store(self, name: str, spec: List[str]):
+    def create_sub_store(self, name: str, spec: List[str], store_format: str = StoreFormats.TEXT):
         raise NotImplementedError()
 
 
@@ -18,19 +19,20 @@ class SubStoreCreator(AbstractSubStoreCreator):
     def __init__(self, main_store_path: pathlib.Path):
         self.main_path = main_store_path
 
-    def create_sub_store(self, name: str, spec: List[str]):
-        self.__create_sub_store(name, spec)
+    def create_sub_store(self, name: str, spec: List[str], store_format: str = StoreFormats.TEXT):
+        self.__create_sub_store(name, spec, store_format)
 
-    def __create_sub_store(self, name: str, spec: List[str]):
+    def __create_sub_store(self, name: str, spec: List[str], store_format: str):
         sub_store_path = self.__create_path_for_sub_store(name)
         meta_sub_store_path = self.__create_path_for_meta_store(name)
-        self.__create_sub_store_file(sub_store_path)
+        self.__create_sub_store_file(sub_store_path, store_format)
         self.__create_meta_file_for_store(meta_sub_store_path, spec)
 
     @staticmethod
-    def __create_sub_store_file(path: pathlib.Path):
-        with path.open(mode="w") as st:
-            st.write("#records")
+    def __create_sub_store_file(path: pathlib.Path, store_format: str):
+        record_format = get_record_format(store_format)
+        with path.open(mode="wb") as st:
+            st.write(record_format.HEADER)
 
         return True
 
@@ -0,0 +1,202 @@
+import contextlib
+
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from easystore.autofields import AutoFieldAdder
+from easystore.errors import LockOrderError, UniqueKeyError
+from easystore.fieldsvalidator import ParamForFieldValidator
+from easystore.journal import Journal, JournalTransaction
+from easystore.predicate import get_predicate_plan
+from easystore.session import SessionMetaHandler
+from easystore.utilis import AbstractRecord, Record, Validator, convert_field_value
+
+if TYPE_CHECKING:
+    from easystore.database import SubStore
+
+
+class StagedSubStore:
+    """
+    Changes of one sub store staged by a store transaction. Queries see committed rows with staged changes:
+    deleted rows are hidden, updated rows have new values and inserted records follow the rows of the file.
+    Pk values are validated against meta with staged keys.
+    """
+
+    def __init__(self, sub_store: "SubStore"):
+        self.__sub_store = sub_store
+        self.__meta_handler = SessionMetaHandler(sub_store._get_meta_data())
+        self.__inserted: List[AbstractRecord] = []
+        self.__deleted: Dict[int, AbstractRecord] = {}
+        self.__updated: Dict[int, Tuple[AbstractRecord, Record]] = {}
+
+    @property
+    def spec(self) -> List[str]:
+        return self.__meta_handler.get_meta_data().fields
+
+    def insert_one(self, *args, **kwargs) -> int:
+        return self.__insert_records([Record(self.spec, *args, **kwargs)])
+
+    def insert_many(self, records: Iterable[Union[dict, Record]]) -> int:
+        spec = self.spec
+        return self.__insert_records([Record(spec, **dict(record)) for record in records])
+
+    def get_one(self, **conditions) -> Optional[AbstractRecord]:
+        found = self.__find(1, **conditions)
+        return found[0][1] if found else None
+
+    def get_many(self, **conditions) -> List[AbstractRecord]:
+        return [record for _, record in self.__find(**conditions)]
+
+    def update_one(self, conditions: dict, new_params: dict) -> int:
+        return self.__update(self.__find(1, **conditions), new_params)
+
+    def update_many(self, conditions: dict, new_params: dict) -> int:
+        found = self.__find(**conditions)
+        for field in self.__get_pk_fields():
+            if field in new_params and len(found) > 1:
+                raise UniqueKeyError("Key {} can not be set to {} rows".format(new_params[field], len(found)))
+        return self.__update(found, new_params)
+
+    def delete_one(self, **conditions) -> int:
+        return self.__delete(self.__find(1, **conditions))
+
+    def delete_many(self, **conditions) -> int:
+        return self.__delete(self.__find(**conditions))
+
+    def checkpoint(self):
+        self.__sub_store._checkpoint_journal()
+
+    def stage(self, transaction: JournalTransaction) -> Callable[[], None]:
+        updated = [(offset, old_record, new_record) for offset, (old_record, new_record) in self.__updated.items()]
+        return self.__sub_store._stage_changes(transaction, list(self.__deleted.items()), updated, self.__inserted)
+
+    def __insert_records(self, records: List[Record]) -> int:
+        meta_handler = self.__meta_handler
+        ParamForFieldValidator(meta_handler.get_meta_data()).check_many_fields(
+            [dict(record) for record in records], inserting=True)
+        records = AutoFieldAdder(meta_handler).add_auto_fields_to_many(records)
+        records = [self.__convert_record(record) for record in records]
+        meta_handler.add_records(records)
+        self.__inserted.extend(records)
+        return len(records)
+
+    def __update(self, found: List[Tuple[Optional[int], AbstractRecord]], new_params: dict) -> int:
+        if not found:
+            return 0
+        meta_handler = self.__meta_handler
+        ParamForFieldValidator(meta_handler.get_meta_data()).check_fields(inserting=True, **new_params)
+        for offset, record in found:
+            new_record = self.__convert_record(Record(self.spec, **{**dict(record), **new_params}))
+            meta_handler.remove_records([record])
+            meta_handler.add_records([new_record])
+            if offset is None:
+                self.__inserted[self.__inserted.index(record)] = new_record
+            else:
+                old_record, _ = self.__updated.get(offset, (record, None))
+                self.__updated[offset] = (old_record, new_record)
+        return len(found)
+
+    def __delete(self, found: List[Tuple[Optional[int], AbstractRecord]]) -> int:
+        for offset, record in found:
+            self.__meta_handler.remove_records([record])
+            if offset is None:
+                self.__inserted.remove(record)
+            else:
+                old_record, _ = self.__updated.pop(offset, (record, None))
+                self.__deleted[offset] = old_record
+        return len(found)
+
+    def __find(self, limit: Optional[int] = None, **conditions) -> List[Tuple[Optional[int], AbstractRecord]]:
+        """Returns (record offset, record) of found records, offset of staged inserted records is None"""
+        matches = self.__get_matcher(conditions)
+        committed: List[Tuple[int, AbstractRecord]] = []
+        for offset, record in self.__sub_store._find(**conditions):
+            if offset not in self.__deleted and offset not in self.__updated:
+                committed.append((offset, record))
+        for offset, (_, new_record) in self.__updated.items():
+            if matches(self.__values(new_record)):
+                committed.append((offset, new_record))
+        committed.sort(key=lambda offset_record: offset_record[0])
+        found: List[Tuple[Optional[int], AbstractRecord]] = list(committed)
+        found.extend((None, record) for record in self.__inserted if matches(self.__values(record)))
+        return found[:limit] if limit is not None else found
+
+    def __get_matcher(self, conditions: dict) -> Callable[[List], bool]:
+        meta_info = self.__meta_handler.get_meta_data()
+        return get_predicate_plan(meta_info.fields, meta_info.fields_types, list(conditions)).bind(conditions)
+
+    def __values(self, record: AbstractRecord) -> List:
+        return [record[field] for field in self.spec]
+
+    def __convert_record(self, record: AbstractRecord) -> Record:
+        fields_types = self.__meta_handler.get_meta_data().fields_types
+        return Record(self.spec, **{field: convert_field_value(fields_types.get(field), record[field])
+                                    for field in self.spec})
+
+    def __get_pk_fields(self) -> List[str]:
+        meta_info = self.__meta_handler.get_meta_data()
+        return [field for field in meta_info.fields if Validator.pk in meta_info.fields_config.get(field, [])]
+
+
+class StoreTransaction:
+    """
+    Changes of several sub stores of one store which are committed all together or not at all.
+    Changes are staged in memory and on exit they are written as one transaction of the store journal,
+    so they share one journal fsync. Nothing is written if the transaction exits with an exception.
+    Sub stores are locked exclusively till the end in the order of their names, so transactions never wait
+    for each other in a cycle: sub stores named on creation are locked on enter, the others on first use,
+    and a sub store which goes before an already locked one raises LockOrderError.
+    Journals of the sub stores are checkpointed before the commit and the store journal right after it,
+    so the store journal holds at most the last transaction of its sub stores and replay keeps the order.
+    """
+
+    def __init__(self, journal: Journal, get_sub_store: Callable[[str], "SubStore"],
+                 sub_store_names: Iterable[str] = ()):
+        self.__journal = journal
+        self.__get_sub_store = get_sub_store
+        self.__names = sorted(set(sub_store_names))
+        self.__locks = contextlib.ExitStack()
+        self.__locked: List[str] = []
+        self.__staged: Dict[str, StagedSubStore] = {}
+
+    def get_sub_store(self, sub_store_name: str) -> StagedSubStore:
+        staged = self.__staged.get(sub_store_name)
+        if staged is None:
+            sub_store = self.__get_sub_store(sub_store_name)
+            if sub_store_name not in self.__locked:
+                self.__lock(sub_store_name, sub_store)
+            staged = StagedSubStore(sub_store)
+            self.__staged[sub_store_name] = staged
+        return staged
+
+    def __enter__(self) -> "StoreTransaction":
+        try:
+            for sub_store_name in self.__names:
+                self.get_sub_store(sub_store_name)
+        except BaseException:
+            self.__locks.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self.__locks:
+            if exc_type is None:
+                self.commit()
+
+    def commit(self):
+        transaction = JournalTransaction()
+        after_commit = [staged.stage(transaction) for staged in self.__staged.values()]
+        if transaction:
+            for staged in self.__staged.values():
+                staged.checkpoint()
+            self.__journal.commit(transaction)
+            self.__journal.checkpoint()
+            for callback in after_commit:
+                callback()
+        self.__staged.clear()
+
+    def __lock(self, sub_store_name: str, sub_store: "SubStore"):
+        if self.__locked and sub_store_name < self.__locked[-1]:
+            raise LockOrderError("Sub store {} goes before locked {}, name it when the transaction is created"
+                                 .format(sub_store_name, self.__locked[-1]))
+        self.__locks.enter_context(sub_store._lock_exclusive())
+        self.__locked.append(sub_store_name)
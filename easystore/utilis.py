@@ -1,13 +1,27 @@
+import datetime
 import enum
+import functools
+import keyword
 import abc
+import os
 import pathlib
 
-from dataclasses import dataclass
-from typing import Set, Dict, List, Optional, Any, Callable, Iterable, Type
+from dataclasses import dataclass, field as dataclass_field
+from typing import Set, Dict, List, Optional, Any, Callable, Iterable, Iterator, Type, Tuple, Sequence
+
+from easystore.pkset import PkSet
 
 
 class Validator(enum.Enum):
     pk = "pk_validator"
+    index = "index_validator"
+
+
+class FieldType(enum.Enum):
+    int = "int"
+    float = "float"
+    str = "str"
+    datetime = "datetime"
 
 
 @dataclass
@@ -20,6 +34,10 @@ class SubStoreMetaData:
 class FilePoints:
     PK_SETS_START = "#hashes"
     PK_SETS_END = "#endhashes"
+    STATS_START = "#stats"
+    STATS_END = "#endstats"
+    SEQUENCES_START = "#sequences"
+    SEQUENCES_END = "#endsequences"
     RECORDS_START = "#records"
     SUB_STORES_START = "#substores"
     SUB_STORES_END = "#endsubstores"
@@ -31,17 +49,81 @@ def config2validator_type(config: str):
     return Validator[config]
 
 
+def is_field_type_config(config: str) -> bool:
+    return config in FieldType.__members__
+
+
 @dataclass
 class MetaInfo:
     fields: List[str]
     fields_config: Dict[str, List[Validator]]
-    pk_sets: Dict[str, Set[int]]
+    pk_sets: Dict[str, PkSet]
+    rows_count: Optional[int] = None
+    dead_rows_count: int = 0
+    fields_types: Dict[str, FieldType] = dataclass_field(default_factory=dict)
+    sequences: Dict[str, int] = dataclass_field(default_factory=dict)
 
 
 @dataclass
 class SpecInfo:
     fields: List[str]
     fields_configs: Dict[str, List[str]]
+    fields_types: Dict[str, str] = dataclass_field(default_factory=dict)
+
+
+def to_int(value: Any) -> int:
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError("{} is not integer".format(value))
+    return int(value)
+
+
+def to_datetime(value: Any) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value))
+
+
+FIELD_TYPES_CONVERTERS: Dict[FieldType, Callable[[Any], Any]] = {
+    FieldType.int: to_int,
+    FieldType.float: float,
+    FieldType.str: str,
+    FieldType.datetime: to_datetime,
+}
+
+
+def convert_field_value(field_type: Optional[FieldType], value: Any) -> Any:
+    if field_type is None or value is None:
+        return value
+    return FIELD_TYPES_CONVERTERS[field_type](value)
+
+
+VALUES_DECODERS: Dict[Tuple[Optional[FieldType], ...], Callable[[List[Any]], List[Any]]] = {}
+
+
+def get_values_decoder(types: Sequence[Optional[FieldType]]) -> Callable[[List[Any]], List[Any]]:
+    """
+    Returns cached function which converts values of typed positions in place, so every value is parsed once,
+    when its row is decoded. Untyped values are not touched, text stores keep None as "None".
+    """
+    types = tuple(types)
+    decoder = VALUES_DECODERS.get(types)
+    if decoder is None:
+        converters = [(position, FIELD_TYPES_CONVERTERS[field_type], field_type is not FieldType.str)
+                      for position, field_type in enumerate(types) if field_type is not None]
+
+        def decoder(values: List[Any]) -> List[Any]:
+            values_count = len(values)
+            for position, converter, none_as_text in converters:
+                if position >= values_count or values[position] is None:
+                    continue
+                if none_as_text and values[position] == "None":
+                    values[position] = None
+                else:
+                    values[position] = converter(values[position])
+            return values
+
+        VALUES_DECODERS[types] = decoder
+    return decoder
 
 
 def go_to_store_point(file, point: str):
@@ -63,14 +145,31 @@ def read_data_until_point(file, point: str) -> Iterable[str]:
 
 
 def temp_file2main(main_file: pathlib.Path, temp_file: pathlib.Path):
-    main_name = main_file.name
-    main_file.unlink()
-    new_file = temp_file.rename(temp_file.parent / pathlib.Path(main_name))
-    return new_file
+    os.replace(temp_file, main_file)
+    return main_file
+
+
+def get_file_signature(path: pathlib.Path) -> Tuple[int, int, int]:
+    """Inode, size and mtime of a file, data cached from the file is valid while they stay the same"""
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def sync_file(file):
+    file.flush()
+    os.fsync(file.fileno())
 
 
 class AbstractRecord(metaclass=abc.ABCMeta):
-    pass
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def __getitem__(self, item) -> Optional[Any]:
+        raise NotImplementedError()
 
 
 class Record(AbstractRecord):
@@ -88,18 +187,80 @@ class Record(AbstractRecord):
         return "StoreRecord"
 
     def __iter__(self):
-        iters = [(key, value) for key, value in self.__dict__.items()]
-
-        for field, value in iters:
-            yield field, value
+        yield from self.__dict__.items()
 
     def __getitem__(self, item) -> Optional[Any]:
         return self.__dict__.get(item, None)
 
 
+_NOT_SET = object()
+
+
+class SlottedRecord(AbstractRecord):
+    """Base of record classes made by get_record_class, values are kept in slots named as spec fields"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "Record<{}>".format(dict(self))
+
+    def __str__(self):
+        return "StoreRecord"
+
+    def __iter__(self):
+        for field in self.__slots__:
+            value = getattr(self, field, _NOT_SET)
+            if value is not _NOT_SET:
+                yield field, value
+
+    def __getitem__(self, item) -> Optional[Any]:
+        return getattr(self, item, None)
+
+    def __reduce__(self):
+        return _restore_record, (self.__slots__, dict(self))
+
+
+RECORD_CLASSES: Dict[Tuple[str, ...], Callable[..., AbstractRecord]] = {}
+
+
+def get_record_class(spec: List[str]) -> Callable[..., AbstractRecord]:
+    """
+    Returns cached slotted record class for spec, its instances have no __dict__ and
+    not given fields are None. Spec with fields which can not be argument names gets plain Record.
+    """
+    fields = tuple(spec)
+    record_class = RECORD_CLASSES.get(fields)
+    if record_class is None:
+        if all(field.isidentifier() and not keyword.iskeyword(field) and not field.startswith("__")
+               for field in fields):
+            record_class = type("SpecRecord", (SlottedRecord,),
+                                {"__slots__": fields, "__init__": _make_record_init(fields)})
+        else:
+            record_class = functools.partial(Record, list(fields))
+        RECORD_CLASSES[fields] = record_class
+    return record_class
+
+
+def _make_record_init(fields: Tuple[str, ...]) -> Callable:
+    """Generated __init__ sets every slot directly, that is much faster than setattr in a loop"""
+    arguments = "".join(f", {field}=None" for field in fields)
+    body = "".join(f"\n    self.{field} = {field}" for field in fields) or "\n    pass"
+    namespace: Dict[str, Any] = {}
+    exec(f"def __init__(self{arguments}):{body}\n", namespace)
+    return namespace["__init__"]
+
+
+def _restore_record(fields: Tuple[str, ...], values: Dict[str, Any]) -> AbstractRecord:
+    return get_record_class(list(fields))(**values)
+
+
 def params2record(func: Callable[[Any, Record], Any]):
     def decorator(obj, spec: List[str], *args, **names_params):
         record = Record(spec, *args, **names_params)
         return func(obj, record)
 
     return decorator
+
+
+def read_record_at(file, offset: int) -> str:
+    file.seek(offset)
+    return file.readline().decode("utf-8")
@@ -6,5 +6,6 @@ setup(
     author_email="solynynd@gmail.com",
     description="Small hobby store for data",
     version="1.0.0",
-    packages=["easystore"]
+    packages=["easystore"],
+    extras_require={"columns": ["numpy"]}
 )
@@ -0,0 +1,56 @@
+import asyncio
+import pathlib
+from unittest import IsolatedAsyncioTestCase
+
+from easystore import AsyncEasyStore
+from tests.testutilis import delete_side_files
+
+PATH_TEST_ASYNC_STORE = "async_test.estore"
+
+
+class TestAsyncEasyStore(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.easy_store = AsyncEasyStore(PATH_TEST_ASYNC_STORE, max_workers=2)
+        await self.easy_store.create_sub_store("people", ["id[pk]", "name", "age[int]"])
+        self.sub_store = await self.easy_store.get_sub_store("people")
+
+    async def asyncTearDown(self) -> None:
+        await self.easy_store.__aexit__(None, None, None)
+        sub_store_path = pathlib.Path("people.sbstore")
+        for path in (pathlib.Path(PATH_TEST_ASYNC_STORE), sub_store_path, pathlib.Path("people.sbstore.meta")):
+            path.unlink()
+        delete_side_files(sub_store_path)
+
+    async def test_async_read_and_write(self):
+        self.assertIs(self.sub_store, await self.easy_store.get_sub_store("people"))
+        self.assertEqual(["people"], await self.easy_store.get_sub_store_list())
+        self.assertEqual(2, await self.sub_store.insert_many([{"name": "dan", "age": 20}, {"name": "max", "age": 30}]))
+        self.assertEqual(1, await self.sub_store.insert_one(name="vadim", age=40))
+        self.assertEqual("max", (await self.sub_store.get_one(age=30)).name)
+        self.assertEqual(1, await self.sub_store.update_one({"name": "dan"}, {"age": 21}))
+        self.assertEqual(["dan"], [person.name for person in await self.sub_store.get_many(age__lt=30)])
+        self.assertEqual(1, await self.sub_store.delete_one(name="max"))
+        self.assertEqual(2, len(await self.sub_store.get_all()))
+
+    async def test_concurrent_writes_are_serialized(self):
+        await asyncio.gather(*[self.sub_store.insert_one(name=f"user{number}", age=number) for number in range(20)])
+        people = await self.sub_store.get_all()
+        self.assertEqual(20, len({person.id for person in people}))
+
+    async def test_identical_reads_are_coalesced(self):
+        await self.sub_store.insert_one(name="dan", age=20)
+        before = self.sub_store.lock_stats.shared_acquired
+        results = await asyncio.gather(*[self.sub_store.get_many(age__in=[20, 21]) for _ in range(5)])
+        self.assertEqual(before + 1, self.sub_store.lock_stats.shared_acquired)
+        self.assertEqual([["dan"]] * 5, [[person.name for person in people] for people in results])
+        self.assertIsNot(results[0], results[1])
+        await self.sub_store.insert_one(name="max", age=21)
+        self.assertEqual(2, len(await self.sub_store.get_many(age__in=[20, 21])))
+
+    async def test_async_lazy_load(self):
+        await self.sub_store.insert_many([{"name": f"user{number}", "age": number} for number in range(600)])
+        names = [person.name async for person in self.sub_store.lazy_load(age__ge=100)]
+        self.assertEqual(500, len(names))
+        async with self.sub_store.lazy_load(limit=3, fields=["name"]) as cursor:
+            self.assertEqual(["user0", "user1", "user2"], [person.name async for person in cursor])
@@ -2,6 +2,7 @@ from unittest import TestCase
 
 from easystore.autofields import AutoFieldAdder
 from easystore.meta import AbstractMetaSubStoreHandler
+from easystore.pkset import PkSet
 from easystore.utilis import MetaInfo, Validator, Record
 
 
@@ -11,7 +12,7 @@ class FakeMetaHandler(AbstractMetaSubStoreHandler):
         return MetaInfo(
             fields=["id", "name"],
             fields_config={"id": [Validator.pk], "name": []},
-            pk_sets={"id": {1, 2, 4}}
+            pk_sets={"id": PkSet([1, 2, 4])}
         )
 
 
@@ -33,6 +34,8 @@ class TestAutoFieldAdder(TestCase):
         record = self.auto_filler.add_auto_fields(record)
         self.assertEqual(record.id, 5)
 
-
-
-
+    def test_auto_filler_many(self):
+        meta = self.fake_meta.get_meta_data()
+        records = [Record(meta.fields, name="kek"), Record(meta.fields, id=7, name="lol"), Record(meta.fields)]
+        records = self.auto_filler.add_auto_fields_to_many(records)
+        self.assertEqual([8, 7, 9], [record.id for record in records])
@@ -0,0 +1,80 @@
+import pathlib
+from unittest import TestCase, skipIf, skipUnless
+
+from easystore.columns import numpy
+from easystore.database import SubStore
+from easystore.errors import NotFoundField
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_COLUMNS_FILE = "columns_test.sbstore"
+
+
+def create_sub_store_for_columns():
+    path = pathlib.Path(PATH_TEST_COLUMNS_FILE)
+    with path.open(mode="w") as st:
+        st.write("#records\n1 dan 20 1.5 01234\n2 max 21 2.5 1234\n3 dan 22 x 7")
+    meta_path = pathlib.Path(f"{PATH_TEST_COLUMNS_FILE}.meta")
+    with meta_path.open(mode="w") as stm:
+        stm.write("id[pk][int] name age[int] score zip\n#hashes\nid 1 2 3\n#endhashes")
+    return path
+
+
+class TestColumns(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = create_sub_store_for_columns()
+        self.sub_store = SubStore(self.test_path)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_COLUMNS_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_to_columns_types(self):
+        columns = self.sub_store.to_columns()
+        self.assertEqual(["id", "name", "age", "score", "zip"], columns.fields)
+        self.assertEqual(3, len(columns))
+        self.assertEqual("i", columns["age"].dtype.kind)
+        self.assertEqual("U", columns["score"].dtype.kind)
+        self.assertEqual(63, int(columns["age"].sum()))
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_untyped_text_is_not_parsed(self):
+        columns = self.sub_store.to_columns(["zip"])
+        self.assertEqual("U", columns["zip"].dtype.kind)
+        self.assertEqual(["01234", "1234", "7"], [record.zip for record in columns.records()])
+        for zip_code in ("1234", "01234", 1234):
+            self.assertEqual([record.id for record in self.sub_store.get_many(zip=zip_code)],
+                             self.sub_store.to_columns(["id"], zip=zip_code)["id"].tolist())
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_to_columns_conditions(self):
+        columns = self.sub_store.to_columns(["id", "age"], name="dan")
+        self.assertEqual(["id", "age"], columns.fields)
+        self.assertEqual([1, 3], columns["id"].tolist())
+        older = columns.where(columns["age"] > 20)
+        self.assertEqual([{"id": 3, "age": 22}], [dict(record) for record in older.records()])
+        self.assertEqual(0, len(self.sub_store.to_columns(score="old")))
+        with self.assertRaises(TypeError):
+            self.sub_store.to_columns(age="old")
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_to_columns_operators(self):
+        self.assertEqual([2, 3], self.sub_store.to_columns(["id"], age__gt=20)["id"].tolist())
+        self.assertEqual([1, 2], self.sub_store.to_columns(["id"], id__in=[1, 2, 7])["id"].tolist())
+        self.assertEqual([2], self.sub_store.to_columns(["id"], name__startswith="m")["id"].tolist())
+        self.assertEqual([1], self.sub_store.to_columns(["id"], age__le=21, name="dan")["id"].tolist())
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_to_columns_reloaded_after_change(self):
+        self.assertEqual(3, len(self.sub_store.to_columns(["id"])))
+        self.sub_store.insert_one(name="kek", age=30, score=1)
+        self.sub_store.delete_one(id=1)
+        self.assertEqual([2, 3, 4], self.sub_store.to_columns(["id"])["id"].tolist())
+        with self.assertRaises(NotFoundField):
+            self.sub_store.to_columns(["surname"])
+
+    @skipIf(numpy, "numpy is installed")
+    def test_to_columns_without_numpy(self):
+        with self.assertRaises(ImportError):
+            self.sub_store.to_columns()
@@ -3,6 +3,9 @@ import pathlib
 from unittest import TestCase
 
 from easystore.database import EasyStore, SubStore
+from easystore.migration import migrate_sub_store
+from easystore.recordformat import StoreFormats
+from tests.testutilis import delete_side_files
 
 
 class TestEasyStore(TestCase):
@@ -15,6 +18,7 @@ class TestEasyStore(TestCase):
         self.easy_store_path.unlink()
         pathlib.Path("students.sbstore").unlink()
         pathlib.Path("students.sbstore.meta").unlink()
+        delete_side_files(pathlib.Path("students.sbstore"))
 
     def test_easy_store_common(self):
         self.easy_store.create_sub_store("students", ["id[pk] name"])
@@ -28,3 +32,44 @@ class TestEasyStore(TestCase):
         # print(students_store.get_one())
         self.assertEqual(["id", "name"], students_store.spec)
 
+
+    def test_sub_stores_are_reused(self):
+        self.easy_store.create_sub_store("students", ["id[pk] name"])
+        students_store = self.easy_store.get_sub_store("students")
+        self.assertIs(students_store, self.easy_store.get_sub_store("students"))
+        students_store.insert_many([{"name": "kek"}, {"name": "lol"}])
+        students_store.delete_many(name="kek")
+        students_store.compact()
+        self.assertIs(students_store, self.easy_store.get_sub_store("students"))
+        self.assertEqual(["lol"], [student.name for student in self.easy_store.get_sub_store("students").get_all()])
+
+    def test_catalog_is_read_again_after_change(self):
+        other_store = EasyStore("easy_test.estore")
+        self.assertEqual([], other_store.get_sub_store_list())
+        with self.assertRaises(FileNotFoundError):
+            other_store.get_sub_store("students")
+        self.easy_store.create_sub_store("students", ["id[pk] name"])
+        self.assertEqual(["students"], other_store.get_sub_store_list())
+        self.assertEqual(["id", "name"], other_store.get_sub_store("students").spec)
+
+    def test_store_opens_with_missing_sub_store_file(self):
+        self.easy_store.create_sub_store("students", ["id[pk] name"])
+        self.easy_store.create_sub_store("teachers", ["id[pk] name"])
+        self.addCleanup(delete_side_files, pathlib.Path("teachers.sbstore"))
+        for side_file in ("teachers.sbstore", "teachers.sbstore.meta"):
+            pathlib.Path(side_file).unlink()
+        easy_store = EasyStore("easy_test.estore")
+        self.assertEqual(["students", "teachers"], easy_store.get_sub_store_list())
+        self.assertEqual([], easy_store.get_sub_store("students").get_all())
+        with self.assertRaises(FileNotFoundError):
+            easy_store.get_sub_store("teachers")
+
+    def test_sub_store_is_recreated_after_migration(self):
+        self.easy_store.create_sub_store("students", ["id[pk] name"])
+        students_store = self.easy_store.get_sub_store("students")
+        students_store.insert_one(name="kek")
+        migrate_sub_store(pathlib.Path("students.sbstore"), StoreFormats.BINARY)
+        migrated_store = self.easy_store.get_sub_store("students")
+        self.assertIsNot(students_store, migrated_store)
+        self.assertEqual(StoreFormats.BINARY, migrated_store.store_format)
+        self.assertEqual("kek", migrated_store.get_one(id=1).name)
@@ -0,0 +1,154 @@
+import pathlib
+from unittest import TestCase
+
+from easystore.database import SubStore
+from easystore.index import SubStoreIndex
+from easystore.meta import MetaSubStoreHandler
+from easystore.recordformat import StoreFormats
+from easystore.substorecreator import SubStoreCreator
+from easystore.utilis import read_record_at
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_INDEX_FILE = "index_test.sbstore"
+
+
+def create_sub_store_for_index():
+    path = pathlib.Path(PATH_TEST_INDEX_FILE)
+    with path.open(mode="w") as st:
+        st.write("#records\n1 dan\n2 max\n3 vadim")
+    meta_path = pathlib.Path(f"{PATH_TEST_INDEX_FILE}.meta")
+    with meta_path.open(mode="w") as stm:
+        stm.write("id[pk] name\n#hashes\nid 1 2 3\n#endhashes")
+    return path
+
+
+class TestSubStoreIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = create_sub_store_for_index()
+        self.index = SubStoreIndex(self.test_path, MetaSubStoreHandler(self.test_path))
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_INDEX_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_index_common(self):
+        offset = self.index.get_offset("id", 2)
+        with self.test_path.open(mode="rb") as st:
+            self.assertEqual("2 max\n", read_record_at(st, offset))
+        self.assertTrue(self.index.index_file_path.exists())
+        self.assertEqual(None, self.index.get_offset("id", 4))
+
+    def test_index_kept_by_insert_and_delete(self):
+        sub_store = SubStore(self.test_path)
+        sub_store.insert_one(name="kek")
+        sub_store.delete_one(id=1)
+        with self.test_path.open(mode="rb") as st:
+            self.assertEqual("kek", read_record_at(st, self.index.get_offset("id", 4)).split()[1])
+            self.assertEqual("vadim", read_record_at(st, self.index.get_offset("id", 3)).split()[1])
+        self.assertEqual(None, self.index.get_offset("id", 1))
+        self.assertEqual("kek", sub_store.get_one(id=4).name)
+
+    def test_removed_lines_do_not_pile_up(self):
+        sub_store = SubStore(self.test_path, compaction_threshold=1.0)
+        sub_store.insert_many([{"name": f"user{number}"} for number in range(100)])
+        for pk in range(4, 94):
+            sub_store.delete_one(id=pk)
+        with self.index.index_file_path.open(encoding="utf-8") as si:
+            lines = si.read().splitlines()[1:]
+        removed_lines = [line for line in lines if line.startswith("-")]
+        self.assertLessEqual(len(removed_lines) * 4, len(lines))
+        self.assertLess(len(lines), 50)
+        index = SubStoreIndex(self.test_path, MetaSubStoreHandler(self.test_path))
+        self.assertEqual(None, index.get_offset("id", 50))
+        with self.test_path.open(mode="rb") as st:
+            self.assertEqual("user99", read_record_at(st, index.get_offset("id", 103)).split()[1])
+        self.assertEqual(13, len(sub_store.get_all()))
+
+    def test_index_rebuild_after_outside_change(self):
+        self.index.get_offset("id", 1)
+        with self.test_path.open(mode="w") as st:
+            st.write("#records\n3 vadim\n1 dan")
+        offset = self.index.get_offset("id", 1)
+        with self.test_path.open(mode="rb") as st:
+            self.assertEqual("1 dan", read_record_at(st, offset))
+
+    def test_rebuild_replaces_index_file(self):
+        self.index.get_offset("id", 1)
+        content = self.index.index_file_path.read_text(encoding="utf-8")
+        with self.index.index_file_path.open(encoding="utf-8") as old_index:
+            with self.test_path.open(mode="a") as st:
+                st.write("\n4 kek")
+            self.assertIsNotNone(SubStoreIndex(self.test_path, MetaSubStoreHandler(self.test_path)).get_offset("id", 4))
+            self.assertEqual(content, old_index.read())
+        self.assertEqual([], list(self.test_path.parent.glob(f"{self.index.index_file_path.name}.*")))
+
+
+def create_sub_store_with_secondary_index():
+    path = pathlib.Path(PATH_TEST_INDEX_FILE)
+    with path.open(mode="w") as st:
+        st.write("#records\n1 dan kolo\n2 max jojo\n3 dan varpov")
+    meta_path = pathlib.Path(f"{PATH_TEST_INDEX_FILE}.meta")
+    with meta_path.open(mode="w") as stm:
+        stm.write("id[pk] name[index] surname\n#hashes\nid 1 2 3\n#endhashes")
+    return path
+
+
+class TestSecondaryIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = create_sub_store_with_secondary_index()
+        self.sub_store = SubStore(self.test_path)
+        self.index = SubStoreIndex(self.test_path, MetaSubStoreHandler(self.test_path))
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_INDEX_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_indexed_fields(self):
+        self.assertEqual(["id", "name"], self.index.indexed_fields())
+        self.assertEqual(2, len(self.index.get_offsets("name", "dan")))
+
+    def test_get_many_by_index(self):
+        students = self.sub_store.get_many(name="dan")
+        self.assertEqual(["1", "3"], [student.id for student in students])
+        students = self.sub_store.get_many(name="dan", surname="varpov")
+        self.assertEqual(["3"], [student.id for student in students])
+        self.assertEqual([], self.sub_store.get_many(name="kek"))
+
+    def test_get_one_and_delete_one_by_index(self):
+        self.sub_store.insert_one(name="kek", surname="lol")
+        self.assertEqual("4", self.sub_store.get_one(name="kek").id)
+        self.assertEqual(0, self.sub_store.delete_one(name="dan", surname="lol"))
+        self.assertEqual(1, self.sub_store.delete_one(name="dan"))
+        self.assertEqual(["3"], [student.id for student in self.sub_store.get_many(name="dan")])
+        self.assertEqual(["2", "3", "4"], [student.id for student in self.sub_store.get_all()])
+
+
+class TestIndexValues(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = pathlib.Path(PATH_TEST_INDEX_FILE)
+        creator = SubStoreCreator(pathlib.Path("teststore.estore"))
+        creator.create_sub_store("index_test", ["id[pk]", "name[index]"], StoreFormats.BINARY)
+        self.sub_store = SubStore(self.test_path)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_INDEX_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_values_with_line_breaks_are_kept_by_reopened_index(self):
+        self.sub_store.insert_many([{"name": "a\nb"}, {"name": "c d"}])
+        self.sub_store.delete_one(name="c d")
+        sub_store = SubStore(self.test_path)
+        self.assertEqual("a\nb", sub_store.get_many(id=1)[0].name)
+        self.assertEqual([1], [record.id for record in sub_store.get_many(name="a\nb")])
+        self.assertEqual([], sub_store.get_many(name="c d"))
+
+    def test_malformed_index_is_rebuilt(self):
+        self.sub_store.insert_one(name="dan")
+        index = SubStoreIndex(self.test_path, MetaSubStoreHandler(self.test_path))
+        content = index.index_file_path.read_text(encoding="utf-8")
+        index.index_file_path.write_text(content[:-3], encoding="utf-8")
+        self.assertEqual(1, len(SubStore(self.test_path).get_many(name="dan")))
+        self.assertEqual(content, index.index_file_path.read_text(encoding="utf-8"))
@@ -0,0 +1,91 @@
+import base64
+import json
+import pathlib
+from unittest import TestCase
+
+from easystore.database import SubStore
+from easystore.journal import Journal, JournalOperations
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_JOURNAL_FILE = "journal_test.sbstore"
+
+
+def create_sub_store_for_journal():
+    path = pathlib.Path(PATH_TEST_JOURNAL_FILE)
+    with path.open(mode="w") as st:
+        st.write("#records\n1 dan\n2 max")
+    meta_path = pathlib.Path(f"{PATH_TEST_JOURNAL_FILE}.meta")
+    with meta_path.open(mode="w") as stm:
+        stm.write("id[pk] name\n#hashes\nid 1 2\n#endhashes")
+    return path
+
+
+def write_journal(path: pathlib.Path, entries: list, committed: bool):
+    lines = [{"op": JournalOperations.BEGIN}, *entries]
+    if committed:
+        lines.append({"op": JournalOperations.COMMIT})
+    with Journal(path).journal_path.open(mode="w") as sj:
+        sj.writelines(json.dumps(line) + "\n" for line in lines)
+
+
+class TestJournal(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = create_sub_store_for_journal()
+        self.sub_store = SubStore(self.test_path)
+        self.insert_entries = [
+            {"op": JournalOperations.WRITE, "file": PATH_TEST_JOURNAL_FILE, "offset": 20,
+             "data": base64.b64encode(b"\n3 kek").decode("ascii")},
+            {"op": JournalOperations.META, "file": PATH_TEST_JOURNAL_FILE,
+             "changes": {"deleted_keys": {}, "inserted_keys": {"id": ["3"]}, "stats": {}}},
+        ]
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_JOURNAL_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_journal_truncated_after_write(self):
+        journal_path = Journal(self.test_path).journal_path
+        self.sub_store.insert_one(name="kek")
+        self.assertTrue(journal_path.stat().st_size)
+        Journal(self.test_path).checkpoint()
+        self.assertEqual(0, journal_path.stat().st_size)
+        self.sub_store.compact()
+        self.assertFalse(pathlib.Path(f"{PATH_TEST_JOURNAL_FILE}.temp").exists())
+        self.assertEqual(["dan", "max", "kek"], [person.name for person in self.sub_store.get_all()])
+
+    def test_recover_committed(self):
+        write_journal(self.test_path, self.insert_entries, committed=True)
+        self.assertEqual(1, self.sub_store.recover())
+        self.assertEqual("kek", self.sub_store.get_one(id=3).name)
+        self.assertEqual(0, self.sub_store.recover())
+        with self.test_path.open() as st:
+            self.assertEqual("#records\n1 dan\n2 max\n3 kek", st.read())
+
+    def test_recover_twice_applied(self):
+        self.sub_store.insert_one(name="kek")
+        write_journal(self.test_path, self.insert_entries, committed=True)
+        self.assertEqual(1, self.sub_store.recover())
+        self.assertEqual(["1", "2", "3"], [person.id for person in self.sub_store.get_all()])
+        self.sub_store.insert_one(name="lol")
+        self.assertEqual("4", self.sub_store.get_one(name="lol").id)
+
+    def test_recover_not_committed(self):
+        temp_path = pathlib.Path(f"{PATH_TEST_JOURNAL_FILE}.temp")
+        with temp_path.open(mode="w") as st:
+            st.write("#records\n1 lost")
+        entries = self.insert_entries + [
+            {"op": JournalOperations.REPLACE, "file": PATH_TEST_JOURNAL_FILE, "temp": temp_path.name}]
+        write_journal(self.test_path, entries, committed=False)
+        self.assertEqual(0, self.sub_store.recover())
+        self.assertFalse(temp_path.exists())
+        self.assertEqual(None, self.sub_store.get_one(id=3))
+        self.assertEqual(["dan", "max"], [person.name for person in self.sub_store.get_all()])
+
+    def test_group_commit(self):
+        with self.sub_store.group_commit():
+            self.sub_store.insert_one(name="kek")
+            self.sub_store.delete_one(id=1)
+            self.sub_store.update_one({"id": 2}, {"name": "lol"})
+        self.assertEqual(["lol", "kek"], [person.name for person in self.sub_store.get_all()])
+        self.assertEqual(["2", "3"], [person.id for person in SubStore(self.test_path).get_all()])
@@ -0,0 +1,106 @@
+import multiprocessing
+import pathlib
+import threading
+import time
+from unittest import TestCase, skipUnless
+
+from easystore.database import SubStore
+from easystore.locking import fcntl, get_sub_store_lock
+from easystore.substorecreator import SubStoreCreator
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_LOCKING_FILE = "locking_test.sbstore"
+
+
+def hold_exclusive_lock(sub_store_path: pathlib.Path, locked, seconds: float):
+    with get_sub_store_lock(sub_store_path).exclusive():
+        locked.set()
+        time.sleep(seconds)
+
+
+def insert_people(sub_store_path: pathlib.Path, count: int):
+    sub_store = SubStore(sub_store_path)
+    for _ in range(count):
+        sub_store.insert_one(name="dan")
+
+
+class TestSubStoreLock(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = pathlib.Path(PATH_TEST_LOCKING_FILE)
+        creator = SubStoreCreator(pathlib.Path("teststore.estore"))
+        creator.create_sub_store("locking_test", ["id[pk]", "name"])
+        self.sub_store = SubStore(self.test_path)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_LOCKING_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_nested_locks(self):
+        lock = get_sub_store_lock(self.test_path)
+        self.assertIs(lock, get_sub_store_lock(pathlib.Path(".") / PATH_TEST_LOCKING_FILE))
+        before = lock.stats
+        with lock.shared():
+            with lock.exclusive():
+                with lock.shared():
+                    self.sub_store.insert_one(name="dan")
+            self.assertEqual("dan", self.sub_store.get_one(id=1).name)
+        after = self.sub_store.lock_stats
+        self.assertEqual(before.shared_acquired + 3, after.shared_acquired)
+        self.assertEqual(before.exclusive_acquired + 2, after.exclusive_acquired)
+        self.assertEqual(before.contended, after.contended)
+
+    def test_readers_of_one_process_go_in_parallel(self):
+        lock = get_sub_store_lock(self.test_path)
+        all_read = threading.Barrier(3, timeout=5)
+        finish_reading = threading.Event()
+        written = []
+
+        def read():
+            with lock.shared():
+                all_read.wait()
+                finish_reading.wait(5)
+
+        def write():
+            with lock.exclusive():
+                written.append(self.sub_store.insert_one(name="dan"))
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        for reader in readers:
+            reader.start()
+        with lock.shared():
+            all_read.wait()
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.1)
+        self.assertEqual([], written)
+        finish_reading.set()
+        for thread in readers + [writer]:
+            thread.join()
+        self.assertEqual([1], written)
+
+    @skipUnless(fcntl, "fcntl is not available")
+    def test_reader_waits_for_writer_process(self):
+        context = multiprocessing.get_context("fork")
+        locked = context.Event()
+        writer = context.Process(target=hold_exclusive_lock, args=(self.test_path, locked, 0.2))
+        writer.start()
+        locked.wait(5)
+        before = self.sub_store.lock_stats
+        self.assertEqual([], self.sub_store.get_many())
+        writer.join()
+        after = self.sub_store.lock_stats
+        self.assertEqual(before.contended + 1, after.contended)
+        self.assertGreater(after.wait_time - before.wait_time, 0.05)
+
+    @skipUnless(fcntl, "fcntl is not available")
+    def test_concurrent_inserts_get_unique_ids(self):
+        context = multiprocessing.get_context("fork")
+        writers = [context.Process(target=insert_people, args=(self.test_path, 20)) for _ in range(2)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        ids = [person.id for person in self.sub_store.get_all()]
+        self.assertEqual(40, len(ids))
+        self.assertEqual(40, len(set(ids)))
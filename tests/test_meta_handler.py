@@ -83,3 +83,65 @@ class TestMetaUpdater(TestCase):
         self.assertEqual(self.start_id1_set, meta_info.pk_sets.get("id1"))
         self.assertEqual(self.start_id2_set, meta_info.pk_sets.get("id2"))
 
+    def test_meta_stats(self):
+        self.assertEqual(None, self.meta_handler.get_meta_data().rows_count)
+        self.meta_updater.update_meta_stats(3, 0)
+        self.meta_updater.update_meta_pk_hashes(deleted_records=[Record(_SPEC, id1=1, id2=8, pok="olo")],
+                                                dead_rows_count=1)
+        meta_info = self.meta_handler.get_meta_data()
+        self.assertEqual(2, meta_info.rows_count)
+        self.assertEqual(1, meta_info.dead_rows_count)
+        self.assertEqual({3, 4}, meta_info.pk_sets.get("id1"))
+
+    def test_meta_pk_sets_are_written_as_runs(self):
+        records = [Record(_SPEC, id1=number, id2=number + 100, pok="kek") for number in range(5, 1000)]
+        self.meta_updater.update_meta_pk_hashes(inserted_records=records)
+        self.meta_updater.update_meta_pk_hashes(deleted_records=[Record(_SPEC, id1=500, id2=600, pok="kek")])
+        meta_text = pathlib.Path(TEST_SUB_STORE_META).read_text()
+        self.assertIn("\nid1 1 3-499 501-999\n", meta_text)
+        self.assertIn("\nid2 8-9 105-599 601-1099\n", meta_text)
+        meta_info = self.meta_handler.get_meta_data()
+        self.assertEqual(997, len(meta_info.pk_sets["id1"]))
+        self.assertNotIn(500, meta_info.pk_sets["id1"])
+
+    def test_meta_sequences(self):
+        self.assertEqual({"id1": 4, "id2": 9}, self.meta_handler.get_meta_data().sequences)
+        self.meta_updater.update_meta_pk_hashes(deleted_records=[Record(_SPEC, id1=4, id2=9, pok="olo")])
+        self.assertEqual({"id1": 4, "id2": 9}, self.meta_handler.get_meta_data().sequences)
+        self.meta_updater.update_meta_pk_hashes(inserted_records=[self.record_1])
+        self.assertEqual({"id1": 7, "id2": 9}, self.meta_handler.get_meta_data().sequences)
+        self.meta_updater.apply_meta_changes(self.meta_updater.get_sequences_changes({"id2": 20}))
+        self.meta_updater.apply_meta_changes(self.meta_updater.get_sequences_changes({"id2": 15}))
+        meta_info = self.meta_handler.get_meta_data()
+        self.assertEqual({"id1": 7, "id2": 20}, meta_info.sequences)
+        self.assertEqual({1, 3, 7}, meta_info.pk_sets.get("id1"))
+
+
+class TestMetaCache(TestCase):
+
+    def setUp(self) -> None:
+        self.path_test = create_sub_store_meta_for_complex_test()
+        self.meta_handler = MetaSubStoreHandler(pathlib.Path(TEST_SUB_STORE))
+        self.meta_updater = MetaSubStoreUpdater(pathlib.Path(TEST_SUB_STORE))
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(pathlib.Path(TEST_SUB_STORE_META))
+
+    def test_meta_cache_shared_by_handlers(self):
+        meta_info = self.meta_handler.get_meta_data()
+        other_meta_info = MetaSubStoreHandler(pathlib.Path(TEST_SUB_STORE)).get_meta_data()
+        self.assertIs(meta_info, other_meta_info)
+        self.assertIs(meta_info, self.meta_handler.get_meta_data())
+
+    def test_meta_cache_invalidated_by_local_write(self):
+        self.meta_handler.get_meta_data()
+        self.meta_updater.update_meta_pk_hashes(inserted_records=[Record(_SPEC, id1=7, id2=2, pok="kek")])
+        self.assertIn(7, self.meta_handler.get_meta_data().pk_sets["id1"])
+
+    def test_meta_cache_invalidated_by_outside_write(self):
+        self.meta_handler.get_meta_data()
+        with self.path_test.open(mode="w") as stm:
+            stm.write(f"{' '.join(_SPEC)} new\n#hashes\nid1 1\nid2 8\n#endhashes")
+        meta_info = self.meta_handler.get_meta_data()
+        self.assertEqual(["id1", "id2", "pok", "new"], meta_info.fields)
+        self.assertEqual({1}, meta_info.pk_sets["id1"])
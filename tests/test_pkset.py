@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from easystore.pkset import PkSet
+
+
+class TestPkSet(TestCase):
+
+    def test_sequential_values_take_one_run(self):
+        pk_set = PkSet(range(1, 100001))
+        self.assertEqual(1, pk_set.runs_count)
+        self.assertEqual(100000, len(pk_set))
+        self.assertIn(5000, pk_set)
+        self.assertNotIn(100001, pk_set)
+        self.assertNotIn(0, pk_set)
+        self.assertNotIn("5", pk_set)
+        self.assertEqual("1-100000", pk_set.encode())
+        self.assertEqual(100000, pk_set.max())
+
+    def test_runs_are_split_and_merged(self):
+        pk_set = PkSet(range(1, 11))
+        pk_set.discard(5)
+        pk_set.discard(1)
+        pk_set.discard(10)
+        pk_set.discard(42)
+        self.assertEqual("2-4 6-9", pk_set.encode())
+        self.assertEqual(7, len(pk_set))
+        pk_set.update([5, 20, 11, 10])
+        self.assertEqual("2-11 20", pk_set.encode())
+        self.assertEqual(11, len(pk_set))
+        self.assertEqual({2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 20}, pk_set)
+
+    def test_decode(self):
+        pk_set = PkSet.decode(["7", "3", "1-4", "9-12", "8"])
+        self.assertEqual("1-4 7-12", pk_set.encode())
+        self.assertEqual(10, len(pk_set))
+        self.assertEqual(pk_set, PkSet.decode(pk_set.encode().split()))
+        self.assertEqual(0, len(PkSet.decode([])))
+
+    def test_copy_is_independent(self):
+        pk_set = PkSet([1, 2, 3])
+        copied = pk_set.copy()
+        copied.add(4)
+        copied.discard(1)
+        self.assertEqual({1, 2, 3}, pk_set)
+        self.assertEqual({2, 3, 4}, copied)
@@ -0,0 +1,40 @@
+import datetime
+from unittest import TestCase
+
+from easystore.predicate import Operators, get_predicate_plan, split_condition
+from easystore.utilis import FieldType
+
+
+class TestPredicatePlan(TestCase):
+
+    def test_split_condition(self):
+        self.assertEqual(("age", Operators.GT), split_condition("age__gt"))
+        self.assertEqual(("name", Operators.EQ), split_condition("name"))
+        self.assertEqual(("first__name", Operators.EQ), split_condition("first__name"))
+        self.assertEqual(("first__name", Operators.IN), split_condition("first__name__in"))
+
+    def test_untyped_conditions(self):
+        plan = get_predicate_plan(["id", "name", "age"], {}, ["name", "age__gt"])
+        matches = plan.bind({"name": "dan", "age__gt": 20})
+        self.assertTrue(matches(["1", "dan", "21"]))
+        self.assertFalse(matches(["2", "dan", "20"]))
+        self.assertFalse(matches(["3", "dan", "old"]))
+        self.assertFalse(matches(["4", "max", "30"]))
+        matches = plan.bind({"name": "max", "age__gt": "3"})
+        self.assertTrue(matches([4, "max", "30"]))
+
+    def test_typed_conditions(self):
+        fields_types = {"age": FieldType.int, "ts": FieldType.datetime}
+        plan = get_predicate_plan(["age", "ts", "name"], fields_types, ["age__in", "ts__lt", "name__startswith"])
+        matches = plan.bind({"age__in": ["20", 21], "ts__lt": "2024-01-02", "name__startswith": "da"})
+        self.assertTrue(matches([20, datetime.datetime(2024, 1, 1), "dan"]))
+        self.assertFalse(matches([22, datetime.datetime(2024, 1, 1), "dan"]))
+        self.assertFalse(matches([21, None, "dan"]))
+        self.assertFalse(matches([21, datetime.datetime(2024, 1, 1), "max"]))
+        with self.assertRaises(TypeError):
+            plan.bind({"age__in": ["old"], "ts__lt": "2024-01-02", "name__startswith": "da"})
+
+    def test_plans_are_cached(self):
+        plan = get_predicate_plan(["id", "name"], {}, ["name"])
+        self.assertIs(plan, get_predicate_plan(["id", "name"], {}, ["name"]))
+        self.assertIsNot(plan, get_predicate_plan(["id", "name"], {"name": FieldType.str}, ["name"]))
@@ -1,6 +1,7 @@
+import pickle
 from unittest import TestCase
 
-from easystore.utilis import Record
+from easystore.utilis import Record, get_record_class
 
 
 class TestRecord(TestCase):
@@ -42,3 +43,28 @@ class TestRecord(TestCase):
         self.assertEqual(student_dict, dict(student))
 
 
+
+
+class TestSlottedRecord(TestCase):
+
+    def setUp(self) -> None:
+        self.table_spec_students = ["student_id", "name", "surname"]
+
+    def test_record_class_common(self):
+        record_class = get_record_class(self.table_spec_students)
+        self.assertIs(record_class, get_record_class(list(self.table_spec_students)))
+        student = record_class(1, "Vadim", surname="Karpov")
+        self.assertFalse(hasattr(student, "__dict__"))
+        self.assertEqual("Vadim", student.name)
+        self.assertEqual("Karpov", student["surname"])
+        self.assertEqual(None, student["group"])
+        self.assertEqual({"student_id": 1, "name": "Vadim", "surname": "Karpov"}, dict(student))
+
+    def test_record_class_pickle(self):
+        student = get_record_class(self.table_spec_students)(1, "Vadim")
+        restored = pickle.loads(pickle.dumps(student))
+        self.assertEqual(dict(student), dict(restored))
+
+    def test_record_class_for_bad_fields(self):
+        student = get_record_class(["student-id", "class"])(1, "A")
+        self.assertEqual({"student-id": 1, "class": "A"}, dict(student))
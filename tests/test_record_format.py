@@ -0,0 +1,192 @@
+import pathlib
+from unittest import TestCase, mock
+
+from easystore.database import SubStore
+from easystore.errors import UnsupportedFormatError, UnsupportedValueError
+from easystore.migration import migrate_sub_store
+from easystore.recordformat import StoreFormats, BinaryRecordFormat, detect_record_format
+from easystore.substorecreator import SubStoreCreator
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_FORMAT_FILE = "format_test.sbstore"
+
+
+def create_text_sub_store():
+    path = pathlib.Path(PATH_TEST_FORMAT_FILE)
+    with path.open(mode="w") as st:
+        st.write("#records\n1 dan\n2 max\n3 vadim")
+    meta_path = pathlib.Path(f"{PATH_TEST_FORMAT_FILE}.meta")
+    with meta_path.open(mode="w") as stm:
+        stm.write("id[pk] name\n#hashes\nid 1 2 3\n#endhashes")
+    return path
+
+
+class TestBinarySubStore(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = pathlib.Path(PATH_TEST_FORMAT_FILE)
+        creator = SubStoreCreator(pathlib.Path("teststore.estore"))
+        creator.create_sub_store("format_test", ["id[pk]", "name", "age"], StoreFormats.BINARY)
+        self.sub_store = SubStore(self.test_path)
+        self.sub_store.insert_many([{"name": "dan", "age": 20}, {"name": "max kolo", "age": 21.5}])
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_FORMAT_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_binary_insert_and_get(self):
+        self.assertEqual(StoreFormats.BINARY, self.sub_store.store_format)
+        person = self.sub_store.get_one(id=2)
+        self.assertEqual("max kolo", person.name)
+        self.assertEqual(21.5, person.age)
+        self.assertEqual(1, self.sub_store.get_one(name="dan").id)
+        self.assertEqual(20, self.sub_store.get_one(age="20").age)
+
+    def test_binary_update_and_delete(self):
+        self.assertEqual(1, self.sub_store.update_one({"id": 1}, {"name": "da"}))
+        self.assertEqual(1, self.sub_store.update_one({"id": 2}, {"name": "much longer name"}))
+        self.assertEqual(["da", "much longer name"], [person.name for person in self.sub_store.get_all()])
+        self.assertEqual(1, self.sub_store.delete_one(id=1))
+        self.sub_store.insert_one(name="kek")
+        self.assertEqual([2, 3], [person.id for person in self.sub_store.get_all()])
+        self.assertEqual(2, self.sub_store.compact())
+        self.assertEqual("kek", self.sub_store.get_one(id=3).name)
+
+    def test_binary_projection(self):
+        people = self.sub_store.get_many(fields=["age"], name="max kolo")
+        self.assertEqual([{"age": 21.5}], [dict(person) for person in people])
+        self.assertEqual([{"name": "max kolo", "id": 2}],
+                         [dict(person) for person in self.sub_store.get_many(fields=["name", "id"], offset=1)])
+        with self.sub_store.lazy_load(fields=["age"], limit=1) as cursor:
+            self.assertEqual([{"age": 20}], [dict(person) for person in cursor])
+
+    def test_unsupported_version(self):
+        with self.test_path.open(mode="r+b") as st:
+            st.write(BinaryRecordFormat.MAGIC + b" 9")
+        with self.assertRaises(UnsupportedFormatError):
+            SubStore(self.test_path)
+
+
+class TestMigration(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = create_text_sub_store()
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_FORMAT_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_migrate_text_to_binary_and_back(self):
+        self.assertEqual("max", SubStore(self.test_path).get_one(id=2).name)
+        self.assertEqual(3, migrate_sub_store(self.test_path, StoreFormats.BINARY))
+        self.assertIsInstance(detect_record_format(self.test_path), BinaryRecordFormat)
+        sub_store = SubStore(self.test_path)
+        self.assertEqual("max", sub_store.get_one(id=2).name)
+        self.assertEqual([1, 2, 3], [person.id for person in sub_store.get_all()])
+        self.assertEqual(0, migrate_sub_store(self.test_path, StoreFormats.BINARY))
+
+        self.assertEqual(3, migrate_sub_store(self.test_path, StoreFormats.TEXT))
+        with self.test_path.open() as st:
+            self.assertEqual("#records\n1 dan\n2 max\n3 vadim", st.read())
+
+
+    def test_migration_to_text_refuses_values_with_whitespace(self):
+        migrate_sub_store(self.test_path, StoreFormats.BINARY)
+        sub_store = SubStore(self.test_path)
+        sub_store.insert_one(name="max kolo")
+        binary_content = self.test_path.read_bytes()
+        with self.assertRaises(UnsupportedValueError):
+            migrate_sub_store(self.test_path, StoreFormats.TEXT)
+        self.assertEqual(binary_content, self.test_path.read_bytes())
+        self.assertFalse(pathlib.Path(f"{PATH_TEST_FORMAT_FILE}.temp").exists())
+        self.assertEqual("max kolo", SubStore(self.test_path).get_one(id=4).name)
+
+
+class TestMappedScan(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = create_text_sub_store()
+        self.sub_store = SubStore(self.test_path)
+        self.file_sub_store = SubStore(self.test_path, use_mmap=False)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_FORMAT_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_mapped_scan_same_as_file_scan(self):
+        self.sub_store.insert_many([{"name": "dan"}, {"name": "danila"}, {"name": "max"}])
+        self.sub_store.delete_one(name="max")
+        for conditions in ({}, {"name": "dan"}, {"name": "max"}, {"name": "an"}, {"name": "dan", "id": 4}):
+            self.assertEqual([person.id for person in self.file_sub_store.get_many(**conditions)],
+                             [person.id for person in self.sub_store.get_many(**conditions)])
+        self.assertEqual(["1", "4"], [person.id for person in self.sub_store.get_many(name="dan")])
+
+    def test_mapped_scan_sees_new_rows(self):
+        self.assertEqual(None, self.sub_store.get_one(name="kek"))
+        self.sub_store.insert_one(name="kek")
+        self.assertEqual("4", self.sub_store.get_one(name="kek").id)
+        self.sub_store.update_one({"name": "kek"}, {"name": "kekkekkek"})
+        self.assertEqual("4", self.sub_store.get_one(name="kekkekkek").id)
+        self.sub_store.compact()
+        self.assertEqual(["dan", "max", "vadim", "kekkekkek"], [person.name for person in self.sub_store.get_all()])
+
+    def test_mapped_scan_binary_values(self):
+        migrate_sub_store(self.test_path, StoreFormats.BINARY)
+        sub_store = SubStore(self.test_path)
+        sub_store.insert_many([{"name": 2.5}, {"name": True}])
+        self.assertEqual(4, sub_store.get_one(name="2.5").id)
+        self.assertEqual(5, sub_store.get_one(name=True).id)
+        self.assertEqual(2, sub_store.get_one(name="max").id)
+
+
+class TestParallelScan(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = pathlib.Path(PATH_TEST_FORMAT_FILE)
+        range_size_patch = mock.patch.object(SubStore, "PARALLEL_SCAN_MIN_RANGE_SIZE", 32)
+        range_size_patch.start()
+        self.addCleanup(range_size_patch.stop)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_FORMAT_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def create_sub_store(self, store_format: str) -> SubStore:
+        creator = SubStoreCreator(pathlib.Path("teststore.estore"))
+        creator.create_sub_store("format_test", ["id[pk]", "name", "age[int]"], store_format)
+        sub_store = SubStore(self.test_path)
+        sub_store.insert_many([{"name": name, "age": age} for age in range(20) for name in ("dan", "max", "vadim")])
+        sub_store.delete_one(id=5)
+        return sub_store
+
+    def check_parallel_scan(self, sub_store: SubStore):
+        for conditions in ({}, {"name": "dan"}, {"age__gt": 10, "name__in": ["max", "vadim"]}, {"name": "kek"}):
+            self.assertEqual([dict(person) for person in sub_store.get_many(**conditions)],
+                             [dict(person) for person in sub_store.get_many(workers=2, **conditions)])
+        people = sub_store.get_many(workers=3, limit=2, offset=1, fields=["id"], name="max")
+        self.assertEqual(["8", "11"], [str(person.id) for person in people])
+
+    def test_split_ranges(self):
+        sub_store = self.create_sub_store(StoreFormats.TEXT)
+        with self.test_path.open(mode="rb") as st:
+            buffer = st.read()
+        record_format = detect_record_format(self.test_path)
+        ranges = record_format.split_ranges(buffer, 4)
+        self.assertEqual(len(buffer), ranges[-1][1])
+        self.assertTrue(all(buffer[start - 1:start] == b"\n" for start, _ in ranges))
+        rows = [offset for bounds in ranges for offset, _ in record_format.read_mapped_records(buffer, bounds=bounds)]
+        self.assertEqual([offset for offset, _ in record_format.read_mapped_records(buffer)], rows)
+        self.assertEqual(59, len(sub_store.get_all()))
+
+    def test_parallel_text_scan(self):
+        self.check_parallel_scan(self.create_sub_store(StoreFormats.TEXT))
+
+    def test_parallel_binary_scan(self):
+        sub_store = self.create_sub_store(StoreFormats.BINARY)
+        record_format = detect_record_format(self.test_path)
+        with self.test_path.open(mode="rb") as st:
+            buffer = st.read()
+        rows = [offset for bounds in record_format.split_ranges(buffer, 4)
+                for offset, _ in record_format.read_mapped_records(buffer, bounds=bounds)]
+        self.assertEqual([offset for offset, _ in record_format.read_mapped_records(buffer)], rows)
+        self.check_parallel_scan(sub_store)
@@ -0,0 +1,99 @@
+import pathlib
+from unittest import TestCase
+
+from easystore.database import SubStore
+from easystore.resultcache import ResultCache, estimate_size
+from easystore.substorecreator import SubStoreCreator
+from easystore.utilis import get_record_class
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_RESULT_CACHE_FILE = "result_cache_test.sbstore"
+
+
+class TestResultCache(TestCase):
+
+    def setUp(self) -> None:
+        record_class = get_record_class(["id", "name"])
+        self.records = [record_class(id=number, name=f"user{number}") for number in range(3)]
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(max_entries=2, max_size=1024 * 1024)
+        cache.get_or_load("a", 1, lambda: self.records[:1])
+        cache.get_or_load("b", 1, lambda: self.records[1:2])
+        self.assertIs(self.records[0], cache.get_or_load("a", 1, lambda: [])[0])
+        cache.get_or_load("c", 1, lambda: self.records[2:])
+        self.assertEqual([], cache.get_or_load("b", 1, lambda: []))
+        stats = cache.stats
+        self.assertEqual((1, 4, 2, 2), (stats.hits, stats.misses, stats.evictions, stats.entries))
+
+    def test_size_is_bounded(self):
+        one_record_size = estimate_size(self.records[:1])
+        cache = ResultCache(max_entries=10, max_size=one_record_size * 2)
+        cache.get_or_load("a", 1, lambda: self.records[:1])
+        cache.get_or_load("b", 1, lambda: self.records[1:2])
+        cache.get_or_load("c", 1, lambda: self.records[2:])
+        cache.get_or_load("all", 1, lambda: self.records)
+        stats = cache.stats
+        self.assertEqual(2, stats.entries)
+        self.assertLessEqual(stats.size, one_record_size * 2)
+
+    def test_changed_state_drops_entries(self):
+        cache = ResultCache(max_entries=10, max_size=1024 * 1024)
+        cache.get_or_load("a", 1, lambda: self.records)
+        self.assertEqual([], cache.get_or_load("a", 2, lambda: []))
+        self.assertEqual((1, 0), (cache.stats.invalidations, cache.stats.hits))
+
+
+class TestSubStoreResultCache(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = pathlib.Path(PATH_TEST_RESULT_CACHE_FILE)
+        creator = SubStoreCreator(pathlib.Path("teststore.estore"))
+        creator.create_sub_store("result_cache_test", ["id[pk][int]", "name", "age[int]"])
+        self.sub_store = SubStore(self.test_path, result_cache_entries=8)
+        self.sub_store.insert_many([{"name": "dan", "age": 20}, {"name": "max", "age": 30}])
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_RESULT_CACHE_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_repeated_queries_hit_cache(self):
+        self.assertEqual("dan", self.sub_store.get_one(age__lt=25).name)
+        self.assertEqual("dan", self.sub_store.get_one(age__lt=25).name)
+        self.assertIsNone(self.sub_store.get_one(name="vadim"))
+        self.assertIsNone(self.sub_store.get_one(name="vadim"))
+        found = self.sub_store.get_many(age__in=[20, 30], name__startswith="d")
+        found.clear()
+        self.assertEqual(1, len(self.sub_store.get_many(name__startswith="d", age__in=[20, 30])))
+        self.assertEqual(["dan"], [record.name for record in self.sub_store.get_many(limit=1, fields=["name"])])
+        self.assertEqual(2, len(self.sub_store.get_all()))
+        stats = self.sub_store.result_cache_stats
+        self.assertEqual((3, 5), (stats.hits, stats.misses))
+
+    def test_writes_invalidate_results(self):
+        self.assertEqual(20, self.sub_store.get_one(name="dan").age)
+        self.sub_store.update_one({"name": "dan"}, {"age": 21})
+        self.assertEqual(21, self.sub_store.get_one(name="dan").age)
+        self.sub_store.delete_one(name="dan")
+        self.assertIsNone(self.sub_store.get_one(name="dan"))
+        self.sub_store.insert_one(name="dan", age=22)
+        self.assertEqual(22, self.sub_store.get_one(name="dan").age)
+        with self.sub_store.session() as session:
+            session.insert_one(name="vadim", age=40)
+        self.assertEqual(3, len(self.sub_store.get_all()))
+        self.assertEqual(0, self.sub_store.result_cache_stats.hits)
+
+    def test_writes_of_other_sub_store_object_invalidate_results(self):
+        other_sub_store = SubStore(self.test_path)
+        self.assertEqual(2, len(self.sub_store.get_all()))
+        other_sub_store.insert_one(name="vadim", age=40)
+        self.assertEqual(3, len(self.sub_store.get_all()))
+        other_sub_store.update_one({"name": "vadim"}, {"age": 41})
+        self.assertEqual(41, self.sub_store.get_one(name="vadim").age)
+        self.assertEqual(0, self.sub_store.result_cache_stats.hits)
+
+    def test_cache_is_off_by_default(self):
+        sub_store = SubStore(self.test_path)
+        sub_store.get_all()
+        sub_store.get_all()
+        self.assertEqual((0, 0), (sub_store.result_cache_stats.hits, sub_store.result_cache_stats.misses))
@@ -0,0 +1,69 @@
+import pathlib
+from unittest import TestCase
+
+from easystore.database import SubStore
+from easystore.errors import UniqueKeyError
+from easystore.substorecreator import SubStoreCreator
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_SESSION_FILE = "session_test.sbstore"
+
+
+class TestSubStoreSession(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = pathlib.Path(PATH_TEST_SESSION_FILE)
+        creator = SubStoreCreator(pathlib.Path("teststore.estore"))
+        creator.create_sub_store("session_test", ["id[pk][int]", "name", "age[int]"])
+        self.sub_store = SubStore(self.test_path)
+        self.sub_store.insert_one(name="dan", age=20)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{PATH_TEST_SESSION_FILE}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_inserts_are_flushed_once(self):
+        size = self.test_path.stat().st_size
+        with self.sub_store.session() as session:
+            for number in range(10):
+                session.insert_one(name=f"user{number}", age=number)
+            self.assertEqual(2, session.insert_many([{"name": "max", "age": 30}, {"id": 40, "name": "vadim"}]))
+            self.assertEqual(12, session.pending)
+            self.assertEqual(size, self.test_path.stat().st_size)
+        people = self.sub_store.get_all()
+        self.assertEqual(list(range(1, 12)) + [41, 40], [person.id for person in people])
+        self.sub_store.insert_one(name="kek")
+        self.assertEqual(42, self.sub_store.get_one(name="kek").id)
+
+    def test_empty_insert_many(self):
+        with self.sub_store.session() as session:
+            self.assertEqual(0, session.insert_many([]))
+            self.assertEqual(0, session.pending)
+        self.assertEqual(1, len(self.sub_store.get_all()))
+
+    def test_session_reads_see_buffered_records(self):
+        with self.sub_store.session() as session:
+            session.insert_one(name="max", age=30)
+            self.assertEqual(2, session.get_one(name="max").id)
+            self.assertEqual(0, session.pending)
+            self.assertEqual(1, session.delete_one(id=2))
+            session.insert_one(id=2, name="vadim")
+            self.assertEqual(1, session.update_one({"id": 2}, {"age": 40}))
+            self.assertEqual(["dan", "vadim"], [person.name for person in session.get_many()])
+
+    def test_session_validation_and_rollback(self):
+        with self.sub_store.session() as session:
+            session.insert_one(id=5, name="max")
+            with self.assertRaises(UniqueKeyError):
+                session.insert_one(id=5, name="vadim")
+            with self.assertRaises(UniqueKeyError):
+                session.insert_one(id=1, name="vadim")
+            with self.assertRaises(TypeError):
+                session.insert_one(name="vadim", age="old")
+        with self.assertRaises(ValueError):
+            with self.sub_store.session() as session:
+                session.insert_one(name="lost")
+                raise ValueError()
+        self.assertEqual([1, 5], [person.id for person in self.sub_store.get_all()])
+        with self.assertRaises(RuntimeError):
+            session.insert_one(name="late")
@@ -22,3 +22,12 @@ class TestSpecParser(TestCase):
         spec_info = self.spec_parser.parse_spec_string(spec)
         self.assertEqual(["id", "name"], spec_info.fields)
         self.assertEqual({"id": ["pk"], "name": []}, spec_info.fields_configs)
+
+    def test_spec_parser_index_config(self):
+        spec_info = self.spec_parser.parse_spec_list(["id[pk]", "name[index]"])
+        self.assertEqual({"id": ["pk"], "name": ["index"]}, spec_info.fields_configs)
+
+    def test_spec_parser_field_types(self):
+        spec_info = self.spec_parser.parse_spec_list(["id[pk]", "age[int]", "ts[datetime][index]"])
+        self.assertEqual({"id": ["pk"], "age": [], "ts": ["index"]}, spec_info.fields_configs)
+        self.assertEqual({"age": "int", "ts": "datetime"}, spec_info.fields_types)
@@ -1,10 +1,13 @@
+import datetime
 import pathlib
 from pathlib import Path
 from unittest import TestCase
 
 from easystore.database import SubStore
-from easystore.errors import NotFoundField, UniqueKeyError
-from tests.testutilis import delete_temp_files_v3
+from easystore.errors import NotFoundField, UniqueKeyError, UnsupportedValueError
+from easystore.recordformat import StoreFormats
+from easystore.substorecreator import SubStoreCreator
+from tests.testutilis import delete_temp_files_v3, delete_side_files
 
 PATH_TEST_INSERT_FILE = "insert_test.sbstore"
 PATH_TEST_DELETE_FILE = "delete_test.sbstore"
@@ -39,6 +42,7 @@ def delete_temp_files_v2(*files: pathlib.Path):
         meta_file = file.parent / pathlib.Path(f"{file.name}.meta")
         meta_file.unlink()
         file.unlink()
+    delete_side_files(*files)
 
 
 def delete_temp_files():
@@ -58,6 +62,7 @@ class TestSubStore(TestCase):
 
     def tearDown(self) -> None:
         delete_temp_files()
+        delete_side_files(self.sub_store_path, self.insert)
 
     def test_sub_store_spec(self):
         sub_store = SubStore(self.sub_store_path)
@@ -217,6 +222,39 @@ class TestSubStoreDeleting(TestCase):
         self.assertEqual(0, res)
 
 
+class TestTombstoneDeleting(TestCase):
+
+    def setUp(self) -> None:
+        self.test_path = create_test_sub_store_for_deleting()
+        self.sub_store = SubStore(self.test_path, compaction_threshold=0.6)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v2(self.test_path)
+
+    def test_delete_one_in_place(self):
+        size = self.test_path.stat().st_size
+        res = self.sub_store.delete_one(id=2)
+        self.assertEqual(1, res)
+        self.assertEqual(size, self.test_path.stat().st_size)
+        self.assertEqual(["dan", "lol"], [person.name for person in self.sub_store.get_all()])
+        self.assertEqual(None, self.sub_store.get_one(name="kek"))
+        self.assertEqual(1, self.sub_store.insert_one(id=2, name="kek"))
+        self.assertEqual("kek", self.sub_store.get_one(id=2).name)
+
+    def test_compact(self):
+        self.sub_store.delete_one(id=1)
+        self.assertEqual(2, self.sub_store.compact())
+        self.assertEqual("#records\n2 kek\n3 lol", self.test_path.read_text())
+        self.assertEqual("lol", self.sub_store.get_one(id=3).name)
+
+    def test_compact_after_threshold(self):
+        self.sub_store.delete_one(id=1)
+        self.assertEqual("#records\n     \n2 kek\n3 lol\n", self.test_path.read_text())
+        self.sub_store.delete_one(id=2)
+        self.assertEqual("#records\n3 lol", self.test_path.read_text())
+        self.assertEqual(["lol"], [person.name for person in self.sub_store.get_all()])
+
+
 def create_sub_store_with_meta(path: str):
     sub_store_path = pathlib.Path(path)
     sub_store_meta_path = pathlib.Path(f"{path}.meta")
@@ -237,6 +275,7 @@ class TestInsertDeleteOperationsWithMeta(TestCase):
 
     def tearDown(self) -> None:
         delete_temp_files_v3(self.test_path, pathlib.Path(f"{self.test_str_path}.meta"))
+        delete_side_files(self.test_path)
 
     def test_common_insert(self):
         student_dan = self.sub_store.get_one(id=1)
@@ -262,10 +301,22 @@ class TestInsertDeleteOperationsWithMeta(TestCase):
             self.sub_store.insert_one(id=1, name="jojo")
 
     def test_insert_many(self):
-        pass
+        res = self.sub_store.insert_many([{"name": "jojo"}, {"id": 7, "name": "kek"}, {"name": "lol"}])
+        self.assertEqual(3, res)
+        self.assertEqual("jojo", self.sub_store.get_one(id=8).name)
+        self.assertEqual("kek", self.sub_store.get_one(id=7).name)
+        self.assertEqual("lol", self.sub_store.get_one(id=9).name)
+        self.assertEqual(6, len(self.sub_store.get_all()))
+        with self.assertRaises(UniqueKeyError):
+            self.sub_store.insert_one(id=9, name="olo")
 
     def test_insert_many_with_error_in_one(self):
-        pass
+        with self.assertRaises(UniqueKeyError):
+            self.sub_store.insert_many([{"id": 4, "name": "jojo"}, {"id": 2, "name": "kek"}])
+        with self.assertRaises(UniqueKeyError):
+            self.sub_store.insert_many([{"id": 4, "name": "jojo"}, {"id": 4, "name": "kek"}])
+        self.assertEqual(3, len(self.sub_store.get_all()))
+        self.assertEqual(None, self.sub_store.get_one(id=4))
 
     def test_delete_one(self):
         res = self.sub_store.delete_one(id=1)
@@ -280,7 +331,273 @@ class TestInsertDeleteOperationsWithMeta(TestCase):
         self.assertEqual("kek", updated_person.name)
         self.assertEqual("1", updated_person.id)
 
+    def test_update_one_keeps_position(self):
+        meta = pathlib.Path(f"{self.test_str_path}.meta").read_text()
+        res = self.sub_store.update_one({"id": 2}, {"name": "maximilian"})
+        self.assertEqual(1, res)
+        self.assertEqual(["dan", "maximilian", "vadim"], [person.name for person in self.sub_store.get_all()])
+        self.assertEqual(meta, pathlib.Path(f"{self.test_str_path}.meta").read_text())
+        self.assertEqual(0, self.sub_store.update_one({"id": 7}, {"name": "kek"}))
+
+    def test_update_one_pk(self):
+        res = self.sub_store.update_one({"name": "max"}, {"id": 7})
+        self.assertEqual(1, res)
+        self.assertEqual(["1", "7", "3"], [person.id for person in self.sub_store.get_all()])
+        self.assertEqual(None, self.sub_store.get_one(id=2))
+        with self.assertRaises(UniqueKeyError):
+            self.sub_store.insert_one(id=7, name="kek")
+
     def test_update_one_with_pk_error(self):
 
         with self.assertRaises(UniqueKeyError):
             self.sub_store.update_one({"id": 1}, {"id": 2})
+
+
+class TestTextValues(TestCase):
+
+    def setUp(self) -> None:
+        self.test_str_path = "test_text_values.sbstore"
+        self.test_path = create_sub_store_with_meta(self.test_str_path)
+        self.sub_store = SubStore(self.test_path)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{self.test_str_path}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_values_with_whitespace_are_rejected(self):
+        size = self.test_path.stat().st_size
+        with self.assertRaises(UnsupportedValueError):
+            self.sub_store.insert_one(name="Anna Maria")
+        with self.assertRaises(UnsupportedValueError):
+            self.sub_store.insert_many([{"name": "kek"}, {"name": ""}])
+        with self.assertRaises(UnsupportedValueError):
+            self.sub_store.update_one({"id": 1}, {"name": "dan\tthe first"})
+        with self.assertRaises(UnsupportedValueError):
+            self.sub_store.update_many({}, {"name": "a very long name which does not fit"})
+        self.assertEqual(size, self.test_path.stat().st_size)
+        self.assertEqual(["dan", "max", "vadim"], [record.name for record in self.sub_store.get_all()])
+        self.sub_store.insert_one(name="anna")
+        self.assertEqual("4", self.sub_store.get_one(name="anna").id)
+        self.assertEqual([], list(pathlib.Path(".").glob(f"{self.test_str_path}*.temp")))
+
+
+class TestAutoIncrement(TestCase):
+
+    def setUp(self) -> None:
+        self.test_str_path = "test_auto_increment.sbstore"
+        self.test_path = create_sub_store_with_meta(self.test_str_path)
+        self.sub_store = SubStore(self.test_path)
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path(f"{self.test_str_path}.meta"))
+        delete_side_files(self.test_path)
+
+    def test_ids_of_deleted_records_are_not_reused(self):
+        self.sub_store.delete_one(id=3)
+        self.sub_store.insert_one(name="kek")
+        self.assertEqual("4", self.sub_store.get_one(name="kek").id)
+        self.sub_store.delete_one(name="kek")
+        self.sub_store.compact()
+        self.sub_store.insert_many([{"name": "lol"}, {"name": "olo"}])
+        self.assertEqual(["1", "2", "5", "6"], [record.id for record in self.sub_store.get_all()])
+
+    def test_reserved_ids(self):
+        self.assertEqual(range(4, 14), self.sub_store.reserve_ids(10))
+        self.assertEqual(range(14, 15), self.sub_store.reserve_ids(1, field="id"))
+        self.sub_store.insert_one(name="kek")
+        self.assertEqual("15", self.sub_store.get_one(name="kek").id)
+        self.sub_store.insert_one(id=5, name="lol")
+        self.assertEqual("5", self.sub_store.get_one(name="lol").id)
+        with self.assertRaises(NotFoundField):
+            self.sub_store.reserve_ids(1, field="name")
+        with self.assertRaises(ValueError):
+            self.sub_store.reserve_ids(0)
+
+    def test_session_ids_follow_sequence(self):
+        self.sub_store.delete_one(id=3)
+        with self.sub_store.session() as session:
+            session.insert_many([{"name": "kek"}, {"name": "lol"}])
+        self.assertEqual(["1", "2", "4", "5"], [record.id for record in self.sub_store.get_all()])
+
+
+class TestManyOperations(TestCase):
+
+    def setUp(self) -> None:
+        self.test_str_path = "test_many.sbstore"
+        self.test_path = create_sub_store_with_meta(self.test_str_path)
+        self.sub_store = SubStore(self.test_path, compaction_threshold=1)
+        self.sub_store.insert_many([{"name": "dan"}, {"name": "max"}])
+
+    def tearDown(self) -> None:
+        delete_temp_files_v2(self.test_path)
+
+    def test_delete_many(self):
+        res = self.sub_store.delete_many(name="dan")
+        self.assertEqual(2, res)
+        self.assertEqual(["2", "3", "5"], [person.id for person in self.sub_store.get_all()])
+        self.assertEqual(0, self.sub_store.delete_many(name="dan"))
+        self.sub_store.insert_one(id=1, name="kek")
+        self.assertEqual("kek", self.sub_store.get_one(id=1).name)
+
+    def test_update_many_in_place(self):
+        size = self.test_path.stat().st_size
+        res = self.sub_store.update_many({"name": "max"}, {"name": "kek"})
+        self.assertEqual(2, res)
+        self.assertEqual(size, self.test_path.stat().st_size)
+        self.assertEqual(["dan", "kek", "vadim", "dan", "kek"], [person.name for person in self.sub_store.get_all()])
+
+    def test_update_many_with_longer_rows(self):
+        self.sub_store.delete_one(id=3)
+        res = self.sub_store.update_many({"name": "dan"}, {"name": "alexander"})
+        self.assertEqual(2, res)
+        self.assertEqual(["alexander", "max", "alexander", "max"], [person.name for person in self.sub_store.get_all()])
+        self.assertEqual("max", self.sub_store.get_one(id=5).name)
+        self.assertEqual(["1", "4"], [person.id for person in self.sub_store.get_many(name="alexander")])
+
+    def test_update_many_pk(self):
+        with self.assertRaises(UniqueKeyError):
+            self.sub_store.update_many({"name": "dan"}, {"id": 10})
+        self.assertEqual(1, self.sub_store.update_many({"name": "vadim"}, {"id": 10}))
+        self.assertEqual("vadim", self.sub_store.get_one(id=10).name)
+        self.assertEqual(None, self.sub_store.get_one(id=3))
+        self.sub_store.insert_one(id=3, name="kek")
+        self.assertEqual("kek", self.sub_store.get_one(id=3).name)
+
+
+class TestLazyLoad(TestCase):
+
+    def setUp(self) -> None:
+        self.test_str_path = "test_lazy.sbstore"
+        self.test_path = create_sub_store_with_meta(self.test_str_path)
+        self.sub_store = SubStore(self.test_path)
+        self.sub_store.insert_many([{"name": "dan"}, {"name": "max"}])
+
+    def tearDown(self) -> None:
+        delete_temp_files_v2(self.test_path)
+
+    def test_lazy_load_common(self):
+        self.assertEqual(["1", "2", "3", "4", "5"], [person.id for person in self.sub_store.lazy_load()])
+        self.assertEqual(["1", "4"], [person.id for person in self.sub_store.lazy_load(name="dan")])
+        self.assertEqual([], list(self.sub_store.lazy_load(name="kek")))
+        with self.assertRaises(NotFoundField):
+            self.sub_store.lazy_load(surname="dan")
+
+    def test_lazy_load_close(self):
+        cursor = self.sub_store.lazy_load()
+        self.assertEqual("1", next(cursor).id)
+        cursor.close()
+        self.assertTrue(cursor.closed)
+        self.assertEqual([], list(cursor))
+        with self.sub_store.lazy_load(name="max") as cursor:
+            self.assertEqual("2", next(cursor).id)
+        self.assertTrue(cursor.closed)
+
+    def test_lazy_load_while_changing(self):
+        cursor = self.sub_store.lazy_load()
+        self.assertEqual("1", next(cursor).id)
+        self.sub_store.insert_one(name="kek")
+        self.sub_store.delete_many(name="max")
+        self.sub_store.compact()
+        self.assertEqual(["2", "3", "4", "5"], [person.id for person in cursor])
+        self.assertEqual(["1", "3", "4", "6"], [person.id for person in self.sub_store.lazy_load()])
+
+
+class TestLimitOffsetFields(TestCase):
+
+    def setUp(self) -> None:
+        self.test_str_path = "test_paging.sbstore"
+        self.test_path = create_sub_store_with_meta(self.test_str_path)
+        self.sub_store = SubStore(self.test_path)
+        self.sub_store.insert_many([{"name": "dan"}, {"name": "max"}, {"name": "dan"}])
+
+    def tearDown(self) -> None:
+        delete_temp_files_v2(self.test_path)
+
+    def test_get_many_limit_offset(self):
+        self.assertEqual(["1", "2"], [person.id for person in self.sub_store.get_many(limit=2)])
+        self.assertEqual(["3", "4"], [person.id for person in self.sub_store.get_many(limit=2, offset=2)])
+        self.assertEqual(["4", "6"], [person.id for person in self.sub_store.get_many(offset=1, name="dan")])
+        self.assertEqual([], self.sub_store.get_many(limit=0))
+        self.assertEqual(["4"], [person.id for person in self.sub_store.get_many(id=4, limit=1)])
+        self.assertEqual([], self.sub_store.get_many(id=4, offset=1))
+
+    def test_get_many_fields(self):
+        people = self.sub_store.get_many(fields=["name"], limit=2)
+        self.assertEqual([{"name": "dan"}, {"name": "max"}], [dict(person) for person in people])
+        people = self.sub_store.get_many(fields=["id"], name="max")
+        self.assertEqual([{"id": "2"}, {"id": "5"}], [dict(person) for person in people])
+        self.assertEqual([{"id": "3", "name": "vadim"}],
+                         [dict(person) for person in self.sub_store.get_many(fields=["id", "name"], id=3)])
+        with self.assertRaises(NotFoundField):
+            self.sub_store.get_many(fields=["surname"])
+
+    def test_lazy_load_limit_offset_fields(self):
+        with self.sub_store.lazy_load(limit=2, offset=1, fields=["id"], name="dan") as cursor:
+            self.assertEqual([{"id": "4"}, {"id": "6"}], [dict(person) for person in cursor])
+        cursor = self.sub_store.lazy_load(limit=1)
+        self.assertEqual(["1"], [person.id for person in cursor])
+        self.assertTrue(cursor.closed)
+
+
+class TestTypedFields(TestCase):
+    store_format = StoreFormats.TEXT
+
+    def setUp(self) -> None:
+        self.test_path = pathlib.Path("typed_test.sbstore")
+        creator = SubStoreCreator(pathlib.Path("teststore.estore"))
+        creator.create_sub_store("typed_test", ["id[pk]", "age[int][index]", "price[float]", "ts[datetime]", "name"],
+                                 self.store_format)
+        self.sub_store = SubStore(self.test_path)
+        self.sub_store.insert_many([
+            {"age": "20", "price": 1, "ts": "2024-01-02T03:04:05", "name": "dan"},
+            {"age": 21, "price": "2.5", "ts": datetime.datetime(2024, 1, 3), "name": "21"},
+        ])
+
+    def tearDown(self) -> None:
+        delete_temp_files_v3(self.test_path, pathlib.Path("typed_test.sbstore.meta"))
+        delete_side_files(self.test_path)
+
+    def test_typed_values_are_native(self):
+        person = self.sub_store.get_one(name="dan")
+        self.assertEqual(20, person.age)
+        self.assertIsInstance(person.age, int)
+        self.assertEqual(1.0, person.price)
+        self.assertIsInstance(person.price, float)
+        self.assertEqual(datetime.datetime(2024, 1, 2, 3, 4, 5), person.ts)
+        self.assertEqual("21", self.sub_store.get_one(age=21).name)
+
+    def test_typed_conditions(self):
+        self.assertEqual(["dan"], [person.name for person in self.sub_store.get_many(age="20")])
+        self.assertEqual(["21"], [person.name for person in self.sub_store.get_many(price=2.5)])
+        self.assertEqual(["21"], [person.name for person in self.sub_store.get_many(ts="2024-01-03T00:00:00")])
+        self.assertEqual(["dan"], [person.name for person in self.sub_store.lazy_load(fields=["name"], age=20)])
+
+    def test_typed_update(self):
+        self.assertEqual(1, self.sub_store.update_one({"name": "dan"}, {"age": "30", "ts": "2025-05-05"}))
+        person = self.sub_store.get_one(age=30)
+        self.assertEqual("dan", person.name)
+        self.assertEqual(datetime.datetime(2025, 5, 5), person.ts)
+        self.assertEqual([], self.sub_store.get_many(age=20))
+
+    def test_wrong_typed_value(self):
+        with self.assertRaises(TypeError):
+            self.sub_store.insert_one(age="old", price=1, ts="2024-01-01", name="max")
+        with self.assertRaises(TypeError):
+            self.sub_store.insert_one(age=1.5, price=1, ts="2024-01-01", name="max")
+        self.assertEqual(2, len(self.sub_store.get_all()))
+
+    def test_operator_conditions(self):
+        self.assertEqual(["21"], [person.name for person in self.sub_store.get_many(age__gt=20)])
+        self.assertEqual(["dan", "21"], [person.name for person in self.sub_store.get_many(price__in=[1, "2.5"])])
+        self.assertEqual("dan", self.sub_store.get_one(ts__lt="2024-01-03", name__startswith="d").name)
+        self.assertEqual([], self.sub_store.get_many(age__in=[]))
+        self.assertEqual(1, self.sub_store.delete_one(age__ge=21))
+        self.assertEqual(["dan"], [person.name for person in self.sub_store.get_all()])
+        with self.assertRaises(TypeError):
+            self.sub_store.get_many(age__lt="young")
+        with self.assertRaises(NotFoundField):
+            self.sub_store.get_many(weight__gt=1)
+
+
+class TestBinaryTypedFields(TestTypedFields):
+    store_format = StoreFormats.BINARY
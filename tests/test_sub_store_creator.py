@@ -4,6 +4,7 @@ from unittest import TestCase
 
 from easystore.substorecreator import SubStoreCreator
 from easystore.database import SubStore
+from tests.testutilis import delete_side_files
 
 
 class TestSubStoreCreator(TestCase):
@@ -15,6 +16,7 @@ class TestSubStoreCreator(TestCase):
     def tearDown(self) -> None:
         pathlib.Path("new_test.sbstore.meta").unlink()
         pathlib.Path("new_test.sbstore").unlink()
+        delete_side_files(self.path_new_store)
 
     def test_create_sub_store_common(self):
         self.sub_store_creator.create_sub_store("new_test", ["name", "id[pk]"])
@@ -0,0 +1,125 @@
+import pathlib
+import threading
+from unittest import TestCase
+
+from easystore.database import EasyStore
+from easystore.errors import LockOrderError, UniqueKeyError
+from tests.testutilis import delete_temp_files_v3, delete_side_files
+
+PATH_TEST_TRANSACTION_STORE = "transaction_test.estore"
+
+
+class TestStoreTransaction(TestCase):
+
+    def setUp(self) -> None:
+        self.store_path = pathlib.Path(PATH_TEST_TRANSACTION_STORE)
+        self.easy_store = EasyStore(PATH_TEST_TRANSACTION_STORE)
+        self.easy_store.create_sub_store("accounts", ["id[pk][int]", "name[index]", "balance[int]"])
+        self.easy_store.create_sub_store("transfers", ["id[pk][int]", "account[int]", "amount[int]"])
+        self.accounts = self.easy_store.get_sub_store("accounts")
+        self.transfers = self.easy_store.get_sub_store("transfers")
+        self.accounts.insert_many([{"name": "dan", "balance": 100}, {"name": "max", "balance": 50}])
+
+    def tearDown(self) -> None:
+        sub_store_paths = [pathlib.Path("accounts.sbstore"), pathlib.Path("transfers.sbstore")]
+        delete_temp_files_v3(*sub_store_paths, *[pathlib.Path(f"{path}.meta") for path in sub_store_paths])
+        delete_side_files(*sub_store_paths)
+        self.store_path.unlink()
+        pathlib.Path(f"{PATH_TEST_TRANSACTION_STORE}.journal").unlink(missing_ok=True)
+
+    def test_changes_of_sub_stores_are_committed_together(self):
+        with self.easy_store.transaction() as transaction:
+            accounts = transaction.get_sub_store("accounts")
+            transfers = transaction.get_sub_store("transfers")
+            self.assertEqual(1, accounts.update_one({"name": "dan"}, {"balance": 70}))
+            self.assertEqual(1, accounts.update_one({"name": "max"}, {"balance": 80}))
+            transfers.insert_one(account=2, amount=30)
+            accounts.insert_one(name="vadim", balance=0)
+            self.assertEqual([70, 80, 0], [account.balance for account in accounts.get_many()])
+            self.assertEqual(100, self.accounts.get_one(name="dan").balance)
+        self.assertEqual([70, 80, 0], [account.balance for account in self.accounts.get_all()])
+        self.assertEqual([{"id": 1, "account": 2, "amount": 30}], [dict(item) for item in self.transfers.get_all()])
+        self.assertEqual(3, self.accounts.get_one(name="vadim").id)
+        self.assertEqual(0, pathlib.Path(f"{PATH_TEST_TRANSACTION_STORE}.journal").stat().st_size)
+
+    def test_empty_insert_many(self):
+        with self.easy_store.transaction() as transaction:
+            self.assertEqual(0, transaction.get_sub_store("transfers").insert_many([]))
+        self.assertEqual([], self.transfers.get_all())
+
+    def test_failed_transaction_writes_nothing(self):
+        with self.assertRaises(ValueError):
+            with self.easy_store.transaction() as transaction:
+                transaction.get_sub_store("accounts").delete_one(name="dan")
+                transaction.get_sub_store("transfers").insert_one(account=1, amount=100)
+                raise ValueError()
+        self.assertEqual(["dan", "max"], [account.name for account in self.accounts.get_all()])
+        self.assertEqual([], self.transfers.get_all())
+
+    def test_staged_pk_values(self):
+        with self.easy_store.transaction() as transaction:
+            accounts = transaction.get_sub_store("accounts")
+            accounts.insert_one(id=5, name="vadim", balance=1)
+            with self.assertRaises(UniqueKeyError):
+                accounts.insert_one(id=5, name="kek", balance=1)
+            with self.assertRaises(UniqueKeyError):
+                accounts.insert_one(id=1, name="kek", balance=1)
+            self.assertEqual(1, accounts.delete_one(id=1))
+            accounts.insert_one(id=1, name="kolo", balance=2)
+            self.assertEqual(1, accounts.delete_one(name="vadim"))
+            self.assertEqual(["max", "kolo"], [account.name for account in accounts.get_many()])
+        self.assertEqual([(2, "max"), (1, "kolo")], [(account.id, account.name) for account in self.accounts.get_all()])
+        self.assertEqual(1, self.accounts.get_one(name="kolo").id)
+        self.assertIsNone(self.accounts.get_one(name="dan"))
+
+    def test_moved_and_changed_rows(self):
+        with self.easy_store.transaction() as transaction:
+            accounts = transaction.get_sub_store("accounts")
+            self.assertEqual(1, accounts.update_one({"id": 1}, {"name": "daniel_the_first"}))
+            self.assertEqual(1, accounts.update_one({"name": "daniel_the_first"}, {"id": 7}))
+            self.assertEqual(1, accounts.update_many({"balance__lt": 60}, {"balance": 60}))
+        self.assertEqual([(2, "max", 60), (7, "daniel_the_first", 100)],
+                         [(account.id, account.name, account.balance) for account in self.accounts.get_all()])
+        self.assertEqual(7, self.accounts.get_one(name="daniel_the_first").id)
+        self.accounts.insert_one(name="next", balance=0)
+        self.assertEqual(8, self.accounts.get_one(name="next").id)
+
+    def test_reopened_store_keeps_committed_changes(self):
+        self.accounts.insert_one(name="vadim", balance=10)
+        with self.easy_store.transaction() as transaction:
+            accounts = transaction.get_sub_store("accounts")
+            accounts.delete_one(name="max")
+            accounts.update_one({"name": "vadim"}, {"balance": 20})
+        self.accounts.insert_one(name="kolo", balance=30)
+        for _ in range(2):
+            accounts = EasyStore(PATH_TEST_TRANSACTION_STORE).get_sub_store("accounts")
+            self.assertEqual([("dan", 100), ("vadim", 20), ("kolo", 30)],
+                             [(account.name, account.balance) for account in accounts.get_all()])
+            self.assertIsNone(accounts.get_one(name="max"))
+
+    def test_sub_stores_are_locked_in_order_of_names(self):
+        with self.easy_store.transaction() as transaction:
+            transaction.get_sub_store("transfers")
+            with self.assertRaises(LockOrderError):
+                transaction.get_sub_store("accounts")
+        with self.easy_store.transaction("transfers", "accounts") as transaction:
+            transaction.get_sub_store("transfers").insert_one(account=1, amount=10)
+            transaction.get_sub_store("accounts").update_one({"id": 1}, {"balance": 90})
+        self.assertEqual(90, self.accounts.get_one(id=1).balance)
+
+    def test_transactions_using_sub_stores_in_opposite_order(self):
+        def transfer(first: str, second: str):
+            for _ in range(20):
+                with self.easy_store.transaction("accounts", "transfers") as transaction:
+                    transaction.get_sub_store(first).get_many()
+                    transaction.get_sub_store(second).get_many()
+                    transaction.get_sub_store("transfers").insert_one(account=1, amount=1)
+
+        threads = [threading.Thread(target=transfer, args=names)
+                   for names in (("accounts", "transfers"), ("transfers", "accounts"))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(40, len(self.transfers.get_all()))
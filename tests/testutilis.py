@@ -1,6 +1,15 @@
 import pathlib
 
+SUB_STORE_SIDE_FILES = ("index", "journal", "lock")
+
 
 def delete_temp_files_v3(*files: pathlib.Path):
     for file in files:
         file.unlink()
+
+
+def delete_side_files(*sub_store_files: pathlib.Path):
+    for file in sub_store_files:
+        for side_file_suffix in SUB_STORE_SIDE_FILES:
+            side_file = file.parent / pathlib.Path(f"{file.name}.{side_file_suffix}")
+            side_file.unlink(missing_ok=True)